@@ -0,0 +1,332 @@
+"""JSON API for integrations (e.g. the ERP).
+
+Requests authenticate with the browser session or HTTP Basic auth. Estimate
+lists are ordered by last change and cursor paginated, so a client syncs
+incrementally by following ``next_cursor`` and later polling with the last
+cursor it got. Deleted estimates simply stop appearing, so incremental sync
+never reports them; a client that must notice deletions has to resync the
+full list now and then. Responses carry an ETag and Last-Modified and answer
+304 when the client's copy is current (for the estimate list they follow the
+user's dashboard version, which deletes bump too); large ones are gzipped.
+"""
+import hashlib
+import json
+import logging
+from datetime import datetime, timezone as dt_timezone
+from functools import wraps
+
+from django.conf import settings
+from django.http import FileResponse, JsonResponse
+from django.middleware.csrf import CsrfViewMiddleware
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import condition, require_http_methods
+
+from .auth import basic_auth_user
+from .catalogue import get_paver_block_types
+from .dashboard import dashboard_version
+from .importing import create_estimates, validate_row
+from .jobs import enqueue_render, job_payload
+from .models import Estimate, RenderJob
+from .pagination import changes_paginate
+from .rendering.admission import RenderBusy
+from .rendering.service import document_key, open_estimate_pdf, pdf_filename, resolve_engine
+
+logger = logging.getLogger(__name__)
+
+
+def _error(message, status, **extra):
+    return JsonResponse({'error': message, **extra}, status=status)
+
+
+def _busy(error):
+    response = _error(str(error), 503)
+    response['Retry-After'] = str(error.retry_after)
+    return response
+
+
+def api_view(*methods):
+    """Authenticate, restrict to ``methods`` and gzip the response.
+
+    Session requests that change data still need the CSRF token; Basic auth
+    requests (from scripts, which never hold a session) do not.
+    """
+    def decorator(view):
+        @csrf_exempt
+        @gzip_page
+        @require_http_methods(methods)
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.user.is_authenticated:
+                if request.method not in ('GET', 'HEAD'):
+                    rejected = CsrfViewMiddleware(lambda r: None).process_view(request, None, (), {})
+                    if rejected is not None:
+                        return _error('CSRF token missing or incorrect.', 403)
+            else:
+                user = basic_auth_user(request)
+                if user is None:
+                    response = _error('Authentication required.', 401)
+                    response['WWW-Authenticate'] = 'Basic realm="api"'
+                    return response
+                request.user = user
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _validators(state, version=None):
+    """The (ETag, Last-Modified) pair for a list of ``(id, updated_at)`` rows.
+
+    With a ``version`` (nanoseconds, bumped by every write including deletes)
+    both also change when rows disappear.
+    """
+    digest = hashlib.sha256(repr((version, state)).encode()).hexdigest()[:32]
+    if version is not None:
+        last_modified = datetime.fromtimestamp(version / 1e9, dt_timezone.utc) if version else None
+    else:
+        last_modified = max((updated_at for _, updated_at in state), default=None)
+    return f'"{digest}"', last_modified
+
+
+def _conditional(request, state, build, version=None):
+    """Return 304 if the client holds ``state``, else the JSON from ``build()`` with validators."""
+    etag, last_modified = _validators(state, version)
+    timestamp = last_modified.timestamp() if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is None:
+        response = JsonResponse(build())
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(timestamp)
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def serialize_paver_block_type(block_type):
+    return {
+        'id': block_type.id,
+        'name': block_type.name,
+        'description': block_type.description,
+        'updated_at': block_type.updated_at,
+    }
+
+
+def serialize_estimate(estimate):
+    return {
+        'id': estimate.id,
+        'party_name': estimate.party_name,
+        'date': estimate.date,
+        'paver_block_type': estimate.paver_block_type_id,
+        'price': estimate.price,
+        'gst_percentage': estimate.gst_percentage,
+        'gst_amount': estimate.gst_amount,
+        'transportation_charge': estimate.transportation_charge,
+        'loading_unloading_cost': estimate.loading_unloading_cost,
+        'total_amount': estimate.total_amount,
+        'notes': estimate.notes,
+        'created_at': estimate.created_at,
+        'updated_at': estimate.updated_at,
+        'url': reverse('api_estimate', args=[estimate.id]),
+        'pdf_url': reverse('api_estimate_pdf', args=[estimate.id]),
+    }
+
+
+@api_view('GET', 'HEAD')
+def paver_block_type_list(request):
+    block_types = get_paver_block_types()
+    state = [(block_type.id, block_type.updated_at) for block_type in block_types]
+    return _conditional(request, state, lambda: {
+        'results': [serialize_paver_block_type(block_type) for block_type in block_types],
+    })
+
+
+@api_view('GET', 'HEAD')
+def paver_block_type_detail(request, paver_block_type_id):
+    for block_type in get_paver_block_types():
+        if block_type.id == paver_block_type_id:
+            return _conditional(request, [(block_type.id, block_type.updated_at)],
+                                lambda: serialize_paver_block_type(block_type))
+    return _error('Not found.', 404)
+
+
+def _page_size(request):
+    config = settings.KCP_API
+    try:
+        size = int(request.GET.get('limit', config['PAGE_SIZE']))
+    except ValueError:
+        size = config['PAGE_SIZE']
+    return max(1, min(size, config['MAX_PAGE_SIZE']))
+
+
+def _list_estimates(request):
+    estimates = Estimate.objects.filter(created_by=request.user)
+    since = request.GET.get('updated_since')
+    if since:
+        try:
+            since = datetime.fromisoformat(since)
+        except ValueError:
+            return _error("updated_since must be an ISO 8601 date and time.", 400)
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since, dt_timezone.utc)
+        estimates = estimates.filter(updated_at__gte=since)
+    # Read before the page, so a write in between makes the next request miss.
+    version = dashboard_version(request.user.pk)
+    page = changes_paginate(estimates, _page_size(request), after=request.GET.get('cursor'))
+    state = [(estimate.id, estimate.updated_at) for estimate in page.items]
+    return _conditional(request, state, version=version, build=lambda: {
+        'results': [serialize_estimate(estimate) for estimate in page.items],
+        'next_cursor': page.next_cursor,
+        'has_more': page.has_more,
+    })
+
+
+def _create_estimates(request):
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return _error('The request body is not valid JSON.', 400)
+    if isinstance(data, dict):
+        data = data.get('estimates')
+    if not isinstance(data, list) or not data:
+        return _error('Send a non-empty list of estimates, or {"estimates": [...]}.', 400)
+    limit = settings.KCP_API['MAX_BULK_CREATE']
+    if len(data) > limit:
+        return _error(f'At most {limit} estimates can be created per request.', 400)
+
+    catalogue = get_paver_block_types()
+    block_types = {block_type.name.casefold(): block_type.id for block_type in catalogue}
+    block_type_ids = {block_type.id for block_type in catalogue}
+    rows, errors = [], []
+    for index, item in enumerate(data):
+        if not isinstance(item, dict):
+            errors.append({'index': index, 'error': 'each estimate must be an object'})
+            continue
+        # Block types may be given by id or by name; names need not be unique.
+        block_type_id = item.get('paver_block_type')
+        if isinstance(block_type_id, int) and not isinstance(block_type_id, bool):
+            if block_type_id not in block_type_ids:
+                errors.append({'index': index, 'error': f'unknown paver block type id {block_type_id}'})
+                continue
+        else:
+            block_type_id = None
+        try:
+            rows.append(validate_row(item, block_types, block_type_id=block_type_id))
+        except ValueError as e:
+            errors.append({'index': index, 'error': str(e)})
+    if errors:
+        # All or nothing: one bad row fails the whole request.
+        return _error('Some estimates are invalid; none were created.', 400, errors=errors)
+
+    estimates = create_estimates(rows, request.user)
+    logger.info(f"API created {len(estimates)} estimates for {request.user}")
+    return JsonResponse({'results': [serialize_estimate(estimate) for estimate in estimates]}, status=201)
+
+
+@api_view('GET', 'HEAD', 'POST')
+def estimate_list(request):
+    """GET: estimates changed since the cursor. POST: create many estimates in one transaction."""
+    if request.method == 'POST':
+        return _create_estimates(request)
+    return _list_estimates(request)
+
+
+def _estimate_updated_at(request, estimate_id):
+    return (
+        Estimate.objects.filter(id=estimate_id, created_by=request.user)
+        .values_list('updated_at', flat=True).first()
+    )
+
+
+def _estimate_etag(request, estimate_id):
+    updated_at = _estimate_updated_at(request, estimate_id)
+    return f'"{estimate_id}-{updated_at.timestamp()}"' if updated_at else None
+
+
+@api_view('GET', 'HEAD')
+@condition(etag_func=_estimate_etag, last_modified_func=_estimate_updated_at)
+def estimate_detail(request, estimate_id):
+    estimate = Estimate.objects.filter(id=estimate_id, created_by=request.user).first()
+    if estimate is None:
+        return _error('Not found.', 404)
+    response = JsonResponse(serialize_estimate(estimate))
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@api_view('POST')
+def estimate_render(request, estimate_id):
+    """Queue a PDF render; poll the returned ``status_url`` for the download link."""
+    estimate = Estimate.objects.filter(id=estimate_id, created_by=request.user).first()
+    if estimate is None:
+        return _error('Not found.', 404)
+    engine = request.GET.get('engine')
+    if request.content_type == 'application/json' and request.body:
+        try:
+            engine = json.loads(request.body).get('engine', engine)
+        except (ValueError, AttributeError):
+            return _error('The request body is not a JSON object.', 400)
+    try:
+        job = enqueue_render(estimate, request.user, engine)
+    except RenderBusy as e:
+        return _busy(e)
+    except ValueError as e:
+        return _error(str(e), 400)
+    return JsonResponse(job_payload(job, api=True), status=202)
+
+
+def _pdf_response(estimate, engine, key=None):
+    """The estimate's PDF as a download, or 503 with Retry-After when rendering is saturated."""
+    try:
+        pdf_file, key = open_estimate_pdf(estimate, engine, key=key)
+    except RenderBusy as e:
+        return _busy(e)
+    response = FileResponse(pdf_file, as_attachment=True, filename=pdf_filename(estimate),
+                            content_type='application/pdf')
+    response['ETag'] = f'"{key}"'
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@api_view('GET', 'HEAD')
+def estimate_pdf(request, estimate_id):
+    """The estimate's PDF, rendered now if it is not cached."""
+    estimate = (
+        Estimate.objects.select_related('paver_block_type')
+        .filter(id=estimate_id, created_by=request.user).first()
+    )
+    if estimate is None:
+        return _error('Not found.', 404)
+    try:
+        engine = resolve_engine(request.GET.get('engine'))
+    except ValueError as e:
+        return _error(str(e), 400)
+    key = document_key(estimate, engine)
+    not_modified = get_conditional_response(request, etag=f'"{key}"')
+    if not_modified is not None:
+        not_modified['ETag'] = f'"{key}"'
+        return not_modified
+    return _pdf_response(estimate, engine, key=key)
+
+
+@api_view('GET', 'HEAD')
+def render_job_status(request, job_id):
+    job = RenderJob.objects.filter(id=job_id, created_by=request.user).first()
+    if job is None:
+        return _error('Not found.', 404)
+    return JsonResponse(job_payload(job, api=True))
+
+
+@api_view('GET', 'HEAD')
+def render_job_download(request, job_id):
+    """The finished job's PDF, rendered again if the cached file is gone or outdated."""
+    job = (
+        RenderJob.objects.select_related('estimate__paver_block_type')
+        .filter(id=job_id, created_by=request.user, status=RenderJob.DONE).first()
+    )
+    if job is None:
+        return _error('Not found.', 404)
+    return _pdf_response(job.estimate, job.engine)
@@ -0,0 +1,104 @@
+"""Authentication helpers: HTTP Basic auth for scripts and a cached user lookup.
+
+``CachedModelBackend`` saves the ``auth_user`` query that every logged-in
+request makes. Users are kept in each worker's memory and in the shared
+Django cache, both tagged with a per-user version number kept in the shared
+cache. Saving a user (a password change, deactivation, a new last_login) or
+logging out bumps the version (see ``signals``), so every worker drops its
+copy on the next request. Both copies also expire, after ``LOCAL_TTL`` and
+``TTL`` seconds, which bounds staleness if a change bypasses the signals.
+
+Basic auth remembers a verified username and password (under an HMAC of
+them, never the password itself) for ``TTL`` seconds, so API scripts skip
+the password hash on every request. The entry holds the user's password
+hash, and is only trusted while the cached user still has the same one.
+Configured by ``settings.KCP_AUTH_CACHE``.
+"""
+import base64
+import binascii
+import copy
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.utils.crypto import salted_hmac
+
+USER_KEY = 'estimate:user:{user_id}'
+VERSION_KEY = 'estimate:user:{user_id}:version'
+CREDENTIALS_KEY = 'estimate:basic-auth:{digest}'
+
+_lock = threading.Lock()
+_local = {}
+
+
+def _user_version(user_id):
+    key = VERSION_KEY.format(user_id=user_id)
+    version = cache.get(key)
+    if version is None:
+        version = time.time_ns()
+        # add() so concurrent workers agree on a single first version.
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def basic_auth_user(request):
+    """The user named by an HTTP Basic ``Authorization`` header, if the password matches."""
+    scheme, _, credentials = request.META.get('HTTP_AUTHORIZATION', '').partition(' ')
+    if scheme.lower() != 'basic':
+        return None
+    try:
+        username, _, password = base64.b64decode(credentials).decode('utf-8').partition(':')
+    except (binascii.Error, UnicodeDecodeError):
+        return None
+    digest = salted_hmac('estimate.auth.basic_auth_user', f'{username}:{password}').hexdigest()
+    key = CREDENTIALS_KEY.format(digest=digest)
+    remembered = cache.get(key)
+    if remembered is not None:
+        user_id, password_hash = remembered
+        user = CachedModelBackend().get_user(user_id)
+        # A new password or username (or an inactive user) voids the remembered check.
+        if user is not None and user.password == password_hash and user.get_username() == username:
+            return user
+    user = authenticate(request, username=username, password=password)
+    if user is not None:
+        cache.set(key, (user.pk, user.password), settings.KCP_AUTH_CACHE['TTL'])
+    return user
+
+
+class CachedModelBackend(ModelBackend):
+    """``ModelBackend`` whose per-request ``get_user`` is served from the cache."""
+
+    def get_user(self, user_id):
+        config = settings.KCP_AUTH_CACHE
+        # Read before any load, so a change saved meanwhile makes the copy stale.
+        version = _user_version(user_id)
+        now = time.monotonic()
+        with _lock:
+            user, local_version, expires = _local.get(user_id, (None, None, 0.0))
+        if user is None or local_version != version or now >= expires:
+            key = USER_KEY.format(user_id=user_id)
+            user = None
+            cached = cache.get(key)
+            if cached is not None and cached[0] == version:
+                user = cached[1]
+            if user is None:
+                user = super().get_user(user_id)
+                if user is None:
+                    return None
+                cache.set(key, (version, user), config['TTL'])
+            with _lock:
+                _local[user_id] = (user, version, now + config['LOCAL_TTL'])
+        # Each request gets its own instance, so changes to one never leak into another.
+        return copy.copy(user) if self.user_can_authenticate(user) else None
+
+
+def forget_user(user_id):
+    """Drop the cached copies of a user after it changed or logged out."""
+    cache.set(VERSION_KEY.format(user_id=user_id), time.time_ns(), None)
+    cache.delete(USER_KEY.format(user_id=user_id))
+    with _lock:
+        _local.pop(user_id, None)
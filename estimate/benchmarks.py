@@ -0,0 +1,455 @@
+"""Benchmarks for the rendering hot path, request latency and worker startup.
+
+``run_suite`` is what ``manage.py benchmark`` runs; it expects to be pointed
+at a disposable database, since it generates data and posts estimates.
+"""
+import copy
+import os
+import re
+import statistics
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+from django.conf import settings
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from docx import Document
+from docx.text.paragraph import Paragraph
+
+from .rendering.placeholders import (
+    PLACEHOLDER_RE, normalize_replacements, replace_placeholders_in_element, substitute_runs,
+)
+
+SAMPLE_REPLACEMENTS = {
+    'partyname': 'Shree Ganesh Infra Projects',
+    'date': '2025-05-19',
+    'paverblocktype': 'Zig-Zag 60mm',
+    'rate1': '42.50',
+    'rate2': '7.65',
+    'rate3': '3.00',
+    'rate4': '1.50',
+    'rate5': '1.50',
+    'rate': '54.65',
+    'year': '2025',
+    'NOTE': 'Rates valid for 15 days.',
+}
+
+# Run layouts as Word stores them in KCP_LETTERPAD.docx, used when the file
+# is missing: each ``{{ name }}`` split over several runs, often with the
+# name itself broken up.
+SAMPLE_PARAGRAPHS = [
+    ['TO:', ' ', '{{ ', 'partyname', ' }}'],
+    ['                DATE:', ' ', '{{', ' ', 'date', ' }}'],
+    ['SUBJECT:', ' ', ' ', 'Estimate – Quotation for ', '{{', ' ', 'paverblocktype', ' }}'],
+    [' ', ' As per your requirement following is the Estimate – Quotation for', ' ', '{{ ', 'paverblocktype', ' }}', '.'],
+    ['PARTICULARS'],
+    ['{{ ', 'paverblocktype', ' }}'],
+    ['₹ ', '{{ ', 'rate', '1', ' }}', ' ', '/- PER SQ. FEET'],
+    ['₹ ', '{{ ', 'rate', '2', ' }}', ' ', '/- PER SQ. FEET'],
+    ['₹ ', '{{ ', 'rate', '3', ' }}', ' ', '/- PER SQ. FEET'],
+    ['₹ ', '{{ ', 'rate', '4', ' }}', ' ', '/- PER SQ. FEET'],
+    ['₹ ', '{{ ', 'rate', ' }}', ' ', '/- PER SQ. FEET'],
+    ['NOTE :'],
+    ['{{ ', 'NOTE', ' }}'],
+]
+
+
+def legacy_replace_placeholders_in_element(element, replacements):
+    """The pre-engine implementation, kept as the benchmark baseline."""
+    if not hasattr(element, 'text') or not element.text:
+        return
+
+    needs_replacement = False
+    for key in replacements:
+        if key in element.text:
+            needs_replacement = True
+            break
+
+    if not needs_replacement:
+        return
+
+    original_text = element.text
+    original_runs = []
+    for run in element.runs:
+        original_runs.append({
+            'text': run.text,
+            'bold': run.bold,
+            'italic': run.italic,
+            'underline': run.underline,
+            'font': run.font.name if run.font else None,
+            'size': run.font.size if run.font else None,
+            'color': run.font.color.rgb if run.font and run.font.color else None
+        })
+
+    for run in element.runs:
+        run.text = ''
+
+    new_text = original_text
+    for key, value in replacements.items():
+        new_text = new_text.replace(key, str(value))
+
+    if original_runs:
+        run = element.add_run(new_text)
+        run.bold = original_runs[0]['bold']
+        run.italic = original_runs[0]['italic']
+        run.underline = original_runs[0]['underline']
+        if original_runs[0]['font']:
+            run.font.name = original_runs[0]['font']
+        if original_runs[0]['size']:
+            run.font.size = original_runs[0]['size']
+        if original_runs[0]['color']:
+            run.font.color.rgb = original_runs[0]['color']
+    else:
+        element.add_run(new_text)
+
+
+def _sample_paragraphs(path=None):
+    """Every paragraph of the letterpad at ``path``, or ``SAMPLE_PARAGRAPHS`` without one."""
+    if path:
+        from .rendering.letterpad import _iter_paragraphs
+
+        doc = Document(path)
+        stories = [doc]
+        for section in doc.sections:
+            stories.extend([section.header, section.footer])
+        paragraphs, seen = [], set()
+        for story in stories:
+            for paragraph in _iter_paragraphs(story):
+                if paragraph._p not in seen:
+                    seen.add(paragraph._p)
+                    paragraphs.append(paragraph)
+        return paragraphs
+    doc = Document()
+    paragraphs = []
+    for texts in SAMPLE_PARAGRAPHS:
+        paragraph = doc.add_paragraph()
+        for text in texts:
+            paragraph.add_run(text)
+        paragraphs.append(paragraph)
+    return paragraphs
+
+
+def _time_substitution(func, replacements, iterations, pristine):
+    elapsed = 0.0
+    for _ in range(iterations):
+        paragraphs = [Paragraph(copy.deepcopy(p._p), p._parent) for p in pristine]
+        start = time.perf_counter()
+        for paragraph in paragraphs:
+            func(paragraph, replacements)
+        elapsed += time.perf_counter() - start
+    return elapsed
+
+
+def bench_placeholders(iterations=2000, path=None):
+    """Time the legacy function and the engine over the letterpad's paragraphs.
+
+    The paragraphs come from ``path`` (default: the configured letterpad, if
+    it exists), so they have the run structure production renders see.
+    Returns a dict with per-document timings in microseconds and the speedup.
+    """
+    if path is None and os.path.exists(settings.KCP_LETTERPAD_PATH):
+        path = settings.KCP_LETTERPAD_PATH
+    paragraphs = _sample_paragraphs(path)
+    # The legacy code matched placeholders literally in the paragraph text.
+    legacy_replacements = {f'{{{{ {name} }}}}': value for name, value in SAMPLE_REPLACEMENTS.items()}
+    legacy = _time_substitution(legacy_replace_placeholders_in_element, legacy_replacements, iterations, paragraphs)
+    engine = _time_substitution(replace_placeholders_in_element, SAMPLE_REPLACEMENTS, iterations, paragraphs)
+    # What LetterpadTemplate.render does: normalize once, substitute only in
+    # the paragraphs that hold placeholders.
+    values = normalize_replacements(SAMPLE_REPLACEMENTS)
+    slots = [paragraph for paragraph in paragraphs if PLACEHOLDER_RE.search(paragraph.text)]
+    compiled = _time_substitution(substitute_runs, values, iterations, slots)
+    return {
+        'iterations': iterations,
+        'source': path or 'SAMPLE_PARAGRAPHS',
+        'paragraphs': len(paragraphs),
+        'placeholder_paragraphs': len(slots),
+        'legacy_us_per_doc': legacy / iterations * 1e6,
+        'engine_us_per_doc': engine / iterations * 1e6,
+        'compiled_us_per_doc': compiled / iterations * 1e6,
+        'speedup': legacy / compiled if compiled else None,
+    }
+
+
+# Loads what a gunicorn worker loads before its first request.
+_BOOT_SNIPPET = (
+    "import os; os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'kcp_estimate.settings'); "
+    "from kcp_estimate.wsgi import application; import kcp_estimate.urls"
+)
+_WARM_SNIPPET = _BOOT_SNIPPET + "; from estimate.rendering.service import warm_up; warm_up()"
+_HEAVY_MODULES = ('docx', 'reportlab', 'lxml', 'PIL', 'openpyxl')
+
+
+def _import_profile(snippet):
+    """Run ``snippet`` under ``-X importtime``; return total ms and heavy modules loaded."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', snippet + '; import resource; '
+         'print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)'],
+        cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+    )
+    total_us = 0
+    heavy = set()
+    for line in result.stderr.splitlines():
+        match = re.match(r'import time:\s+(\d+) \|\s+\d+ \|\s*(\S+)', line)
+        if match:
+            total_us += int(match.group(1))
+            if match.group(2).split('.')[0] in _HEAVY_MODULES:
+                heavy.add(match.group(2).split('.')[0])
+    return {
+        'import_ms': total_us / 1000,
+        'max_rss_mb': int(result.stdout.split()[-1]) / 1024,
+        'heavy_modules': sorted(heavy),
+    }
+
+
+def _memory(pid):
+    """RSS, PSS and private (USS) memory of a process in MB, from smaps_rollup."""
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            name, _, rest = line.partition(':')
+            if name in ('Rss', 'Pss', 'Private_Clean', 'Private_Dirty'):
+                values[name] = int(rest.split()[0]) / 1024
+    return {
+        'rss_mb': values['Rss'],
+        'pss_mb': values['Pss'],
+        'uss_mb': values['Private_Clean'] + values['Private_Dirty'],
+    }
+
+
+def _children(pid):
+    with open(f'/proc/{pid}/task/{pid}/children') as f:
+        return [int(child) for child in f.read().split()]
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _gunicorn_workers(workers, preload, requests, timeout=60):
+    """Start gunicorn, send ``requests`` requests and measure each worker."""
+    port = _free_port()
+    env = dict(os.environ, GUNICORN_PRELOAD='1' if preload else '0', WEB_CONCURRENCY=str(workers))
+    master = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', os.path.join(settings.BASE_DIR, 'gunicorn.conf.py'),
+         '--bind', f'127.0.0.1:{port}', 'kcp_estimate.wsgi:application'],
+        cwd=settings.BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.monotonic() + timeout
+        while len(_children(master.pid)) < workers:
+            if time.monotonic() > deadline or master.poll() is not None:
+                raise RuntimeError('gunicorn did not start its workers')
+            time.sleep(0.2)
+        for _ in range(requests):
+            while True:
+                try:
+                    urllib.request.urlopen(f'http://127.0.0.1:{port}/', timeout=10).read()
+                    break
+                except OSError:
+                    if time.monotonic() > deadline:
+                        raise
+                    time.sleep(0.2)
+        per_worker = [_memory(pid) for pid in _children(master.pid)]
+        return {
+            field: sum(worker[field] for worker in per_worker) / len(per_worker)
+            for field in ('rss_mb', 'pss_mb', 'uss_mb')
+        }
+    finally:
+        master.send_signal(signal.SIGTERM)
+        master.wait(timeout=30)
+
+
+def bench_startup(workers=2, requests=20, gunicorn=True):
+    """Compare worker boot with rendering loaded lazily, eagerly and preloaded.
+
+    Import times come from ``python -X importtime`` in a fresh interpreter.
+    With ``gunicorn`` (Linux only) the average RSS, PSS and private memory
+    per worker are measured after serving ``requests`` login page requests,
+    with and without ``--preload``.
+    """
+    result = {
+        'lazy': _import_profile(_BOOT_SNIPPET),
+        'eager': _import_profile(_WARM_SNIPPET),
+    }
+    if gunicorn:
+        result['workers'] = workers
+        result['per_worker'] = {
+            'no_preload': _gunicorn_workers(workers, preload=False, requests=requests),
+            'preload': _gunicorn_workers(workers, preload=True, requests=requests),
+        }
+    return result
+
+
+def _timings(func, repeats, before=None):
+    """Call ``func`` ``repeats`` times; return the durations in milliseconds.
+
+    ``before`` is called ahead of each call, outside the timing.
+    """
+    durations = []
+    for _ in range(repeats):
+        if before is not None:
+            before()
+        start = time.perf_counter()
+        func()
+        durations.append((time.perf_counter() - start) * 1000)
+    return durations
+
+
+def _summary(prefix, durations):
+    durations = sorted(durations)
+    return {
+        f'{prefix}_p50_ms': statistics.median(durations),
+        f'{prefix}_p95_ms': durations[min(len(durations) - 1, int(len(durations) * 0.95))],
+    }
+
+
+def _get(client, url):
+    response = client.get(url)
+    if response.status_code != 200:
+        raise RuntimeError(f'GET {url} returned {response.status_code}')
+    if response.streaming:
+        b''.join(response.streaming_content)
+    return response
+
+
+def bench_dashboard(size, repeats=30, stdout=None):
+    """Dashboard latency for a user with ``size`` estimates: first and a deep page.
+
+    The plain metrics drop the user's cached dashboard before every request,
+    so they measure the queries; ``_warm`` ones are served from the cache.
+    """
+    from .dashboard import invalidate_dashboard
+    from .datagen import ensure_block_types, ensure_users, generate_estimates
+    from .models import Estimate
+    from .pagination import encode_cursor
+
+    user = ensure_users(f'bench-{size}', 1)[0]
+    missing = size - Estimate.objects.filter(created_by=user).count()
+    if missing > 0:
+        generate_estimates([user], ensure_block_types(16), missing, seed=size, stdout=stdout)
+
+    client = Client()
+    client.force_login(user)
+    middle = Estimate.objects.filter(created_by=user).order_by('-created_at', '-id')[size // 2]
+    deep_url = f'/dashboard/?after={encode_cursor(middle)}'
+    _get(client, '/dashboard/')
+
+    def drop_cache():
+        invalidate_dashboard(user.pk)
+
+    return {
+        **_summary(f'dashboard_{size}', _timings(lambda: _get(client, '/dashboard/'), repeats, drop_cache)),
+        **_summary(f'dashboard_{size}_deep', _timings(lambda: _get(client, deep_url), repeats, drop_cache)),
+        **_summary(f'dashboard_{size}_warm', _timings(lambda: _get(client, '/dashboard/'), repeats)),
+    }
+
+
+def bench_generate_pdf(repeats=20):
+    """End-to-end ``generate_pdf`` per engine, render cache off, stand-in converter."""
+    from .datagen import ensure_block_types, ensure_users, generate_estimates
+    from .models import Estimate
+
+    user = ensure_users('bench-render', 1)[0]
+    if not Estimate.objects.filter(created_by=user).exists():
+        generate_estimates([user], ensure_block_types(4), 10, seed=1)
+    estimate = Estimate.objects.filter(created_by=user).first()
+    client = Client()
+    client.force_login(user)
+
+    converter = dict(settings.KCP_CONVERTER, BACKEND='estimate.rendering.conversion.StandInBackend')
+    result = {}
+    with override_settings(KCP_CONVERTER=converter, KCP_RENDER_CACHE={'DIR': ''}):
+        for engine in ('docx', 'reportlab'):
+            url = f'/generate-pdf/{estimate.pk}/?engine={engine}'
+            _get(client, url)  # start the converter, compile the letterpad
+            result.update(_summary(f'generate_pdf_{engine}', _timings(lambda: _get(client, url), repeats)))
+    return result
+
+
+def bench_create_estimate(count=200):
+    """``create_estimate`` form posts: latency and estimates written per second."""
+    from .datagen import ensure_block_types, ensure_users
+    from .models import Estimate
+
+    user = ensure_users('bench-writer', 1)[0]
+    block_type = ensure_block_types(1)[0]
+    client = Client()
+    client.force_login(user)
+    data = {
+        'party_name': 'Benchmark Builders', 'date': '2025-01-15', 'paver_block_type': block_type.pk,
+        'price': '45.50', 'gst_percentage': '18', 'transportation_charge': '2.00',
+        'loading_unloading_cost': '1.00', 'notes': '',
+    }
+
+    def post():
+        response = client.post('/create-estimate/', data)
+        if response.status_code != 302:
+            raise RuntimeError(f'create_estimate returned {response.status_code}')
+
+    durations = _timings(post, count)
+    Estimate.objects.filter(created_by=user).delete()
+    return {
+        **_summary('create_estimate', durations),
+        'create_estimate_per_s': count / (sum(durations) / 1000),
+    }
+
+
+# Django's defaults, against which the session and user caches are measured.
+UNCACHED_AUTH = {
+    'SESSION_ENGINE': 'django.contrib.sessions.backends.db',
+    'AUTHENTICATION_BACKENDS': ['django.contrib.auth.backends.ModelBackend'],
+}
+
+
+def _queries(client, url):
+    with CaptureQueriesContext(connection) as queries:
+        _get(client, url)
+    return len(queries)
+
+
+def bench_request_queries():
+    """Queries per warm dashboard view and (render-cached) PDF download, with
+    Django's database sessions and user lookup and with the configured ones."""
+    from .datagen import ensure_block_types, ensure_users, generate_estimates
+    from .models import Estimate
+
+    user = ensure_users('bench-queries', 1)[0]
+    if not Estimate.objects.filter(created_by=user).exists():
+        generate_estimates([user], ensure_block_types(4), 10, seed=2)
+    estimate = Estimate.objects.filter(created_by=user).first()
+    urls = {'dashboard': '/dashboard/', 'generate_pdf': f'/generate-pdf/{estimate.pk}/'}
+
+    converter = dict(settings.KCP_CONVERTER, BACKEND='estimate.rendering.conversion.StandInBackend')
+    result = {}
+    with override_settings(KCP_CONVERTER=converter):
+        for suffix, overrides in (('_uncached', UNCACHED_AUTH), ('', {})):
+            with override_settings(**overrides):
+                client = Client()
+                client.force_login(user)
+                for name, url in urls.items():
+                    _get(client, url)  # warm the page, render and user caches
+                    result[f'{name}_queries{suffix}'] = _queries(client, url)
+    return result
+
+
+def run_suite(sizes=(1000, 100000, 1000000), repeats=30, stdout=None):
+    """Run every benchmark and return ``{metric: value}``."""
+    metrics = {}
+    for size in sizes:
+        metrics.update(bench_dashboard(size, repeats, stdout=stdout))
+    placeholders = bench_placeholders(iterations=500)
+    metrics['placeholders_us_per_doc'] = placeholders['compiled_us_per_doc']
+    metrics['placeholders_docs_per_s'] = 1e6 / placeholders['compiled_us_per_doc']
+    metrics.update(bench_generate_pdf(repeats))
+    metrics.update(bench_request_queries())
+    metrics.update(bench_create_estimate(repeats * 5))
+    return metrics
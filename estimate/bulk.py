@@ -0,0 +1,95 @@
+"""Bulk export: many estimates rendered in parallel and streamed as one ZIP.
+
+Estimates are rendered by a few threads with a bounded number of jobs in
+flight, and each PDF is written to the archive and handed to the response as
+soon as it finishes, so memory use does not grow with the size of the batch.
+The threads share the web worker's warm converter pool and its render slots,
+so an export starts no processes of its own.
+A failed estimate becomes a text entry under ``errors/`` instead of aborting
+the archive.
+"""
+import io
+import logging
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.db import connections
+
+from .models import Estimate
+from .rendering.service import get_estimate_pdf, pdf_filename, safe_filename
+
+logger = logging.getLogger(__name__)
+
+
+class _ZipStream(io.RawIOBase):
+    """Write-only sink that collects what ZipFile writes until it is drained."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _render_one(estimate_id, engine):
+    try:
+        estimate = Estimate.objects.select_related('paver_block_type').get(pk=estimate_id)
+        pdf, _ = get_estimate_pdf(estimate, engine, block=True)
+        return pdf_filename(estimate), pdf
+    finally:
+        # Django opened a connection for this thread; nothing else will close it.
+        connections.close_all()
+
+
+def _archive_name(filename, used):
+    name = safe_filename(filename)
+    if name in used:
+        stem, dot, ext = name.rpartition('.')
+        n = 2
+        while f'{stem} ({n}){dot}{ext}' in used:
+            n += 1
+        name = f'{stem} ({n}){dot}{ext}'
+    used.add(name)
+    return name
+
+
+def stream_estimates_zip(estimate_ids, engine=None, threads=None):
+    """Yield the bytes of a ZIP holding one PDF per estimate id."""
+    threads = threads or settings.KCP_BULK_EXPORT['THREADS']
+    in_flight_limit = threads * 2
+    stream = _ZipStream()
+    used = set()
+    pending_ids = list(estimate_ids)
+
+    with ThreadPoolExecutor(max_workers=threads, thread_name_prefix='bulk-export') as executor, \
+            zipfile.ZipFile(stream, 'w', zipfile.ZIP_DEFLATED) as archive:
+        in_flight = {}
+        while pending_ids or in_flight:
+            while pending_ids and len(in_flight) < in_flight_limit:
+                estimate_id = pending_ids.pop(0)
+                in_flight[executor.submit(_render_one, estimate_id, engine)] = estimate_id
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                estimate_id = in_flight.pop(future)
+                try:
+                    filename, pdf = future.result()
+                except Exception as e:
+                    logger.error(f"Bulk export of estimate {estimate_id} failed: {e}")
+                    archive.writestr(
+                        f'errors/estimate-{estimate_id}.txt',
+                        f'Estimate {estimate_id} could not be rendered: {type(e).__name__}: {e}\n',
+                    )
+                else:
+                    archive.writestr(_archive_name(filename, used), pdf)
+            yield stream.drain()
+    yield stream.drain()
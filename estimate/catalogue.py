@@ -0,0 +1,71 @@
+"""Cached paver block type catalogue.
+
+The catalogue is small and rarely changes, so it is kept in two layers: a
+copy in each worker's memory and a copy in the shared Django cache. A
+version number, also in the shared cache, ties them together: saving or
+deleting a block type bumps it (see ``signals``), and every worker notices
+on its next read and reloads. Both copies also expire after
+``settings.KCP_CATALOGUE_TTL`` seconds, which bounds staleness if a change
+bypasses the signals (``QuerySet.update()``, the database shell).
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import PaverBlockType
+
+VERSION_KEY = 'estimate:paver-block-types:version'
+ITEMS_KEY = 'estimate:paver-block-types:{version}'
+
+_lock = threading.Lock()
+_local = {'version': None, 'expires': 0.0, 'items': None}
+
+
+def _current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = time.time_ns()
+        # add() so concurrent workers agree on a single first version.
+        if not cache.add(VERSION_KEY, version, None):
+            version = cache.get(VERSION_KEY, version)
+    return version
+
+
+def catalogue_version():
+    """Changes whenever a paver block type is saved or deleted."""
+    return _current_version()
+
+
+def get_paver_block_types():
+    """All paver block types, ordered by name, without querying the database
+    unless the catalogue changed or expired."""
+    ttl = settings.KCP_CATALOGUE_TTL
+    version = _current_version()
+    now = time.monotonic()
+    with _lock:
+        if _local['version'] == version and now < _local['expires']:
+            return _local['items']
+
+    items = cache.get(ITEMS_KEY.format(version=version))
+    if items is None:
+        items = list(PaverBlockType.objects.all())
+        cache.set(ITEMS_KEY.format(version=version), items, ttl)
+    with _lock:
+        _local.update(version=version, expires=now + ttl, items=items)
+    return items
+
+
+def paver_block_type_choices(empty_label=None):
+    choices = [(block_type.pk, block_type.name) for block_type in get_paver_block_types()]
+    if empty_label is not None:
+        choices.insert(0, ('', empty_label))
+    return choices
+
+
+def invalidate_catalogue():
+    """Make every worker reload the catalogue on its next read."""
+    cache.set(VERSION_KEY, time.time_ns(), None)
+    with _lock:
+        _local['version'] = None
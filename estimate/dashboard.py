@@ -0,0 +1,56 @@
+"""Per-user version numbers for the cached dashboard.
+
+Each user's dashboard fragment is cached under a version that changes on
+every write to their estimates (see ``signals`` for saves and deletes; bulk
+writes call ``invalidate_dashboard`` themselves). The version is the time of
+the last write in nanoseconds; the first read seeds it from the newest
+``updated_at``. The page's Last-Modified is the newest ``updated_at``,
+looked up once per version by ``dashboard_last_modified``.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max
+
+from .models import Estimate
+
+VERSION_KEY = 'estimate:dashboard:{user_id}:version'
+LAST_MODIFIED_KEY = 'estimate:dashboard:{user_id}:{version}:last_modified'
+
+
+def _newest_update(user_id):
+    return Estimate.objects.filter(created_by_id=user_id).aggregate(newest=Max('updated_at'))['newest']
+
+
+def dashboard_version(user_id):
+    """The current version of ``user_id``'s dashboard (nanoseconds since the epoch)."""
+    key = VERSION_KEY.format(user_id=user_id)
+    version = cache.get(key)
+    if version is None:
+        newest = _newest_update(user_id)
+        version = int(newest.timestamp() * 1_000_000_000) if newest else 0
+        # add() so a write that bumps the version meanwhile wins.
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def dashboard_last_modified(user_id, version):
+    """The newest ``updated_at`` of ``user_id``'s estimates at ``version``, as a timestamp.
+
+    None when they have no estimates. Cached alongside the version's fragment.
+    """
+    key = LAST_MODIFIED_KEY.format(user_id=user_id, version=version)
+    timestamp = cache.get(key)
+    if timestamp is None:
+        newest = _newest_update(user_id)
+        timestamp = newest.timestamp() if newest else 0
+        cache.set(key, timestamp, settings.KCP_DASHBOARD_CACHE_TTL)
+    return timestamp or None
+
+
+def invalidate_dashboard(*user_ids):
+    """Give each user's dashboard a new version after their estimates changed."""
+    version = time.time_ns()
+    cache.set_many({VERSION_KEY.format(user_id=user_id): version for user_id in set(user_ids)}, None)
@@ -0,0 +1,90 @@
+"""Synthetic users, paver block types and estimates for benchmarks and demos.
+
+Generation is deterministic for a given seed. Estimates are written with
+``bulk_create`` in batches and the sales summaries are rebuilt once at the
+end, which is much faster than keeping them current batch by batch.
+"""
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from .dashboard import invalidate_dashboard
+from .models import Estimate, PaverBlockType
+from .summaries import rebuild_summaries
+
+SHAPES = ('Zig Zag', 'I Shape', 'Hexagon', 'Rectangle', 'Cosmic', 'Milano', 'Colorado', 'Trihex')
+THICKNESSES = (40, 60, 80, 100)
+PARTY_WORDS = (
+    ('Shree', 'Jay', 'Om', 'Sai', 'New', 'Royal', 'Patel', 'Krishna', 'Umiya', 'Balaji'),
+    ('Ganesh', 'Ambika', 'Siddhi', 'Laxmi', 'Navkar', 'Sarthak', 'Avadh', 'Shiv', 'Raghuvir', 'Mahadev'),
+    ('Infra', 'Builders', 'Developers', 'Constructions', 'Estates', 'Projects', 'Enterprise', 'Associates'),
+)
+NOTES = (
+    '', '', '', 'Rates valid for 15 days.', 'Delivery at site within 7 days.',
+    'Transport extra beyond 25 km.', 'Payment 50% advance, balance on delivery.',
+)
+GST_RATES = (Decimal('0'), Decimal('5'), Decimal('12'), Decimal('18'))
+
+
+def party_names():
+    return [f'{a} {b} {c}' for a in PARTY_WORDS[0] for b in PARTY_WORDS[1] for c in PARTY_WORDS[2]]
+
+
+def ensure_block_types(count):
+    """Return ``count`` paver block types, creating the missing ones."""
+    names = [f'{shape} {thickness}mm' for thickness in THICKNESSES for shape in SHAPES]
+    while len(names) < count:
+        names.append(f'Custom {len(names) + 1}')
+    names = names[:count]
+    existing = {block_type.name: block_type for block_type in PaverBlockType.objects.filter(name__in=names)}
+    PaverBlockType.objects.bulk_create(PaverBlockType(name=name) for name in names if name not in existing)
+    return list(PaverBlockType.objects.filter(name__in=names))
+
+
+def ensure_users(prefix, count, password=None):
+    """Return ``count`` users named ``<prefix>-<n>``, creating the missing ones."""
+    users = []
+    for n in range(1, count + 1):
+        user, created = User.objects.get_or_create(username=f'{prefix}-{n}')
+        if created:
+            if password:
+                user.set_password(password)
+            else:
+                user.set_unusable_password()
+            user.save()
+        users.append(user)
+    return users
+
+
+def generate_estimates(users, block_types, count, batch_size=5000, seed=0, days=3 * 365, stdout=None):
+    """Create ``count`` estimates spread evenly over ``users``."""
+    rng = random.Random(seed)
+    parties = party_names()
+    today = date.today()
+    created = 0
+    while created < count:
+        batch = []
+        for i in range(created, min(count, created + batch_size)):
+            batch.append(Estimate(
+                party_name=rng.choice(parties),
+                date=today - timedelta(days=rng.randrange(days)),
+                paver_block_type=rng.choice(block_types),
+                price=Decimal(rng.randrange(2000, 12000)) / 100,
+                gst_percentage=rng.choice(GST_RATES),
+                transportation_charge=Decimal(rng.randrange(0, 1000)) / 100,
+                loading_unloading_cost=Decimal(rng.randrange(0, 500)) / 100,
+                notes=rng.choice(NOTES),
+                created_by=users[i % len(users)],
+            ))
+        with transaction.atomic():
+            Estimate.objects.bulk_create(batch)
+        created += len(batch)
+        if stdout is not None:
+            stdout.write(f'Created {created}/{count} estimates')
+    # bulk_create bypasses the signals that maintain the summaries.
+    rebuild_summaries(stdout=None)
+    invalidate_dashboard(*(user.pk for user in users))
+    return created
@@ -1,5 +1,6 @@
 from django import forms
 from django.contrib.auth.forms import AuthenticationForm
+from .catalogue import paver_block_type_choices
 from .models import Estimate, PaverBlockType
 
 class CustomLoginForm(AuthenticationForm):
@@ -38,4 +39,86 @@ class EstimateForm(forms.ModelForm):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.fields['paver_block_type'].empty_label = "Select Paver Block Type" 
\ No newline at end of file
+        self.fields['paver_block_type'].empty_label = "Select Paver Block Type"
+        # Rendered from the cached catalogue; the queryset is only used to
+        # validate a submitted choice.
+        self.fields['paver_block_type'].choices = paver_block_type_choices("Select Paver Block Type")
+
+class BulkExportForm(forms.Form):
+    """Which estimates to export: ticked ids, or else the filters."""
+    party_name = forms.CharField(required=False, widget=forms.TextInput(attrs={
+        'class': 'form-control form-control-sm', 'placeholder': 'Party name'
+    }))
+    date_from = forms.DateField(required=False, widget=forms.DateInput(attrs={
+        'class': 'form-control form-control-sm', 'type': 'date'
+    }))
+    date_to = forms.DateField(required=False, widget=forms.DateInput(attrs={
+        'class': 'form-control form-control-sm', 'type': 'date'
+    }))
+
+    def filter(self, estimates, estimate_ids=None):
+        if estimate_ids:
+            return estimates.filter(id__in=estimate_ids)
+        data = self.cleaned_data
+        if data.get('party_name'):
+            estimates = estimates.filter(party_name__icontains=data['party_name'])
+        if data.get('date_from'):
+            estimates = estimates.filter(date__gte=data['date_from'])
+        if data.get('date_to'):
+            estimates = estimates.filter(date__lte=data['date_to'])
+        return estimates
+
+
+class PartyStatementForm(forms.Form):
+    """One party's estimates, optionally limited to a month or a date range."""
+    party_name = forms.CharField(max_length=200)
+    month = forms.DateField(required=False, input_formats=['%Y-%m'])
+    date_from = forms.DateField(required=False)
+    date_to = forms.DateField(required=False)
+    summary = forms.BooleanField(required=False)
+    format = forms.ChoiceField(required=False, choices=[('pdf', 'PDF'), ('docx', 'Word')])
+
+    def filter(self, estimates):
+        data = self.cleaned_data
+        estimates = estimates.filter(party_name=data['party_name'])
+        if data.get('month'):
+            estimates = estimates.filter(date__year=data['month'].year, date__month=data['month'].month)
+        if data.get('date_from'):
+            estimates = estimates.filter(date__gte=data['date_from'])
+        if data.get('date_to'):
+            estimates = estimates.filter(date__lte=data['date_to'])
+        return estimates
+
+
+class EstimateSearchForm(forms.Form):
+    q = forms.CharField(required=False, widget=forms.TextInput(attrs={
+        'class': 'form-control', 'placeholder': 'Party name or notes'
+    }))
+    date_from = forms.DateField(required=False, widget=forms.DateInput(attrs={
+        'class': 'form-control', 'type': 'date'
+    }))
+    date_to = forms.DateField(required=False, widget=forms.DateInput(attrs={
+        'class': 'form-control', 'type': 'date'
+    }))
+    paver_block_type = forms.ModelChoiceField(
+        queryset=PaverBlockType.objects.all(), required=False, empty_label='Any paver block type',
+        widget=forms.Select(attrs={'class': 'form-control'}),
+    )
+    min_total = forms.DecimalField(required=False, widget=forms.NumberInput(attrs={
+        'class': 'form-control', 'step': '0.01', 'placeholder': 'Min total'
+    }))
+    max_total = forms.DecimalField(required=False, widget=forms.NumberInput(attrs={
+        'class': 'form-control', 'step': '0.01', 'placeholder': 'Max total'
+    }))
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['paver_block_type'].choices = paver_block_type_choices('Any paver block type')
+
+
+class EstimateImportForm(forms.Form):
+    file = forms.FileField(widget=forms.ClearableFileInput(attrs={
+        'class': 'form-control', 'accept': '.csv,.xlsx'
+    }))
+    dry_run = forms.BooleanField(required=False, label='Only validate, do not import',
+                                 widget=forms.CheckboxInput(attrs={'class': 'form-check-input'}))
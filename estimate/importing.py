@@ -0,0 +1,217 @@
+"""Bulk import of estimates from CSV or XLSX files.
+
+Rows are read and validated one at a time, so a file is never held in
+memory, and valid rows are written in chunks: each chunk is inserted with
+one ``bulk_create`` (the database computes GST and totals) and updates the
+sales summaries, all in one transaction. Paver block types are resolved
+by name (case-insensitively) from a single query. Invalid rows are skipped
+and reported with their line number; the rest of the file still imports.
+
+The first row must be a header naming the columns in ``COLUMNS``; their
+order does not matter and ``gst_percentage``, ``transportation_charge``,
+``loading_unloading_cost`` and ``notes`` may be left out.
+"""
+import csv
+import io
+import logging
+import os
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+
+from .models import Estimate, PaverBlockType
+from .dashboard import invalidate_dashboard
+from .summaries import apply_estimates, summary_values
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = (
+    'party_name', 'date', 'paver_block_type', 'price', 'gst_percentage',
+    'transportation_charge', 'loading_unloading_cost', 'notes',
+)
+REQUIRED_COLUMNS = ('party_name', 'date', 'paver_block_type', 'price')
+DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y')
+CENT = Decimal('0.01')
+# Largest value that fits the estimate's max_digits=10, decimal_places=2 columns.
+MAX_AMOUNT = Decimal('99999999.99')
+
+
+class ImportFileError(Exception):
+    """The file as a whole cannot be imported (unknown format, bad header)."""
+
+
+class ImportResult:
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.errors = []
+
+    def add_error(self, line, message):
+        self.errors.append((line, message))
+
+    @property
+    def failed(self):
+        return len(self.errors)
+
+
+def _header_key(value):
+    return str(value or '').strip().lower().replace(' ', '_')
+
+
+def _read_csv(f):
+    reader = csv.reader(io.TextIOWrapper(f, encoding='utf-8-sig', newline=''))
+    for line, row in enumerate(reader, start=1):
+        yield line, row
+
+
+def _read_xlsx(f):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ImportFileError("Importing XLSX files requires openpyxl")
+    try:
+        workbook = load_workbook(f, read_only=True, data_only=True)
+    except Exception as e:
+        raise ImportFileError(f"The file is not a readable XLSX workbook: {e}")
+    try:
+        for line, row in enumerate(workbook.active.iter_rows(values_only=True), start=1):
+            yield line, row
+    finally:
+        workbook.close()
+
+
+def read_rows(f, filename):
+    """Yield ``(line number, {column: value})`` for each data row of ``f``."""
+    extension = os.path.splitext(filename)[1].lower()
+    if extension == '.csv':
+        lines = _read_csv(f)
+    elif extension == '.xlsx':
+        lines = _read_xlsx(f)
+    else:
+        raise ImportFileError(f"Unsupported file type '{extension}'; upload a .csv or .xlsx file")
+
+    try:
+        _, header = next(lines)
+    except StopIteration:
+        raise ImportFileError("The file is empty")
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise ImportFileError(f"The file could not be read: {e}")
+    header = [_header_key(name) for name in header]
+    missing = [column for column in REQUIRED_COLUMNS if column not in header]
+    if missing:
+        raise ImportFileError(f"Missing column(s): {', '.join(missing)}")
+
+    positions = [(column, header.index(column)) for column in COLUMNS if column in header]
+    line = 1
+    try:
+        for line, row in lines:
+            if not any(value not in (None, '') for value in row):
+                continue
+            yield line, {column: row[i] if i < len(row) else None for column, i in positions}
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise ImportFileError(f"The file could not be read after line {line}: {e}")
+
+
+def _parse_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    text = str(value or '').strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            pass
+    raise ValueError(f"invalid date '{text}' (use YYYY-MM-DD or DD/MM/YYYY)")
+
+
+def _parse_amount(value, column, required=False):
+    if value is None or str(value).strip() == '':
+        if required:
+            raise ValueError(f"{column} is required")
+        return Decimal('0.00')
+    try:
+        amount = Decimal(str(value).strip().replace(',', '')).quantize(CENT)
+    except InvalidOperation:
+        raise ValueError(f"{column} '{value}' is not a number")
+    if not amount.is_finite():
+        raise ValueError(f"{column} '{value}' is not a number")
+    if amount < 0 or amount > MAX_AMOUNT:
+        raise ValueError(f"{column} {amount} is out of range")
+    return amount
+
+
+def validate_row(row, block_types, block_type_id=None):
+    """Return the estimate fields for one row, or raise ValueError.
+
+    The paver block type is looked up by name in ``block_types`` unless the
+    caller already resolved its ``block_type_id``.
+    """
+    party_name = str(row.get('party_name') or '').strip()
+    if not party_name:
+        raise ValueError("party_name is required")
+    if len(party_name) > 200:
+        raise ValueError("party_name is longer than 200 characters")
+    if block_type_id is None:
+        block_type_name = str(row.get('paver_block_type') or '').strip()
+        block_type_id = block_types.get(block_type_name.casefold())
+        if block_type_id is None:
+            raise ValueError(f"unknown paver block type '{block_type_name}'")
+    gst_percentage = _parse_amount(row.get('gst_percentage'), 'gst_percentage')
+    if gst_percentage > 100:
+        raise ValueError(f"gst_percentage {gst_percentage} is over 100")
+    return {
+        'party_name': party_name,
+        'date': _parse_date(row.get('date')),
+        'paver_block_type_id': block_type_id,
+        'price': _parse_amount(row.get('price'), 'price', required=True),
+        'gst_percentage': gst_percentage,
+        'transportation_charge': _parse_amount(row.get('transportation_charge'), 'transportation_charge'),
+        'loading_unloading_cost': _parse_amount(row.get('loading_unloading_cost'), 'loading_unloading_cost'),
+        'notes': str(row.get('notes') or '').strip(),
+    }
+
+
+def create_estimates(rows, user):
+    """Insert ``validate_row`` results as estimates owned by ``user`` in one transaction."""
+    estimates = [Estimate(created_by=user, **row) for row in rows]
+    with transaction.atomic():
+        # The database computes gst_amount and total_amount, and returns them
+        # with the inserted rows.
+        Estimate.objects.bulk_create(estimates)
+        # bulk_create skips the save signals that keep the summaries current.
+        apply_estimates(added=[summary_values(estimate) for estimate in estimates])
+        transaction.on_commit(lambda: invalidate_dashboard(user.pk))
+    return estimates
+
+
+def import_estimates(f, filename, user, chunk_size=1000, dry_run=False):
+    """Import every valid row of ``f`` as an estimate owned by ``user``.
+
+    Returns an ``ImportResult``; with ``dry_run`` the rows are validated but
+    nothing is written.
+    """
+    block_types = {
+        name.casefold(): pk for pk, name in PaverBlockType.objects.values_list('pk', 'name')
+    }
+    result = ImportResult()
+    chunk = []
+    for line, row in read_rows(f, filename):
+        result.rows += 1
+        try:
+            chunk.append(validate_row(row, block_types))
+        except ValueError as e:
+            result.add_error(line, str(e))
+            continue
+        if len(chunk) >= chunk_size:
+            result.created += len(chunk) if dry_run else len(create_estimates(chunk, user))
+            chunk = []
+    if chunk:
+        result.created += len(chunk) if dry_run else len(create_estimates(chunk, user))
+    logger.info(
+        f"Imported {result.created} of {result.rows} rows from {filename} "
+        f"for {user} ({result.failed} rejected{', dry run' if dry_run else ''})"
+    )
+    return result
@@ -0,0 +1,166 @@
+"""Background rendering: RenderJob rows are queued by the web process and
+claimed by ``manage.py render_worker`` processes.
+
+Finished PDFs are stored in the render cache under the job's ``result_key``;
+if the cache has since dropped the file (eviction, or the estimate changed),
+the download renders it again.
+
+Workers record a heartbeat in the shared Django cache. When none has been
+seen for ``settings.KCP_RENDER_WORKER_TIMEOUT`` seconds, ``enqueue_render``
+renders in the calling process instead of queueing a job nobody will claim.
+"""
+import logging
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import RenderJob
+from .rendering.cache import get_render_cache
+from .rendering.service import document_key, get_estimate_pdf, resolve_engine
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 3
+HEARTBEAT_KEY = 'estimate:render-worker:heartbeat'
+HEARTBEAT_INTERVAL = 5
+
+
+def heartbeat():
+    """Record that a render worker is alive."""
+    cache.set(HEARTBEAT_KEY, time.time(), None)
+
+
+def worker_alive():
+    last = cache.get(HEARTBEAT_KEY)
+    return last is not None and time.time() - last < settings.KCP_RENDER_WORKER_TIMEOUT
+
+
+def enqueue_render(estimate, user, engine=None):
+    """Queue a render of ``estimate``, reusing an unfinished job for the same document.
+
+    When the PDF is already cached, a finished job for it is returned instead.
+    When no worker is alive the PDF is rendered now (which may raise
+    ``RenderBusy``) and a finished job is returned.
+    """
+    engine = resolve_engine(engine)
+    existing = RenderJob.objects.filter(
+        estimate=estimate, engine=engine, status__in=[RenderJob.PENDING, RenderJob.RUNNING],
+    ).first()
+    if existing is not None:
+        return existing
+
+    key = document_key(estimate, engine)
+    cache = get_render_cache()
+    if cache is not None and cache.exists(estimate.pk, key):
+        finished = RenderJob.objects.filter(
+            estimate=estimate, engine=engine, status=RenderJob.DONE, result_key=key,
+        ).last()
+        if finished is not None:
+            return finished
+        now = timezone.now()
+        return RenderJob.objects.create(
+            estimate=estimate, created_by=user, engine=engine, status=RenderJob.DONE,
+            result_key=key, started_at=now, finished_at=now,
+        )
+    if not worker_alive():
+        logger.warning(f"No render worker alive; rendering estimate {estimate.pk} in the web process")
+        _, key = get_estimate_pdf(estimate, engine, key=key)
+        now = timezone.now()
+        return RenderJob.objects.create(
+            estimate=estimate, created_by=user, engine=engine, status=RenderJob.DONE,
+            result_key=key, started_at=now, finished_at=now,
+        )
+    return RenderJob.objects.create(estimate=estimate, created_by=user, engine=engine)
+
+
+def job_payload(job, api=False):
+    """The JSON status of ``job`` returned by the render job endpoints.
+
+    With ``api`` the URLs point at the API endpoints, which accept Basic auth.
+    """
+    prefix = 'api_' if api else ''
+    payload = {
+        'id': job.id,
+        'status': job.status,
+        'status_url': reverse(f'{prefix}render_job_status', args=[job.id]),
+    }
+    if job.status == RenderJob.DONE:
+        payload['download_url'] = reverse(f'{prefix}render_job_download', args=[job.id])
+    elif job.status == RenderJob.FAILED:
+        payload['error'] = job.error
+    return payload
+
+
+def claim_next_job():
+    """Atomically move the oldest pending job to running and return it (or None)."""
+    while True:
+        job = RenderJob.objects.filter(status=RenderJob.PENDING).order_by('created_at').first()
+        if job is None:
+            return None
+        claimed = RenderJob.objects.filter(pk=job.pk, status=RenderJob.PENDING).update(
+            status=RenderJob.RUNNING, started_at=timezone.now(), attempts=F('attempts') + 1,
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+        # Another worker won the race; try the next one.
+
+
+def run_job(job):
+    try:
+        estimate = job.estimate
+        _, key = get_estimate_pdf(estimate, job.engine, block=True)
+    except Exception as e:
+        logger.error(f"Render job {job.pk} failed: {e}\n{traceback.format_exc()}")
+        job.status = RenderJob.FAILED if job.attempts >= MAX_ATTEMPTS else RenderJob.PENDING
+        job.error = str(e)
+    else:
+        job.status = RenderJob.DONE
+        job.result_key = key
+        job.error = ''
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'result_key', 'error', 'finished_at'])
+    return job
+
+
+def requeue_stale_jobs(older_than):
+    """Put back jobs whose worker died mid-render (running for ``older_than`` seconds)."""
+    cutoff = timezone.now() - timedelta(seconds=older_than)
+    stale = RenderJob.objects.filter(status=RenderJob.RUNNING, started_at__lt=cutoff)
+    with transaction.atomic():
+        failed = stale.filter(attempts__gte=MAX_ATTEMPTS).update(
+            status=RenderJob.FAILED, error='Worker stopped while rendering', finished_at=timezone.now(),
+        )
+        requeued = stale.update(status=RenderJob.PENDING)
+    if failed or requeued:
+        logger.warning(f"Requeued {requeued} and failed {failed} stale render jobs")
+
+
+def work(poll_interval=1.0, stale_after=300, max_jobs=None, once=False):
+    """Process jobs until ``max_jobs`` are done, or the queue is empty when ``once``."""
+    done = 0
+    last_sweep = 0.0
+    last_beat = 0.0
+    while max_jobs is None or done < max_jobs:
+        if time.monotonic() - last_beat >= HEARTBEAT_INTERVAL:
+            heartbeat()
+            last_beat = time.monotonic()
+        if time.monotonic() - last_sweep > stale_after / 2:
+            requeue_stale_jobs(stale_after)
+            last_sweep = time.monotonic()
+        job = claim_next_job()
+        if job is None:
+            if once:
+                break
+            time.sleep(poll_interval)
+            continue
+        run_job(job)
+        done += 1
+    return done
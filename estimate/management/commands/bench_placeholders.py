@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from estimate.benchmarks import bench_placeholders
+
+
+class Command(BaseCommand):
+    help = 'Compare the placeholder substitution engine with the legacy implementation'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        result = bench_placeholders(options['iterations'])
+        self.stdout.write(
+            f"{result['paragraphs']} paragraphs x {result['iterations']} documents\n"
+            f"  legacy:   {result['legacy_us_per_doc']:.1f} us/doc\n"
+            f"  engine:   {result['engine_us_per_doc']:.1f} us/doc\n"
+            f"  compiled: {result['compiled_us_per_doc']:.1f} us/doc\n"
+            f"  speedup:  {result['speedup']:.1f}x"
+        )
@@ -0,0 +1,36 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand
+
+from estimate.benchmarks import bench_startup
+
+
+class Command(BaseCommand):
+    help = 'Measure web worker import time and memory, with and without preloading'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--requests', type=int, default=20)
+        parser.add_argument('--no-gunicorn', action='store_true',
+                            help='Only measure imports (no gunicorn, e.g. off Linux)')
+        parser.add_argument('--json', action='store_true', help='Print the raw result as JSON')
+
+    def handle(self, *args, **options):
+        result = bench_startup(options['workers'], options['requests'],
+                               gunicorn=not options['no_gunicorn'] and sys.platform == 'linux')
+        if options['json']:
+            self.stdout.write(json.dumps(result, indent=2))
+            return
+        for name in ('lazy', 'eager'):
+            profile = result[name]
+            self.stdout.write(
+                f"{name:>6} boot: {profile['import_ms']:7.1f} ms imports, "
+                f"{profile['max_rss_mb']:6.1f} MB max RSS, "
+                f"heavy modules: {', '.join(profile['heavy_modules']) or 'none'}"
+            )
+        for name, memory in result.get('per_worker', {}).items():
+            self.stdout.write(
+                f"{name:>10}: per worker {memory['rss_mb']:6.1f} MB RSS, "
+                f"{memory['pss_mb']:6.1f} MB PSS, {memory['uss_mb']:6.1f} MB private"
+            )
@@ -0,0 +1,115 @@
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timezone
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import override_settings
+
+from estimate.benchmarks import run_suite
+
+
+# The benchmark database reuses primary keys of the real one, so cached
+# users, catalogue, dashboards and rendered PDFs must not share its caches.
+BENCHMARK_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'benchmark',
+    }
+}
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _lower_is_better(metric):
+    return not metric.endswith('_per_s')
+
+
+class Command(BaseCommand):
+    help = ('Run the performance benchmarks against a separate benchmark database, '
+            'write the results as JSON and fail on regressions')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000, 1000000],
+                            help='Dashboard row counts to measure')
+        parser.add_argument('--repeats', type=int, default=30)
+        parser.add_argument('--output', help='Write the JSON results to this file')
+        parser.add_argument('--baseline', help='JSON results of an earlier run to compare against')
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='Allowed slowdown against --baseline (0.25 = 25%%)')
+        parser.add_argument('--fresh', action='store_true',
+                            help='Recreate the benchmark database instead of reusing its data')
+
+    def handle(self, *args, **options):
+        # Generated rows live in the test database, kept between runs so the
+        # 1M-row dataset is only built once.
+        test_settings = connection.settings_dict.setdefault('TEST', {})
+        if connection.vendor == 'sqlite' and not test_settings.get('NAME'):
+            test_settings['NAME'] = os.path.join(settings.BASE_DIR, 'benchmark.sqlite3')
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False,
+                                           keepdb=not options['fresh'])
+        try:
+            with tempfile.TemporaryDirectory(prefix='kcp-benchmark-') as render_cache, \
+                    override_settings(CACHES=BENCHMARK_CACHES,
+                                      KCP_RENDER_CACHE=dict(settings.KCP_RENDER_CACHE, DIR=render_cache)):
+                try:
+                    metrics = run_suite(options['sizes'], options['repeats'], stdout=self.stdout)
+                finally:
+                    cache.clear()
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=True)
+
+        result = {
+            'meta': {
+                'commit': _commit(),
+                'timestamp': datetime.now(timezone.utc).isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'platform': sys.platform,
+            },
+            'metrics': metrics,
+        }
+        for metric, value in sorted(metrics.items()):
+            self.stdout.write(f'{metric:40} {value:12.2f}')
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(result, f, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+        failures = []
+        for metric, limit in settings.KCP_BENCHMARK_BUDGET.items():
+            value = metrics.get(metric)
+            if value is None:
+                continue
+            if value > limit if _lower_is_better(metric) else value < limit:
+                failures.append(f'{metric} = {value:.2f} (budget {limit})')
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)['metrics']
+            for metric, value in metrics.items():
+                before = baseline.get(metric)
+                if not before:
+                    continue
+                change = value / before - 1 if _lower_is_better(metric) else before / value - 1
+                if change > options['tolerance']:
+                    failures.append(f'{metric} = {value:.2f}, {change:.0%} worse than baseline {before:.2f}')
+        if failures:
+            raise CommandError('Benchmark regressions:\n  ' + '\n  '.join(failures))
+        self.stdout.write(self.style.SUCCESS('Within budget'))
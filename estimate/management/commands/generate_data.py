@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from estimate.datagen import ensure_block_types, ensure_users, generate_estimates
+
+
+class Command(BaseCommand):
+    help = 'Create synthetic users, paver block types and estimates'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--block-types', type=int, default=8)
+        parser.add_argument('--estimates', type=int, default=10000,
+                            help='Total estimates, spread evenly over the users')
+        parser.add_argument('--prefix', default='demo', help='Usernames are <prefix>-<n>')
+        parser.add_argument('--password', help='Password for new users (default: unusable)')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        users = ensure_users(options['prefix'], options['users'], options['password'])
+        block_types = ensure_block_types(options['block_types'])
+        count = generate_estimates(
+            users, block_types, options['estimates'],
+            batch_size=options['batch_size'], seed=options['seed'], stdout=self.stdout,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {count} estimates for {len(users)} users and {len(block_types)} '
+            f'block types in {time.monotonic() - started:.1f}s'
+        ))
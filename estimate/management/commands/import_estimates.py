@@ -0,0 +1,46 @@
+import os
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from estimate.importing import ImportFileError, import_estimates
+
+
+class Command(BaseCommand):
+    help = 'Import estimates from a CSV or XLSX file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--user', required=True, help='Username that will own the estimates')
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Rows written per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Validate without writing')
+        parser.add_argument('--max-errors', type=int, default=50,
+                            help='How many row errors to print')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named '{options['user']}'")
+
+        started = time.monotonic()
+        try:
+            with open(options['path'], 'rb') as f:
+                result = import_estimates(f, os.path.basename(options['path']), user,
+                                          chunk_size=options['chunk_size'],
+                                          dry_run=options['dry_run'])
+        except (OSError, ImportFileError) as e:
+            raise CommandError(str(e))
+        elapsed = time.monotonic() - started
+
+        for line, message in result.errors[:options['max_errors']]:
+            self.stderr.write(f'line {line}: {message}')
+        if result.failed > options['max_errors']:
+            self.stderr.write(f'... and {result.failed - options["max_errors"]} more errors')
+        verb = 'validated' if options['dry_run'] else 'imported'
+        self.stdout.write(self.style.SUCCESS(
+            f'{result.created} of {result.rows} rows {verb} in {elapsed:.1f}s '
+            f'({result.failed} rejected)'
+        ))
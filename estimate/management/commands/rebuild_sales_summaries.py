@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from estimate.summaries import rebuild_summaries
+
+
+class Command(BaseCommand):
+    help = 'Recompute the monthly sales summary tables from all estimates'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000,
+                            help='Estimates aggregated per query')
+
+    def handle(self, *args, **options):
+        counts = rebuild_summaries(options['chunk_size'], stdout=self.stdout)
+        for model, count in counts.items():
+            self.stdout.write(f'{model}: {count} rows')
+        self.stdout.write(self.style.SUCCESS('Sales summaries rebuilt'))
@@ -0,0 +1,66 @@
+import logging
+import multiprocessing
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from estimate.jobs import work
+
+logger = logging.getLogger(__name__)
+
+
+def _work(options):
+    work(
+        poll_interval=options['poll_interval'],
+        stale_after=options['stale_after'],
+        max_jobs=options['max_jobs'],
+        once=options['once'],
+    )
+
+
+class Command(BaseCommand):
+    help = 'Process queued PDF render jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1,
+                            help='Number of worker processes to run')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--stale-after', type=int, default=300,
+                            help='Requeue jobs left running for this many seconds')
+        parser.add_argument('--max-jobs', type=int, default=None,
+                            help='Exit after this many jobs (per process)')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit when the queue is empty')
+
+    def handle(self, *args, **options):
+        if options['processes'] <= 1:
+            _work(options)
+            return
+
+        # Children must not share the parent's database connection.
+        connections.close_all()
+
+        def start():
+            process = multiprocessing.Process(target=_work, args=(options,), daemon=True)
+            process.start()
+            return process
+
+        processes = [start() for _ in range(options['processes'])]
+        try:
+            while processes:
+                time.sleep(1)
+                for i, process in enumerate(processes):
+                    if process.is_alive():
+                        continue
+                    # Done with --once or --max-jobs: not replaced. Crashed: replaced.
+                    if process.exitcode == 0 and (options['once'] or options['max_jobs']):
+                        processes[i] = None
+                        continue
+                    logger.warning(f"Render worker {process.pid} exited with {process.exitcode}; restarting it")
+                    processes[i] = start()
+                processes = [process for process in processes if process is not None]
+        except KeyboardInterrupt:
+            for process in processes:
+                process.terminate()
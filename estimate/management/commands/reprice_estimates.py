@@ -0,0 +1,90 @@
+from decimal import Decimal, InvalidOperation
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.dateparse import parse_date
+
+from estimate.dashboard import invalidate_dashboard
+from estimate.models import Estimate, PaverBlockType
+from estimate.search import search_estimates
+from estimate.summaries import refresh_summaries, summary_spans
+
+
+MAX_AMOUNT = Decimal('99999999.99')
+
+
+def _amount(options, name, maximum=MAX_AMOUNT):
+    value = options[name]
+    if value is None:
+        return None
+    try:
+        amount = Decimal(value.strip().replace(',', ''))
+    except InvalidOperation:
+        raise CommandError(f"--{name} '{value}' is not a number")
+    if not amount.is_finite():
+        raise CommandError(f"--{name} '{value}' is not a number")
+    if amount < 0 or amount > maximum:
+        raise CommandError(f'--{name} {amount} is out of range (0 to {maximum})')
+    return amount.quantize(Decimal('0.01'))
+
+
+def _date(options, name):
+    value = options[name.replace('-', '_')]
+    if not value:
+        return None
+    try:
+        parsed = parse_date(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise CommandError(f"--{name} '{value}' is not a valid YYYY-MM-DD date")
+    return parsed
+
+
+class Command(BaseCommand):
+    help = 'Change the GST rate and/or transport charge of matching estimates in one UPDATE'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', required=True, help='Username whose estimates are repriced')
+        parser.add_argument('--gst', help='New GST percentage')
+        parser.add_argument('--transport', help='New transportation charge')
+        parser.add_argument('--party', default='', help='Only estimates matching this party name or note text')
+        parser.add_argument('--date-from', help='Only estimates dated on or after YYYY-MM-DD')
+        parser.add_argument('--date-to', help='Only estimates dated on or before YYYY-MM-DD')
+        parser.add_argument('--paver-block-type', help='Only estimates of this paver block type (name)')
+        parser.add_argument('--dry-run', action='store_true', help='Count matches without changing them')
+
+    def handle(self, *args, **options):
+        if options['gst'] is None and options['transport'] is None:
+            raise CommandError('Give --gst and/or --transport')
+        # Checked up front: the UPDATE below reprices every match at once.
+        gst = _amount(options, 'gst', maximum=Decimal('100'))
+        transport = _amount(options, 'transport')
+        date_from = _date(options, 'date-from')
+        date_to = _date(options, 'date-to')
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named '{options['user']}'")
+        paver_block_type = None
+        if options['paver_block_type']:
+            paver_block_type = PaverBlockType.objects.filter(name__iexact=options['paver_block_type']).first()
+            if paver_block_type is None:
+                raise CommandError(f"No paver block type named '{options['paver_block_type']}'")
+
+        estimates = search_estimates(
+            Estimate.objects.filter(created_by=user), q=options['party'],
+            date_from=date_from, date_to=date_to,
+            paver_block_type=paver_block_type,
+        )
+        if options['dry_run']:
+            self.stdout.write(f'{estimates.count()} estimates would be repriced')
+            return
+
+        with transaction.atomic():
+            spans = summary_spans(estimates)
+            changed = estimates.reprice(gst_percentage=gst, transportation_charge=transport)
+            refresh_summaries(spans)
+            transaction.on_commit(lambda: invalidate_dashboard(user.pk))
+        self.stdout.write(self.style.SUCCESS(f'Repriced {changed} estimates'))
@@ -0,0 +1,99 @@
+import multiprocessing
+import os
+import random
+import time
+from collections import Counter
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections, transaction
+
+from estimate.models import Estimate, PaverBlockType
+
+STRESS_USERNAME = 'stress-test'
+
+
+def _operation(rng, user, paver_block_type, own_ids):
+    op = rng.choice(('create', 'create', 'update', 'delete', 'session', 'read', 'read'))
+    if op == 'create' or (op in ('update', 'delete') and not own_ids):
+        estimate = Estimate.objects.create(
+            party_name=f'Stress party {rng.randrange(50)}', date=date(2025, rng.randint(1, 12), 1),
+            paver_block_type=paver_block_type, price=Decimal(rng.randrange(100, 1000)),
+            gst_percentage=18, created_by=user,
+        )
+        own_ids.append(estimate.pk)
+        return 'create'
+    if op == 'update':
+        estimate = Estimate.objects.get(pk=rng.choice(own_ids))
+        estimate.price += 1
+        estimate.save()
+    elif op == 'delete':
+        Estimate.objects.filter(pk=own_ids.pop(rng.randrange(len(own_ids)))).delete()
+    elif op == 'session':
+        with transaction.atomic():
+            session = SessionStore()
+            session['stress'] = rng.random()
+            session.create()
+            session.delete()
+    else:
+        list(Estimate.objects.filter(created_by=user).order_by('-created_at', '-id')[:50])
+    return op
+
+
+def _hammer(worker, seconds, user_id, paver_block_type_id):
+    rng = random.Random(worker)
+    user = User.objects.get(pk=user_id)
+    paver_block_type = PaverBlockType.objects.get(pk=paver_block_type_id)
+    counts = Counter()
+    own_ids = []
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        try:
+            counts[_operation(rng, user, paver_block_type, own_ids)] += 1
+        except OperationalError as e:
+            counts['locked' if 'locked' in str(e) else f'error: {e}'] += 1
+    connection.close()
+    return counts
+
+
+class Command(BaseCommand):
+    help = 'Run concurrent writes from several processes and report database lock errors'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=int(os.environ.get('WEB_CONCURRENCY', 4)),
+                            help='Concurrent processes (defaults to WEB_CONCURRENCY, else 4)')
+        parser.add_argument('--seconds', type=float, default=10.0)
+
+    def handle(self, *args, **options):
+        user, _ = User.objects.get_or_create(username=STRESS_USERNAME)
+        paver_block_type, _ = PaverBlockType.objects.get_or_create(name='Stress test')
+        self.stdout.write(
+            f"{options['workers']} workers for {options['seconds']}s on "
+            f"{connection.vendor} ({connection.settings_dict['NAME']})"
+        )
+
+        # Children must not share the parent's database connection.
+        connections.close_all()
+        try:
+            with multiprocessing.Pool(options['workers']) as pool:
+                results = pool.starmap(_hammer, [
+                    (worker, options['seconds'], user.pk, paver_block_type.pk)
+                    for worker in range(options['workers'])
+                ])
+        finally:
+            # Deleting the user takes its estimates and summaries with it.
+            user.delete()
+            paver_block_type.delete()
+
+        total = sum(results, Counter())
+        errors = {op: n for op, n in total.items() if op == 'locked' or op.startswith('error')}
+        operations = sum(n for op, n in total.items() if op not in errors)
+        for op, n in sorted(total.items()):
+            self.stdout.write(f'  {op}: {n}')
+        self.stdout.write(f"{operations / options['seconds']:.0f} operations/s")
+        if errors:
+            raise CommandError(f'{sum(errors.values())} operations failed: {errors}')
+        self.stdout.write(self.style.SUCCESS('No lock errors'))
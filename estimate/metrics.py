@@ -0,0 +1,276 @@
+"""Request, render stage and database metrics in the Prometheus text format.
+
+Each process keeps its counters and histograms in memory and writes them to
+``<KCP_METRICS['DIR']>/<pid>.json`` at most every ``FLUSH_INTERVAL`` seconds
+(and at exit), so the ``/metrics`` view can add up every gunicorn worker and
+render worker without a metrics server or client library. Processes that
+recorded nothing (``manage.py check``, converter children) write no file.
+On each scrape the files of exited processes are folded into
+``aggregate.json`` and deleted, so their counts stay part of the cumulative
+totals while the directory holds one file per live process.
+
+Record with ``observe``/``increment`` or time a block with ``stage``::
+
+    with stage('convert'):
+        pdf = convert_docx_to_pdf(docx)
+"""
+import atexit
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows: files of exited processes are left in place
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds; a render can take tens of seconds on a cold office worker.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+HELP = {
+    'kcp_request_duration_seconds': ('histogram', 'Time spent handling a request, by view.'),
+    'kcp_requests_total': ('counter', 'Requests handled, by view and status code.'),
+    'kcp_render_stage_duration_seconds': ('histogram', 'Time spent in each document rendering stage.'),
+    'kcp_db_queries_total': ('counter', 'Database queries run while handling requests, by view.'),
+    'kcp_db_query_duration_seconds': ('histogram', 'Time spent in one database query, by view.'),
+    'kcp_conversion_failures_total': ('counter', 'Failed DOCX to PDF conversions, by reason.'),
+    'kcp_render_admission_wait_seconds': ('histogram', 'Time a render waited for a render slot.'),
+    'kcp_render_rejected_total': ('counter', 'Renders refused by admission control, by reason.'),
+}
+AGGREGATE_FILE = 'aggregate.json'
+# {name: (help, callable)} read at scrape time rather than recorded.
+_gauges = {}
+
+_lock = threading.Lock()
+# {name: {labels: value}} and {name: {labels: [bucket counts..., +Inf count, sum]}}
+_counters = {}
+_histograms = {}
+_state = {'pid': None, 'flushed': 0.0}
+
+
+def _reset_after_fork():
+    # A forked child starts with the parent's numbers, which the parent reports.
+    if _state['pid'] != os.getpid():
+        _counters.clear()
+        _histograms.clear()
+        _state.update(pid=os.getpid(), flushed=time.monotonic())
+
+
+def _key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def increment(name, amount=1, **labels):
+    with _lock:
+        _reset_after_fork()
+        series = _counters.setdefault(name, {})
+        series[_key(labels)] = series.get(_key(labels), 0) + amount
+    _maybe_flush()
+
+
+def observe(name, seconds, **labels):
+    with _lock:
+        _reset_after_fork()
+        series = _histograms.setdefault(name, {})
+        values = series.setdefault(_key(labels), [0] * (len(BUCKETS) + 1) + [0.0])
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                values[i] += 1
+        values[len(BUCKETS)] += 1
+        values[-1] += seconds
+    _maybe_flush()
+
+
+def register_gauge(name, help_text, func):
+    """Report ``func()`` as gauge ``name`` on every scrape."""
+    _gauges[name] = (help_text, func)
+
+
+@contextmanager
+def stage(name):
+    """Time the enclosed block as render stage ``name``."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe('kcp_render_stage_duration_seconds', time.perf_counter() - started, stage=name)
+
+
+def _directory():
+    return settings.KCP_METRICS.get('DIR')
+
+
+def _snapshot():
+    with _lock:
+        _reset_after_fork()
+        return _dump(_counters, _histograms)
+
+
+def flush():
+    """Write this process's metrics to its file in the metrics directory."""
+    directory = _directory()
+    if not directory:
+        return
+    data = _snapshot()
+    _state['flushed'] = time.monotonic()
+    if not data['counters'] and not data['histograms']:
+        return
+    try:
+        os.makedirs(directory, exist_ok=True)
+        _write(os.path.join(directory, f'{os.getpid()}.json'), data)
+    except OSError as e:
+        logger.warning(f"Could not write metrics to {directory}: {e}")
+
+
+def _maybe_flush():
+    if time.monotonic() - _state['flushed'] >= settings.KCP_METRICS.get('FLUSH_INTERVAL', 5):
+        flush()
+
+
+atexit.register(flush)
+
+
+def _read(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write(path, data):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _dump(counters, histograms):
+    def dump(metrics):
+        return {name: [[list(labels), value] for labels, value in series.items()]
+                for name, series in metrics.items()}
+
+    return {'counters': dump(counters), 'histograms': dump(histograms)}
+
+
+def _fold_exited(directory):
+    """Add the files of exited processes to the aggregate file and delete them."""
+    if fcntl is None or not os.path.isdir(directory):
+        return
+    with open(os.path.join(directory, '.lock'), 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            exited = [
+                name for name in os.listdir(directory)
+                if name.endswith('.json') and name[:-5].isdigit() and not _alive(int(name[:-5]))
+            ]
+            if not exited:
+                return
+            aggregate = os.path.join(directory, AGGREGATE_FILE)
+            snapshots = [_read(aggregate)] if os.path.exists(aggregate) else []
+            for name in exited:
+                try:
+                    snapshots.append(_read(os.path.join(directory, name)))
+                except (OSError, ValueError):
+                    continue
+            _write(aggregate, _dump(*_merge(snapshots)))
+            for name in exited:
+                os.remove(os.path.join(directory, name))
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def collect():
+    """Every process's metrics added together, as ``(counters, histograms)``."""
+    flush()
+    snapshots = []
+    directory = _directory()
+    if directory:
+        try:
+            _fold_exited(directory)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not fold metrics of exited processes in {directory}: {e}")
+        try:
+            names = [name for name in os.listdir(directory) if name.endswith('.json')]
+        except FileNotFoundError:
+            names = []
+        for name in names:
+            try:
+                snapshots.append(_read(os.path.join(directory, name)))
+            except (OSError, ValueError):
+                # Being replaced or half written; it is counted on the next scrape.
+                continue
+    else:
+        snapshots.append(_snapshot())
+    return _merge(snapshots)
+
+
+def _merge(snapshots):
+    counters, histograms = {}, {}
+    for snapshot in snapshots:
+        for name, series in snapshot['counters'].items():
+            merged = counters.setdefault(name, {})
+            for labels, value in series:
+                key = tuple(tuple(pair) for pair in labels)
+                merged[key] = merged.get(key, 0) + value
+        for name, series in snapshot['histograms'].items():
+            merged = histograms.setdefault(name, {})
+            for labels, values in series:
+                key = tuple(tuple(pair) for pair in labels)
+                total = merged.setdefault(key, [0] * len(values))
+                merged[key] = [a + b for a, b in zip(total, values)]
+    return counters, histograms
+
+
+def _labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n'))
+        for name, value in pairs
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def render_text():
+    """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+    counters, histograms = collect()
+    lines = []
+    for name in sorted(set(counters) | set(histograms) | set(HELP)):
+        kind, help_text = HELP.get(name, ('counter' if name in counters else 'histogram', ''))
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for labels, value in sorted(counters.get(name, {}).items()):
+            lines.append(f'{name}{_labels(labels)} {value}')
+        for labels, values in sorted(histograms.get(name, {}).items()):
+            for bound, count in zip(BUCKETS, values):
+                lines.append(f'{name}_bucket{_labels(labels, le=bound)} {count}')
+            lines.append(f'{name}_bucket{_labels(labels, le="+Inf")} {values[len(BUCKETS)]}')
+            lines.append(f'{name}_sum{_labels(labels)} {values[-1]:.6f}')
+            lines.append(f'{name}_count{_labels(labels)} {values[len(BUCKETS)]}')
+    for name, (help_text, func) in sorted(_gauges.items()):
+        try:
+            value = func()
+        except Exception as e:
+            logger.warning(f"Could not read gauge {name}: {e}")
+            continue
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} gauge')
+        lines.append(f'{name} {value}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,41 @@
+import time
+
+from django.db import connection
+
+from .metrics import increment, observe
+
+
+class MetricsMiddleware:
+    """Record each request's duration, status and database queries by view name.
+
+    The duration ends when the view returns, so it excludes the time spent
+    streaming a ``FileResponse`` or ``StreamingHttpResponse`` to the client.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = []
+
+        def timed_query(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                queries.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        with connection.execute_wrapper(timed_query):
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        match = request.resolver_match
+        view = match.view_name if match is not None else '<unresolved>'
+        observe('kcp_request_duration_seconds', elapsed, view=view, method=request.method)
+        increment('kcp_requests_total', view=view, method=request.method, status=response.status_code)
+        if queries:
+            increment('kcp_db_queries_total', len(queries), view=view)
+            for seconds in queries:
+                observe('kcp_db_query_duration_seconds', seconds, view=view)
+        return response
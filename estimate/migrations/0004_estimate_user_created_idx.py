@@ -0,0 +1,22 @@
+# Generated by Django 5.0.2 on 2026-10-17 20:15
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("estimate", "0003_renderjob"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="estimate",
+            index=models.Index(
+                fields=["created_by", "created_at", "id"],
+                name="estimate_user_created_idx",
+            ),
+        ),
+    ]
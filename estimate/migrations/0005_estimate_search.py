@@ -0,0 +1,101 @@
+# Generated by Django 5.0.2 on 2026-10-17 20:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+# The search index SQL as it was when this migration was written; later
+# changes belong in new migrations (estimate.search reinstalls it after
+# every migrate).
+SQLITE_FTS_SQL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS estimate_estimate_fts USING fts5(
+        party_name, notes,
+        content='estimate_estimate', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS estimate_fts_insert AFTER INSERT ON estimate_estimate BEGIN
+        INSERT INTO estimate_estimate_fts(rowid, party_name, notes) VALUES (new.id, new.party_name, new.notes);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS estimate_fts_delete AFTER DELETE ON estimate_estimate BEGIN
+        INSERT INTO estimate_estimate_fts(estimate_estimate_fts, rowid, party_name, notes)
+        VALUES ('delete', old.id, old.party_name, old.notes);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS estimate_fts_update AFTER UPDATE OF party_name, notes ON estimate_estimate BEGIN
+        INSERT INTO estimate_estimate_fts(estimate_estimate_fts, rowid, party_name, notes)
+        VALUES ('delete', old.id, old.party_name, old.notes);
+        INSERT INTO estimate_estimate_fts(rowid, party_name, notes) VALUES (new.id, new.party_name, new.notes);
+    END""",
+    "INSERT INTO estimate_estimate_fts(estimate_estimate_fts) VALUES ('rebuild')",
+]
+
+SQLITE_FTS_REVERSE_SQL = [
+    "DROP TRIGGER IF EXISTS estimate_fts_insert",
+    "DROP TRIGGER IF EXISTS estimate_fts_delete",
+    "DROP TRIGGER IF EXISTS estimate_fts_update",
+    "DROP TABLE IF EXISTS estimate_estimate_fts",
+]
+
+POSTGRESQL_TRGM_SQL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS estimate_party_name_trgm ON estimate_estimate USING gin (party_name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS estimate_notes_trgm ON estimate_estimate USING gin (notes gin_trgm_ops)",
+]
+
+POSTGRESQL_TRGM_REVERSE_SQL = [
+    "DROP INDEX IF EXISTS estimate_party_name_trgm",
+    "DROP INDEX IF EXISTS estimate_notes_trgm",
+]
+
+
+def _sqlite_has_fts5(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        if cursor.fetchone()[0]:
+            return True
+        cursor.execute("SELECT 1 FROM pragma_module_list WHERE name = 'fts5'")
+        return cursor.fetchone() is not None
+
+
+class RunSQLOn(migrations.RunSQL):
+    """RunSQL that only runs on ``vendor`` (and, on SQLite, only with FTS5)."""
+
+    def __init__(self, vendor, *args, **kwargs):
+        self.vendor = vendor
+        super().__init__(*args, **kwargs)
+
+    def _applies(self, connection):
+        if connection.vendor != self.vendor:
+            return False
+        return connection.vendor != "sqlite" or _sqlite_has_fts5(connection)
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if self._applies(schema_editor.connection):
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if self._applies(schema_editor.connection):
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("estimate", "0004_estimate_user_created_idx"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="estimate",
+            index=models.Index(
+                fields=["created_by", "date"], name="estimate_user_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="estimate",
+            index=models.Index(
+                fields=["created_by", "total_amount"], name="estimate_user_total_idx"
+            ),
+        ),
+        RunSQLOn("sqlite", SQLITE_FTS_SQL, SQLITE_FTS_REVERSE_SQL),
+        RunSQLOn("postgresql", POSTGRESQL_TRGM_SQL, POSTGRESQL_TRGM_REVERSE_SQL),
+    ]
@@ -0,0 +1,150 @@
+# Generated by Django 5.0.2 on 2026-10-17 20:21
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+
+def backfill_summaries(apps, schema_editor):
+    Estimate = apps.get_model("estimate", "Estimate")
+    aggregates = {
+        "estimate_count": Count("id"),
+        "revenue": Sum("total_amount"),
+        "gst_amount": Sum("gst_amount"),
+        "transportation_charge": Sum("transportation_charge"),
+        "loading_unloading_cost": Sum("loading_unloading_cost"),
+    }
+    rows = Estimate.objects.annotate(month=TruncMonth("date")).order_by()
+    for name, key in (
+        ("BlockTypeMonthlySummary", "paver_block_type_id"),
+        ("PartyMonthlySummary", "party_name"),
+    ):
+        Summary = apps.get_model("estimate", name)
+        Summary.objects.bulk_create(
+            (
+                Summary(**row)
+                for row in rows.values("created_by_id", "month", key).annotate(
+                    **aggregates
+                )
+            ),
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("estimate", "0005_estimate_search"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BlockTypeMonthlySummary",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("month", models.DateField(help_text="First day of the month")),
+                ("estimate_count", models.IntegerField(default=0)),
+                (
+                    "revenue",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                (
+                    "gst_amount",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                (
+                    "transportation_charge",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                (
+                    "loading_unloading_cost",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "paver_block_type",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="estimate.paverblocktype",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-month", "paver_block_type"],
+            },
+        ),
+        migrations.CreateModel(
+            name="PartyMonthlySummary",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("month", models.DateField(help_text="First day of the month")),
+                ("estimate_count", models.IntegerField(default=0)),
+                (
+                    "revenue",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                (
+                    "gst_amount",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                (
+                    "transportation_charge",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                (
+                    "loading_unloading_cost",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                ("party_name", models.CharField(max_length=200)),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-month", "party_name"],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="blocktypemonthlysummary",
+            constraint=models.UniqueConstraint(
+                fields=("created_by", "month", "paver_block_type"),
+                name="unique_block_type_month",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="partymonthlysummary",
+            constraint=models.UniqueConstraint(
+                fields=("created_by", "month", "party_name"), name="unique_party_month"
+            ),
+        ),
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
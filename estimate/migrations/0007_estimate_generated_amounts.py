@@ -0,0 +1,78 @@
+import importlib
+from decimal import Decimal
+
+import django.db.models.functions.math
+from django.db import migrations, models
+
+
+def rebuild_summaries(apps, schema_editor):
+    # The database rounds the amounts it now computes, which can move a
+    # stored value by a cent, so recompute the summaries from the new columns.
+    for name in ("BlockTypeMonthlySummary", "PartyMonthlySummary"):
+        apps.get_model("estimate", name).objects.all().delete()
+    sales_summaries = importlib.import_module(
+        "estimate.migrations.0006_sales_summaries"
+    )
+    sales_summaries.backfill_summaries(apps, schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("estimate", "0006_sales_summaries"),
+    ]
+
+    # A column cannot be altered into a generated one, so both amounts are
+    # dropped and added back; the index on total_amount goes with them.
+    operations = [
+        migrations.RemoveIndex(
+            model_name="estimate",
+            name="estimate_user_total_idx",
+        ),
+        migrations.RemoveField(
+            model_name="estimate",
+            name="gst_amount",
+        ),
+        migrations.RemoveField(
+            model_name="estimate",
+            name="total_amount",
+        ),
+        migrations.AddField(
+            model_name="estimate",
+            name="gst_amount",
+            field=models.GeneratedField(
+                db_persist=True,
+                expression=django.db.models.functions.math.Round(
+                    models.F("price")
+                    * models.F("gst_percentage")
+                    * models.Value(Decimal("0.01")),
+                    2,
+                ),
+                output_field=models.DecimalField(decimal_places=2, max_digits=10),
+            ),
+        ),
+        migrations.AddField(
+            model_name="estimate",
+            name="total_amount",
+            field=models.GeneratedField(
+                db_persist=True,
+                expression=django.db.models.functions.math.Round(
+                    models.F("price")
+                    + models.F("price")
+                    * models.F("gst_percentage")
+                    * models.Value(Decimal("0.01"))
+                    + models.F("transportation_charge")
+                    + models.F("loading_unloading_cost"),
+                    2,
+                ),
+                output_field=models.DecimalField(decimal_places=2, max_digits=10),
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="estimate",
+            index=models.Index(
+                fields=["created_by", "total_amount"], name="estimate_user_total_idx"
+            ),
+        ),
+        migrations.RunPython(rebuild_summaries, migrations.RunPython.noop),
+    ]
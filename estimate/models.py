@@ -1,5 +1,10 @@
+from decimal import Decimal
+
 from django.db import models
+from django.db.models import F, Value
+from django.db.models.functions import Round
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 class PaverBlockType(models.Model):
     name = models.CharField(max_length=100)
@@ -13,27 +18,153 @@ class PaverBlockType(models.Model):
     class Meta:
         ordering = ['name']
 
+# Multiplying by 0.01 rather than dividing by 100 keeps SQLite from doing
+# integer division when price and GST percentage are both whole numbers.
+PERCENT = Value(Decimal('0.01'))
+
+class EstimateQuerySet(models.QuerySet):
+    def reprice(self, gst_percentage=None, transportation_charge=None):
+        """Change the GST rate and/or transport charge of every estimate in
+        the queryset with one UPDATE; the database recomputes the totals.
+
+        Returns the number of estimates changed. Like any ``update()`` this
+        skips ``save()`` and its signals; take ``summaries.summary_spans``
+        first and pass them to ``summaries.refresh_summaries`` afterwards
+        (the ``reprice_estimates`` command does).
+        """
+        changes = {}
+        if gst_percentage is not None:
+            changes['gst_percentage'] = gst_percentage
+        if transportation_charge is not None:
+            changes['transportation_charge'] = transportation_charge
+        if not changes:
+            return 0
+        return self.update(**changes, updated_at=timezone.now())
+
 class Estimate(models.Model):
     party_name = models.CharField(max_length=200)
     date = models.DateField()
     paver_block_type = models.ForeignKey(PaverBlockType, on_delete=models.CASCADE)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     gst_percentage = models.DecimalField(max_digits=5, decimal_places=2, default=0)
-    gst_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     transportation_charge = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     loading_unloading_cost = models.DecimalField(max_digits=10, decimal_places=2, default=0)
-    total_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    # Computed and stored by the database, so they stay correct for
+    # QuerySet.update() and bulk writes. Reload an instance to see new values.
+    gst_amount = models.GeneratedField(
+        expression=Round(F('price') * F('gst_percentage') * PERCENT, 2),
+        output_field=models.DecimalField(max_digits=10, decimal_places=2),
+        db_persist=True,
+    )
+    total_amount = models.GeneratedField(
+        expression=Round(
+            F('price') + F('price') * F('gst_percentage') * PERCENT
+            + F('transportation_charge') + F('loading_unloading_cost'),
+            2,
+        ),
+        output_field=models.DecimalField(max_digits=10, decimal_places=2),
+        db_persist=True,
+    )
     notes = models.TextField(blank=True, help_text="Additional notes or terms and conditions")
     created_by = models.ForeignKey(User, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = EstimateQuerySet.as_manager()
+
     def __str__(self):
         return f"KCP-ESTIMATE-{self.party_name}"
 
-    def save(self, *args, **kwargs):
-        # Calculate GST amount
-        self.gst_amount = (self.price * self.gst_percentage) / 100
-        # Calculate total amount
-        self.total_amount = self.price + self.gst_amount + self.transportation_charge + self.loading_unloading_cost
-        super().save(*args, **kwargs)
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The row as loaded, so a save can update the summaries by the
+        # difference without reading it again (see signals).
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using=using, fields=fields)
+        deferred = self.get_deferred_fields()
+        refreshed = fields or [f.attname for f in self._meta.concrete_fields if f.attname not in deferred]
+        if not hasattr(self, '_loaded_values'):
+            self._loaded_values = {}
+        self._loaded_values.update((attname, getattr(self, attname)) for attname in refreshed)
+
+    class Meta:
+        indexes = [
+            # Dashboard: a user's estimates, newest first, keyset paginated.
+            models.Index(fields=['created_by', 'created_at', 'id'], name='estimate_user_created_idx'),
+            # API sync: a user's estimates in the order they last changed.
+            models.Index(fields=['created_by', 'updated_at', 'id'], name='estimate_user_updated_idx'),
+            # Search filters
+            models.Index(fields=['created_by', 'date'], name='estimate_user_date_idx'),
+            models.Index(fields=['created_by', 'total_amount'], name='estimate_user_total_idx'),
+        ]
+
+class RenderJob(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    estimate = models.ForeignKey(Estimate, on_delete=models.CASCADE, related_name='render_jobs')
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE)
+    engine = models.CharField(max_length=20)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    result_key = models.CharField(max_length=64, blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"RenderJob {self.pk} ({self.status}) for {self.estimate_id}"
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+class SalesSummary(models.Model):
+    """Monthly totals per user, kept current by estimate.summaries."""
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE)
+    month = models.DateField(help_text="First day of the month")
+    estimate_count = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    gst_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    transportation_charge = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    loading_unloading_cost = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        abstract = True
+
+class BlockTypeMonthlySummary(SalesSummary):
+    paver_block_type = models.ForeignKey(PaverBlockType, on_delete=models.CASCADE)
+
+    class Meta:
+        ordering = ['-month', 'paver_block_type']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['created_by', 'month', 'paver_block_type'], name='unique_block_type_month',
+            ),
+        ]
+
+class PartyMonthlySummary(SalesSummary):
+    party_name = models.CharField(max_length=200)
+
+    class Meta:
+        ordering = ['-month', 'party_name']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['created_by', 'month', 'party_name'], name='unique_party_month',
+            ),
+        ]
@@ -0,0 +1,101 @@
+"""Keyset (cursor) pagination over ``(created_at, id)``, newest first, and
+over ``(updated_at, id)``, oldest change first, for API syncs.
+
+Unlike OFFSET paging, every page is a range scan that starts right at the
+cursor, so page 1000 costs the same as page 1. The matching indexes are
+``(created_by, created_at, id)`` and ``(created_by, updated_at, id)`` on
+Estimate.
+"""
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+
+def encode_cursor(obj, field='created_at'):
+    raw = f'{getattr(obj, field).isoformat()}|{obj.pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return ``(created_at, id)``, or None for a missing or malformed cursor."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, pk = raw.split('|')
+        return datetime.fromisoformat(created_at), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+class KeysetPage:
+    def __init__(self, items, next_cursor, previous_cursor, has_more=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        # Whether rows exist past next_cursor right now (changes_paginate only).
+        self.has_more = has_more
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+def keyset_paginate(queryset, per_page, after=None, before=None):
+    """One page of ``queryset`` ordered by ``-created_at, -id``.
+
+    ``after`` continues towards older rows, ``before`` goes back towards newer
+    ones; both are cursors produced by a previous page.
+    """
+    after, before = decode_cursor(after), decode_cursor(before)
+    if before is not None:
+        created_at, pk = before
+        rows = list(
+            queryset.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, pk__gt=pk))
+            .order_by('created_at', 'id')[:per_page + 1]
+        )
+        has_more = len(rows) > per_page
+        items = rows[:per_page][::-1]
+        return KeysetPage(
+            items,
+            next_cursor=encode_cursor(items[-1]) if items else None,
+            previous_cursor=encode_cursor(items[0]) if has_more else None,
+        )
+
+    if after is not None:
+        created_at, pk = after
+        queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk))
+    rows = list(queryset.order_by('-created_at', '-id')[:per_page + 1])
+    items = rows[:per_page]
+    return KeysetPage(
+        items,
+        next_cursor=encode_cursor(items[-1]) if len(rows) > per_page else None,
+        previous_cursor=encode_cursor(items[0]) if after is not None and items else None,
+    )
+
+
+def changes_paginate(queryset, per_page, after=None):
+    """One page of ``queryset`` ordered by ``updated_at, id``, oldest change first.
+
+    A row that is edited later moves behind the cursor's position, so a
+    client that keeps following ``next_cursor`` sees every change once.
+    ``next_cursor`` is set on every non-empty page: an empty page means the
+    client has caught up and can poll again later with its last cursor.
+    """
+    after = decode_cursor(after)
+    if after is not None:
+        updated_at, pk = after
+        queryset = queryset.filter(Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, pk__gt=pk))
+    rows = list(queryset.order_by('updated_at', 'id')[:per_page + 1])
+    items = rows[:per_page]
+    return KeysetPage(
+        items,
+        next_cursor=encode_cursor(items[-1], 'updated_at') if items else None,
+        previous_cursor=None,
+        has_more=len(rows) > per_page,
+    )
@@ -0,0 +1,104 @@
+"""In-browser previews of estimates, with no document conversion.
+
+The HTML preview renders ``pdf_template.html``, whose body is a ``{% cache %}``
+fragment keyed on the estimate's and its paver block type's ``updated_at``:
+any edit changes the key, so stale fragments are never served and simply
+expire. The thumbnail is a small PNG of the same layout drawn with Pillow and
+cached under the same key.
+"""
+import io
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Estimate
+
+THUMBNAIL_SIZE = (210, 297)  # A4 proportions
+THUMBNAIL_KEY = 'estimate:thumbnail:{id}:{version}'
+
+
+def preview_version(user, estimate_id):
+    """The cache version of ``user``'s estimate, or None if there is no such estimate.
+
+    One indexed lookup that reads no estimate fields beyond the timestamps.
+    """
+    row = (
+        Estimate.objects.filter(id=estimate_id, created_by=user)
+        .values_list('updated_at', 'paver_block_type__updated_at').first()
+    )
+    if row is None:
+        return None
+    updated_at, block_type_updated_at = row
+    return {
+        'version': f'{updated_at.timestamp():.6f}-{block_type_updated_at.timestamp():.6f}',
+        'last_modified': max(updated_at, block_type_updated_at),
+    }
+
+
+def load_estimate(estimate_id):
+    return Estimate.objects.select_related('paver_block_type').get(id=estimate_id)
+
+
+def _wrap(draw, text, font, width):
+    lines, line = [], ''
+    for word in text.split():
+        candidate = f'{line} {word}'.strip()
+        if line and draw.textlength(candidate, font=font) > width:
+            lines.append(line)
+            line = word
+        else:
+            line = candidate
+    if line:
+        lines.append(line)
+    return lines
+
+
+def render_thumbnail(estimate):
+    """Draw the preview layout at thumbnail size and return PNG bytes."""
+    from PIL import Image, ImageDraw, ImageFont
+
+    width, height = THUMBNAIL_SIZE
+    margin = 12
+    image = Image.new('L', THUMBNAIL_SIZE, 255)
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default()
+    y = margin
+    draw.text((width / 2, y), 'KCP ESTIMATE', fill=0, font=font, anchor='ma')
+    y += 18
+    draw.line((margin, y, width - margin, y), fill=0)
+    y += 8
+    for text in (estimate.party_name, str(estimate.date), str(estimate.paver_block_type)):
+        for line in _wrap(draw, text, font, width - 2 * margin)[:2]:
+            draw.text((margin, y), line, fill=0, font=font)
+            y += 13
+    y += 6
+    rows = (
+        ('Price', estimate.price),
+        (f'GST {estimate.gst_percentage}%', estimate.gst_amount),
+        ('Transport', estimate.transportation_charge),
+        ('Loading', estimate.loading_unloading_cost),
+        ('Total', estimate.total_amount),
+    )
+    for label, amount in rows:
+        draw.rectangle((margin, y, width - margin, y + 14), outline=0)
+        draw.text((margin + 3, y + 2), label, fill=0, font=font)
+        draw.text((width - margin - 3, y + 2), f'Rs.{amount}', fill=0, font=font, anchor='ra')
+        y += 14
+    if estimate.notes:
+        y += 8
+        for line in _wrap(draw, estimate.notes, font, width - 2 * margin)[:(height - y - margin) // 12]:
+            draw.text((margin, y), line, fill=96, font=font)
+            y += 12
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG', optimize=True)
+    return buffer.getvalue()
+
+
+def get_thumbnail(estimate_id, version):
+    """The thumbnail PNG for this version of the estimate, drawn on a cache miss."""
+    key = THUMBNAIL_KEY.format(id=estimate_id, version=version)
+    png = cache.get(key)
+    if png is None:
+        png = render_thumbnail(load_estimate(estimate_id))
+        cache.set(key, png, settings.KCP_PREVIEW_CACHE_TTL)
+    return png
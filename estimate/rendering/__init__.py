@@ -0,0 +1 @@
+"""Document rendering for estimates (letterpad filling and PDF conversion)."""
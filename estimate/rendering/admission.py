@@ -0,0 +1,151 @@
+"""Admission control for PDF renders, shared by every worker process on a host.
+
+A render must hold one of ``SLOTS`` slots. Slots and wait tickets are lock
+files in ``DIR`` held with ``flock``, so the limit covers all gunicorn
+workers, render workers and export processes, and the kernel releases a
+slot the moment its holder dies. A request that finds every slot busy takes
+one of ``QUEUE`` wait tickets and polls for a slot for up to ``TIMEOUT``
+seconds; when no ticket is free, or the wait runs out, it gets
+``RenderBusy`` at once, which the views turn into 503 with Retry-After.
+Background renders (``block=True``) wait as long as needed without a ticket.
+Each holder writes its pid next to its lock file; the busy-slot and
+queue-depth gauges count those files and never touch the locks.
+
+Waiting requests are not served in arrival order; each polls independently.
+Configured by ``settings.KCP_RENDER_ADMISSION``; ``SLOTS = 0`` disables it,
+as does a platform without ``fcntl`` (Windows).
+"""
+import os
+import random
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from ..metrics import _alive, increment, observe, register_gauge
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+POLL_INTERVAL = 0.05
+
+
+class RenderBusy(Exception):
+    """Every render slot is busy and the wait queue is full or timed out."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _config():
+    return settings.KCP_RENDER_ADMISSION
+
+
+def _enabled():
+    return fcntl is not None and _config().get('SLOTS', 0) > 0
+
+
+def _lock_path(kind, index):
+    directory = _config()['DIR']
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f'{kind}-{index}.lock')
+
+
+def _try_lock(kind, count):
+    """Return an open file holding one of ``count`` ``kind`` locks, or None."""
+    for index in random.sample(range(count), count):
+        f = open(_lock_path(kind, index), 'a')
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            with open(_holder_path(f), 'w') as holder:
+                holder.write(str(os.getpid()))
+        except OSError as e:
+            f.close()
+            if isinstance(e, BlockingIOError):
+                continue
+            raise
+        return f
+    return None
+
+
+def _holder_path(f):
+    return f.name[:-len('.lock')] + '.pid'
+
+
+def _held(kind):
+    """How many ``kind`` locks a live process holds right now, from the pid files."""
+    held = 0
+    if not os.path.isdir(_config()['DIR']):
+        return 0
+    with os.scandir(_config()['DIR']) as entries:
+        for entry in entries:
+            if not (entry.name.startswith(f'{kind}-') and entry.name.endswith('.pid')):
+                continue
+            try:
+                with open(entry.path) as f:
+                    pid = int(f.read())
+            except (OSError, ValueError):
+                continue
+            if _alive(pid):
+                held += 1
+    return held
+
+
+def _release(f):
+    try:
+        os.unlink(_holder_path(f))
+    except FileNotFoundError:
+        pass
+    fcntl.flock(f, fcntl.LOCK_UN)
+    f.close()
+
+
+def _reject(reason, message):
+    increment('kcp_render_rejected_total', reason=reason)
+    raise RenderBusy(message, _config().get('RETRY_AFTER', 5))
+
+
+@contextmanager
+def render_slot(block=False):
+    """Hold a render slot for the enclosed block, waiting in the queue if need be."""
+    if not _enabled():
+        yield
+        return
+    config = _config()
+    started = time.monotonic()
+    slot = _try_lock('slot', config['SLOTS'])
+    ticket = None
+    try:
+        if slot is None and not block:
+            ticket = _try_lock('queue', config.get('QUEUE', 0)) if config.get('QUEUE', 0) else None
+            if ticket is None:
+                _reject('queue_full', 'Too many documents are being generated; try again shortly.')
+        deadline = None if block else started + config.get('TIMEOUT', 10)
+        while slot is None:
+            if deadline is not None and time.monotonic() >= deadline:
+                _reject('timeout', 'Timed out waiting to generate the document; try again shortly.')
+            time.sleep(POLL_INTERVAL * random.uniform(0.5, 1.5))
+            slot = _try_lock('slot', config['SLOTS'])
+    finally:
+        if ticket is not None:
+            _release(ticket)
+    observe('kcp_render_admission_wait_seconds', time.monotonic() - started)
+    try:
+        yield
+    finally:
+        _release(slot)
+
+
+def _slots_busy():
+    return _held('slot') if _enabled() else 0
+
+
+def _queue_depth():
+    return _held('queue') if _enabled() else 0
+
+
+register_gauge('kcp_render_slots_busy', 'Render slots in use on this host.', _slots_busy)
+register_gauge('kcp_render_queue_depth', 'Requests waiting for a render slot on this host.', _queue_depth)
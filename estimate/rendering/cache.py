@@ -0,0 +1,108 @@
+"""Size-bounded on-disk cache of rendered documents.
+
+Entries are content addressed: the key is a hash of everything that ends up
+in the document (see ``service.document_key``), so a changed estimate or
+template can never be served a stale file; entries for an old version of
+an estimate are simply never read again. Files are named
+``<estimate id>-<key><suffix>``. Least recently used entries (by mtime,
+which a hit refreshes) are evicted once the directory outgrows ``max_bytes``,
+which is also how old versions are reclaimed.
+"""
+import logging
+import os
+import tempfile
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class RenderCache:
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, estimate_id, key, suffix):
+        return os.path.join(self.directory, f'{estimate_id}-{key}{suffix}')
+
+    def open(self, estimate_id, key, suffix='.pdf'):
+        """Return the entry as an open binary file, or None."""
+        path = self._path(estimate_id, key, suffix)
+        try:
+            f = open(path, 'rb')
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return f
+
+    def exists(self, estimate_id, key, suffix='.pdf'):
+        """Whether the entry is cached, without reading it."""
+        return os.path.exists(self._path(estimate_id, key, suffix))
+
+    def get(self, estimate_id, key, suffix='.pdf'):
+        f = self.open(estimate_id, key, suffix)
+        if f is None:
+            return None
+        with f:
+            return f.read()
+
+    def put(self, estimate_id, key, data, suffix='.pdf'):
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, self._path(estimate_id, key, suffix))
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        self.evict()
+
+    def _scan(self):
+        try:
+            return list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return []
+
+    def evict(self):
+        entries = []
+        total = 0
+        for entry in self._scan():
+            if entry.name.startswith('.tmp-'):
+                continue
+            try:
+                st = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, entry.path))
+            total += st.st_size
+        if total <= self.max_bytes:
+            return
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        logger.debug(f"Render cache evicted down to {total} bytes")
+
+
+_cache = None
+
+
+def get_render_cache():
+    """Return the configured cache, or None when ``KCP_RENDER_CACHE['DIR']`` is unset."""
+    global _cache
+    config = settings.KCP_RENDER_CACHE
+    if not config.get('DIR'):
+        return None
+    if _cache is None or _cache.directory != config['DIR']:
+        _cache = RenderCache(config['DIR'], config.get('MAX_BYTES', 256 * 1024 * 1024))
+    return _cache
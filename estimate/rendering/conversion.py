@@ -0,0 +1,324 @@
+"""DOCX to PDF conversion through a pool of long-lived converter processes.
+
+Each pooled converter wraps a backend. Process backends start a worker script
+once and then exchange framed messages with it over its stdin/stdout pipes
+(see ``worker_protocol``), so the office start-up cost is paid per worker
+rather than per download. Workers are health-checked before use, restarted
+after ``MAX_JOBS`` conversions, and killed when a job exceeds its timeout.
+
+Configured by ``settings.KCP_CONVERTER``; the pool is per process and is
+rebuilt after a fork.
+"""
+import atexit
+import logging
+import os
+import queue
+import selectors
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from ..metrics import increment, stage
+from . import worker_protocol
+from .scratch import scratch_dir, scratch_root
+
+logger = logging.getLogger(__name__)
+
+WORKER_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class ConversionError(Exception):
+    pass
+
+
+class ConversionTimeout(ConversionError):
+    pass
+
+
+class DocumentRejected(ConversionError):
+    """The converter answered, but could not convert this document."""
+
+
+class ConverterBackend:
+    """One converter. Subclasses implement ``convert``; process backends also
+    ``start``/``stop``/``ping``."""
+
+    def __init__(self, **options):
+        self.options = options
+
+    def start(self):
+        pass
+
+    def stop(self, kill=False):
+        pass
+
+    def ping(self, timeout):
+        return True
+
+    def convert(self, docx_bytes, timeout):
+        raise NotImplementedError
+
+
+class ProcessBackend(ConverterBackend):
+    """A worker script kept running and fed over its stdin/stdout pipes."""
+
+    startup_timeout = 30
+
+    def __init__(self, **options):
+        super().__init__(**options)
+        self.process = None
+
+    def command(self):
+        raise NotImplementedError
+
+    def start(self):
+        # Worker scratch files (office_worker's job files) go to the scratch root.
+        env = dict(os.environ, TMPDIR=scratch_root())
+        self.process = subprocess.Popen(
+            self.command(),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            env=env,
+            # Own process group, so a timeout also kills soffice.
+            start_new_session=True,
+        )
+        if not self.ping(self.options.get('STARTUP_TIMEOUT', self.startup_timeout)):
+            self.stop(kill=True)
+            raise ConversionError(f'{type(self).__name__} worker did not start')
+        logger.info(f"Started {type(self).__name__} worker pid {self.process.pid}")
+
+    def stop(self, kill=False):
+        process, self.process = self.process, None
+        if process is None:
+            return
+        try:
+            if kill:
+                raise subprocess.TimeoutExpired(process.args, 0)
+            process.stdin.close()
+            process.wait(timeout=5)
+        except (OSError, subprocess.TimeoutExpired):
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except (OSError, AttributeError):
+                process.kill()
+            process.wait()
+        for pipe in (process.stdin, process.stdout):
+            try:
+                pipe.close()
+            except OSError:
+                pass
+
+    def _request(self, payload, timeout):
+        if self.process is None or self.process.poll() is not None:
+            raise ConversionError('converter worker is not running')
+        try:
+            worker_protocol.write_frame(self.process.stdin, payload)
+        except OSError as e:
+            raise ConversionError(f'converter worker pipe closed: {e}')
+        deadline = time.monotonic() + timeout
+        header = self._read(4, deadline)
+        size = int.from_bytes(header, 'big')
+        return self._read(size, deadline)
+
+    def _read(self, size, deadline):
+        fd = self.process.stdout.fileno()
+        chunks = []
+        remaining = size
+        with selectors.DefaultSelector() as selector:
+            selector.register(fd, selectors.EVENT_READ)
+            while remaining:
+                wait = deadline - time.monotonic()
+                if wait <= 0 or not selector.select(wait):
+                    raise ConversionTimeout('conversion timed out')
+                chunk = os.read(fd, min(remaining, 1 << 20))
+                if not chunk:
+                    raise ConversionError('converter worker exited')
+                chunks.append(chunk)
+                remaining -= len(chunk)
+        return b''.join(chunks)
+
+    def ping(self, timeout):
+        try:
+            return self._request(worker_protocol.PING, timeout) == worker_protocol.PONG
+        except ConversionError:
+            return False
+
+    def convert(self, docx_bytes, timeout):
+        reply = self._request(worker_protocol.CONVERT + docx_bytes, timeout)
+        status, body = reply[:4], reply[4:]
+        if status != worker_protocol.OK:
+            raise DocumentRejected(body.decode('utf-8', 'replace'))
+        return body
+
+
+class LibreOfficeBackend(ProcessBackend):
+    """Headless LibreOffice driven over UNO by ``office_worker.py``.
+
+    Options: ``PYTHON`` (an interpreter that can ``import uno``, default
+    ``/usr/bin/python3``) and ``SOFFICE`` (default ``soffice``).
+    """
+
+    startup_timeout = 60
+
+    def command(self):
+        return [
+            self.options.get('PYTHON', '/usr/bin/python3'),
+            os.path.join(WORKER_DIR, 'office_worker.py'),
+            self.options.get('SOFFICE', 'soffice'),
+        ]
+
+
+class StandInBackend(ProcessBackend):
+    """Pure-Python stand-in (``standin_worker.py``); no office suite needed."""
+
+    def command(self):
+        return [sys.executable, os.path.join(WORKER_DIR, 'standin_worker.py')]
+
+
+class Docx2PdfBackend(ConverterBackend):
+    """The ``docx2pdf`` package (Microsoft Word on Windows/macOS), one call per job."""
+
+    def convert(self, docx_bytes, timeout):
+        from docx2pdf import convert
+
+        with scratch_dir('kcp-docx2pdf-') as workdir:
+            src = os.path.join(workdir, 'estimate.docx')
+            dst = os.path.join(workdir, 'estimate.pdf')
+            with open(src, 'wb') as f:
+                f.write(docx_bytes)
+            convert(src, dst)
+            with stage('read_back'), open(dst, 'rb') as f:
+                return f.read()
+
+
+class _PooledConverter:
+    def __init__(self, backend):
+        self.backend = backend
+        self.started = False
+        self.jobs = 0
+        self.last_used = 0.0
+
+    def restart(self):
+        self.stop()
+        self.backend.start()
+        self.started = True
+
+    def stop(self, kill=False):
+        if self.started:
+            self.backend.stop(kill=kill)
+        self.started = False
+        self.jobs = 0
+
+
+class ConverterPool:
+    """A fixed set of converters handed out one job at a time."""
+
+    def __init__(self, backend_class, size=1, max_jobs=200, timeout=60,
+                 health_check_interval=30, options=None):
+        self.size = size
+        self.max_jobs = max_jobs
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self._idle = queue.LifoQueue()
+        self._members = [_PooledConverter(backend_class(**(options or {}))) for _ in range(size)]
+        for member in self._members:
+            self._idle.put(member)
+
+    def _checkout(self, timeout):
+        try:
+            member = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise ConversionTimeout('no converter became free in time')
+        try:
+            if not member.started:
+                member.restart()
+            elif time.monotonic() - member.last_used > self.health_check_interval:
+                if not member.backend.ping(min(timeout, 10)):
+                    logger.warning("Converter failed its health check; restarting")
+                    member.stop(kill=True)
+                    member.restart()
+        except Exception:
+            member.stop(kill=True)
+            self._idle.put(member)
+            raise
+        return member
+
+    def convert(self, docx_bytes, timeout=None):
+        """Convert .docx bytes to PDF bytes within ``timeout`` seconds."""
+        timeout = timeout or self.timeout
+        deadline = time.monotonic() + timeout
+        member = self._checkout(timeout)
+        try:
+            pdf = member.backend.convert(docx_bytes, max(deadline - time.monotonic(), 0.1))
+        except DocumentRejected:
+            member.last_used = time.monotonic()
+            raise
+        except Exception:
+            # The worker may be wedged mid-job; never reuse it.
+            member.stop(kill=True)
+            raise
+        else:
+            member.jobs += 1
+            member.last_used = time.monotonic()
+            if member.jobs >= self.max_jobs:
+                logger.info(f"Recycling converter after {member.jobs} conversions")
+                member.stop()
+            return pdf
+        finally:
+            self._idle.put(member)
+
+    def close(self):
+        for member in self._members:
+            member.stop()
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_converter_pool():
+    """Return this process's converter pool, creating it on first use."""
+    global _pool, _pool_pid
+    if _pool is not None and _pool_pid == os.getpid():
+        return _pool
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            config = settings.KCP_CONVERTER
+            # A pool inherited through fork() belongs to the parent; don't stop it.
+            _pool = ConverterPool(
+                import_string(config['BACKEND']),
+                size=config.get('POOL_SIZE', 1),
+                max_jobs=config.get('MAX_JOBS', 200),
+                timeout=config.get('TIMEOUT', 60),
+                health_check_interval=config.get('HEALTH_CHECK_INTERVAL', 30),
+                options=config.get('OPTIONS'),
+            )
+            _pool_pid = os.getpid()
+        return _pool
+
+
+@atexit.register
+def _close_pool():
+    if _pool is not None and _pool_pid == os.getpid():
+        _pool.close()
+
+
+def convert_docx_to_pdf(docx_bytes, timeout=None):
+    try:
+        with stage('convert'):
+            return get_converter_pool().convert(docx_bytes, timeout)
+    except ConversionTimeout:
+        increment('kcp_conversion_failures_total', reason='timeout')
+        raise
+    except DocumentRejected:
+        increment('kcp_conversion_failures_total', reason='rejected')
+        raise
+    except Exception:
+        increment('kcp_conversion_failures_total', reason='error')
+        raise
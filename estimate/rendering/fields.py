@@ -0,0 +1,24 @@
+"""The values an estimate fills into its documents.
+
+Kept apart from ``letterpad`` so computing a document key or ETag does not
+import python-docx: the key takes the letterpad's version from a hash of the
+file (``service.letterpad_version``), not from the parsed template.
+"""
+from datetime import datetime
+
+
+def estimate_replacements(estimate):
+    """Return the placeholder values for an estimate."""
+    return {
+        'partyname': estimate.party_name,
+        'date': str(estimate.date),
+        'paverblocktype': str(estimate.paver_block_type),
+        'rate1': str(estimate.price),
+        'rate2': str(estimate.gst_amount),
+        'rate3': str(estimate.transportation_charge),
+        'rate4': str(estimate.loading_unloading_cost),
+        'rate5': str(estimate.loading_unloading_cost),
+        'rate': str(estimate.total_amount),
+        'year': str(datetime.now().year),
+        'NOTE': estimate.notes or '',
+    }
@@ -0,0 +1,196 @@
+"""Compiled KCP letterpad template.
+
+The letterpad .docx is read and parsed once per worker. At compile time every
+paragraph that holds a placeholder is recorded together with a pristine copy
+of its XML, so a render only rewrites those paragraphs, serializes the
+document to memory and then puts the pristine paragraphs back.
+
+``render_pages`` fills the letterpad once per set of values and saves every
+filled copy of the body into one document, one letterpad per page, so a
+whole statement goes through a single PDF conversion.
+"""
+import copy
+import hashlib
+import io
+import logging
+import os
+import threading
+
+from docx import Document
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+from docx.text.paragraph import Paragraph
+
+from ..metrics import stage
+from .placeholders import PLACEHOLDER_RE, normalize_replacements, substitute_runs
+
+logger = logging.getLogger(__name__)
+
+
+def _iter_paragraphs(container):
+    """Yield every paragraph in a story, descending into (nested) tables."""
+    yield from container.paragraphs
+    for table in container.tables:
+        for row in table.rows:
+            for cell in row.cells:
+                yield from _iter_paragraphs(cell)
+
+
+class _Slot:
+    """A paragraph that contains placeholders, plus its pristine XML."""
+
+    def __init__(self, paragraph):
+        self.parent = paragraph._parent
+        self.element = paragraph._p
+        self.pristine = copy.deepcopy(paragraph._p)
+
+    @property
+    def paragraph(self):
+        return Paragraph(self.element, self.parent)
+
+    def restore(self):
+        fresh = copy.deepcopy(self.pristine)
+        self.element.getparent().replace(self.element, fresh)
+        self.element = fresh
+
+
+class LetterpadTemplate:
+    """A parsed letterpad that knows where its placeholders are."""
+
+    def __init__(self, data, path=None):
+        self.path = path
+        self.version = hashlib.sha256(data).hexdigest()
+        self.document = Document(io.BytesIO(data))
+        self.slots = []
+        seen = set()
+        stories = [self.document]
+        for section in self.document.sections:
+            stories.extend([section.header, section.footer])
+        for story in stories:
+            for paragraph in _iter_paragraphs(story):
+                # Linked headers/footers and merged cells repeat paragraphs.
+                if paragraph._p in seen:
+                    continue
+                seen.add(paragraph._p)
+                if PLACEHOLDER_RE.search(paragraph.text):
+                    self.slots.append(_Slot(paragraph))
+        self._lock = threading.Lock()
+        logger.info(f"Compiled letterpad {path} ({len(self.slots)} placeholder paragraphs)")
+
+    def render(self, replacements):
+        """Fill the placeholders and return the .docx as bytes."""
+        values = normalize_replacements(replacements)
+        buffer = io.BytesIO()
+        with self._lock:
+            try:
+                with stage('replace'):
+                    for slot in self.slots:
+                        substitute_runs(slot.paragraph, values)
+                with stage('save'):
+                    self.document.save(buffer)
+            finally:
+                with stage('restore'):
+                    for slot in self.slots:
+                        slot.restore()
+        return buffer.getvalue()
+
+
+    def _body_elements(self):
+        body = self.document.element.body
+        return [child for child in body.iterchildren() if child.tag != qn('w:sectPr')]
+
+    def render_pages(self, pages, prelude=None):
+        """Fill the letterpad once per dict in ``pages`` and return one .docx holding them all.
+
+        ``prelude(document)``, if given, appends extra content with the
+        python-docx API (e.g. a summary); it goes on its own first page.
+        """
+        body = self.document.element.body
+        sect_pr = body.find(qn('w:sectPr'))
+        buffer = io.BytesIO()
+        with self._lock:
+            template = self._body_elements()
+            copies = []
+            try:
+                if prelude is not None:
+                    prelude(self.document)
+                    copies.append(self._body_elements()[len(template):])
+                    for element in copies[0]:
+                        body.remove(element)
+                for replacements in pages:
+                    values = normalize_replacements(replacements)
+                    try:
+                        with stage('replace'):
+                            for slot in self.slots:
+                                substitute_runs(slot.paragraph, values)
+                        copies.append([copy.deepcopy(element) for element in self._body_elements()])
+                    finally:
+                        with stage('restore'):
+                            for slot in self.slots:
+                                slot.restore()
+                        # Restoring swaps in fresh paragraph elements.
+                        template = self._body_elements()
+                for element in template:
+                    body.remove(element)
+                for i, page in enumerate(copies):
+                    if i < len(copies) - 1:
+                        _end_with_page_break(page)
+                    for element in page:
+                        sect_pr.addprevious(element)
+                _renumber_drawings(body)
+                with stage('save'):
+                    self.document.save(buffer)
+            finally:
+                for element in self._body_elements():
+                    body.remove(element)
+                for element in template:
+                    sect_pr.addprevious(element)
+        return buffer.getvalue()
+
+
+def _end_with_page_break(elements):
+    """Make the content after ``elements`` start on a new page."""
+    if not elements or elements[-1].tag != qn('w:p'):
+        elements.append(OxmlElement('w:p'))
+    run = OxmlElement('w:r')
+    br = OxmlElement('w:br')
+    br.set(qn('w:type'), 'page')
+    run.append(br)
+    elements[-1].append(run)
+
+
+def _renumber_drawings(body):
+    # Copied pages repeat the letterhead's picture ids, which Word rejects.
+    for number, doc_pr in enumerate(body.iter(qn('wp:docPr')), start=1):
+        doc_pr.set('id', str(number))
+
+
+_cache_lock = threading.Lock()
+_compiled = {}
+
+
+def get_letterpad(path):
+    """Return the compiled letterpad at ``path``, recompiling it if the file changed.
+
+    The file is stat'ed on every call; it is only re-read when its mtime or
+    size moved, and only re-parsed when the content hash differs.
+    """
+    st = os.stat(path)
+    stamp = (st.st_mtime_ns, st.st_size)
+    entry = _compiled.get(path)
+    if entry is not None and entry[0] == stamp:
+        return entry[1]
+
+    with _cache_lock:
+        entry = _compiled.get(path)
+        if entry is not None and entry[0] == stamp:
+            return entry[1]
+        with open(path, 'rb') as f:
+            data = f.read()
+        if entry is not None and entry[1].version == hashlib.sha256(data).hexdigest():
+            template = entry[1]
+        else:
+            with stage('parse'):
+                template = LetterpadTemplate(data, path=path)
+        _compiled[path] = (stamp, template)
+        return template
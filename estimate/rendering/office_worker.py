@@ -0,0 +1,104 @@
+"""LibreOffice converter worker.
+
+Starts one headless ``soffice`` with a private profile, connects to it over a
+UNO pipe and then converts every .docx it receives on stdin to PDF, reusing
+the same office process for all jobs. It needs a Python that can
+``import uno`` (on Debian/Ubuntu: the system ``python3`` plus ``python3-uno``),
+which is why it is run by path and only imports the standard library.
+
+Usage: ``python3 office_worker.py [soffice-binary]``
+"""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from worker_protocol import serve  # noqa: E402
+
+import uno  # noqa: E402
+from com.sun.star.beans import PropertyValue  # noqa: E402
+
+
+def _props(**values):
+    props = []
+    for name, value in values.items():
+        prop = PropertyValue()
+        prop.Name = name
+        prop.Value = value
+        props.append(prop)
+    return tuple(props)
+
+
+class Office:
+    def __init__(self, soffice):
+        self.workdir = tempfile.mkdtemp(prefix='kcp-office-')
+        self.pipe_name = f'kcp_{uuid.uuid4().hex}'
+        profile = uno.systemPathToFileUrl(os.path.join(self.workdir, 'profile'))
+        self.process = subprocess.Popen([
+            soffice, '--headless', '--invisible', '--nologo', '--norestore',
+            '--nodefault', '--nolockcheck',
+            f'-env:UserInstallation={profile}',
+            f'--accept=pipe,name={self.pipe_name};urp;StarOffice.ComponentContext',
+        ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        self.desktop = self._connect()
+
+    def _connect(self, attempts=100):
+        local = uno.getComponentContext()
+        resolver = local.ServiceManager.createInstanceWithContext(
+            'com.sun.star.bridge.UnoUrlResolver', local)
+        url = f'uno:pipe,name={self.pipe_name};urp;StarOffice.ComponentContext'
+        for _ in range(attempts):
+            if self.process.poll() is not None:
+                raise RuntimeError('soffice exited during start-up')
+            try:
+                ctx = resolver.resolve(url)
+                return ctx.ServiceManager.createInstanceWithContext('com.sun.star.frame.Desktop', ctx)
+            except Exception:
+                time.sleep(0.2)
+        raise RuntimeError('could not connect to soffice')
+
+    def convert(self, docx_bytes):
+        job = uuid.uuid4().hex
+        src = os.path.join(self.workdir, f'{job}.docx')
+        dst = os.path.join(self.workdir, f'{job}.pdf')
+        with open(src, 'wb') as f:
+            f.write(docx_bytes)
+        try:
+            doc = self.desktop.loadComponentFromURL(
+                uno.systemPathToFileUrl(src), '_blank', 0, _props(Hidden=True))
+            try:
+                doc.storeToURL(uno.systemPathToFileUrl(dst), _props(FilterName='writer_pdf_Export'))
+            finally:
+                doc.close(True)
+            with open(dst, 'rb') as f:
+                return f.read()
+        finally:
+            for path in (src, dst):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def close(self):
+        try:
+            self.desktop.terminate()
+        except Exception:
+            pass
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    out = sys.stdout.buffer
+    sys.stdout = sys.stderr  # stdout carries frames only
+    office = Office(sys.argv[1] if len(sys.argv) > 1 else 'soffice')
+    try:
+        serve(office.convert, sys.stdin.buffer, out)
+    finally:
+        office.close()
@@ -0,0 +1,86 @@
+"""Single-pass placeholder substitution over the runs of a paragraph.
+
+Word freely splits text into runs, so ``{{ rate1 }}`` is often stored as
+``'{{ '``, ``'rate'``, ``'1'``, ``' }}'``. The paragraph's run texts are
+concatenated, every placeholder is found with one regex scan, and each match
+is written back into the run it starts in; the runs it spilled into only lose
+the consumed characters. Runs without placeholders are never touched, so each
+keeps its own formatting.
+"""
+import re
+
+from docx.text.run import Run
+
+# ``{{ name }}`` is what the letterpad uses; ``<name>`` is the older spelling.
+PLACEHOLDER_RE = re.compile(r'<(\w+)>|\{\{\s*(\w+)\s*\}\}')
+
+
+def normalize_replacements(replacements):
+    """Map bare placeholder names to strings, accepting ``<name>`` keys too."""
+    values = {}
+    for key, value in replacements.items():
+        if key.startswith('<') and key.endswith('>'):
+            key = key[1:-1]
+        values[key] = '' if value is None else str(value)
+    return values
+
+
+def substitute_runs(paragraph, values):
+    """Substitute placeholders in ``paragraph`` in place.
+
+    ``values`` maps bare names to strings (see ``normalize_replacements``).
+    Unknown placeholders are left as they are. Returns the number of
+    placeholders replaced.
+    """
+    runs = [Run(r, paragraph) for r in paragraph._p.r_lst]
+    if not runs:
+        return 0
+    texts = [run.text for run in runs]
+    joined = ''.join(texts)
+    if '<' not in joined and '{' not in joined:
+        return 0
+
+    matches = [
+        m for m in PLACEHOLDER_RE.finditer(joined)
+        if (m.group(1) or m.group(2)) in values
+    ]
+    if not matches:
+        return 0
+
+    # Run boundaries in the joined text.
+    starts = []
+    offset = 0
+    for text in texts:
+        starts.append(offset)
+        offset += len(text)
+
+    def locate(pos, first=0):
+        i = first
+        while i + 1 < len(starts) and starts[i + 1] <= pos:
+            i += 1
+        return i
+
+    # Right to left, so earlier offsets stay valid while runs are rewritten.
+    changed = set()
+    for m in reversed(matches):
+        value = values[m.group(1) or m.group(2)]
+        first = locate(m.start())
+        last = locate(m.end() - 1, first)
+        head = texts[first][:m.start() - starts[first]]
+        if first == last:
+            texts[first] = head + value + texts[first][m.end() - starts[first]:]
+        else:
+            texts[first] = head + value
+            for i in range(first + 1, last):
+                texts[i] = ''
+            texts[last] = texts[last][m.end() - starts[last]:]
+        changed.update(range(first, last + 1))
+
+    for i in changed:
+        runs[i].text = texts[i]
+    return len(matches)
+
+
+def replace_placeholders_in_element(element, replacements):
+    """Replace placeholders in a paragraph while preserving per-run formatting."""
+    return substitute_runs(element, normalize_replacements(replacements))
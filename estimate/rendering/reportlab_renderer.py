@@ -0,0 +1,176 @@
+"""Native ReportLab rendering of the KCP letterpad layout.
+
+Draws the same content as KCP_LETTERPAD.docx (letterhead, party, date,
+paver block type, rate lines, grand total and notes) straight to PDF in
+process, with no .docx step and no office suite.
+"""
+import io
+from datetime import datetime
+from decimal import Decimal
+
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_RIGHT
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import cm
+from reportlab.platypus import (
+    HRFlowable, PageBreak, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle,
+)
+from xml.sax.saxutils import escape
+
+# Bump when the layout changes, so cached PDFs are re-rendered.
+RENDERER_VERSION = '1'
+
+COMPANY_NAME = 'KHETANI CEMENT PRODUCTS'
+COMPANY_ADDRESS = (
+    'Hapa Railway Crossing, Behind Renault Showroom, Jamnagar – Rajkot Highway, Jamnagar, Gujarat.'
+)
+COMPANY_GSTIN = '24AEDPK0520Q1ZM'
+COMPANY_CONTACT = '76218 07404 ; 98243 97944'
+
+_styles = None
+
+
+def _get_styles():
+    global _styles
+    if _styles is None:
+        base = getSampleStyleSheet()
+        _styles = {
+            'company': ParagraphStyle('company', parent=base['Title'], fontSize=20, spaceAfter=4),
+            'letterhead': ParagraphStyle('letterhead', parent=base['Normal'], fontSize=9, alignment=TA_RIGHT),
+            'body': ParagraphStyle('body', parent=base['Normal'], fontSize=11, leading=15),
+            'cell': ParagraphStyle('cell', parent=base['Normal'], fontSize=11, leading=14),
+            'cell_bold': ParagraphStyle('cell_bold', parent=base['Normal'], fontName='Helvetica-Bold', fontSize=11),
+        }
+    return _styles
+
+
+def _rupees(amount):
+    # The standard PDF fonts have no rupee sign glyph.
+    return f'Rs. {amount} /- PER SQ. FEET'
+
+
+def _letterhead(styles):
+    return [
+        Paragraph(COMPANY_NAME, styles['company']),
+        Paragraph(escape(COMPANY_ADDRESS), styles['letterhead']),
+        Paragraph(f'GSTIN : {COMPANY_GSTIN}', styles['letterhead']),
+        Paragraph(f'CONTACT NO.: {COMPANY_CONTACT}', styles['letterhead']),
+        HRFlowable(width='100%', thickness=1.5, color=colors.black, spaceBefore=6, spaceAfter=12),
+    ]
+
+
+def _document(buffer, title):
+    return SimpleDocTemplate(
+        buffer, pagesize=A4,
+        leftMargin=2 * cm, rightMargin=2 * cm, topMargin=1.5 * cm, bottomMargin=1.5 * cm,
+        title=title, author=COMPANY_NAME,
+    )
+
+
+def _footer(canvas, doc):
+    canvas.saveState()
+    canvas.setFont('Helvetica', 8)
+    canvas.drawCentredString(A4[0] / 2, 1 * cm, f'© {datetime.now().year} {COMPANY_NAME}')
+    canvas.restoreState()
+
+
+def _estimate_story(estimate, styles):
+    block_type = escape(str(estimate.paver_block_type))
+    story = _letterhead(styles)
+
+    heading = Table([
+        [Paragraph(f'<b>TO:</b> {escape(estimate.party_name)}', styles['cell']),
+         Paragraph(f'<b>DATE:</b> {estimate.date}', styles['cell'])],
+        [Paragraph(f'<b>SUBJECT:</b> Estimate – Quotation for {block_type}', styles['cell']), ''],
+    ], colWidths=['65%', '35%'])
+    heading.setStyle(TableStyle([
+        ('SPAN', (0, 1), (1, 1)),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+    ]))
+    story += [
+        heading,
+        Spacer(1, 10),
+        Paragraph(
+            f'As per your requirement following is the Estimate – Quotation for {block_type}.',
+            styles['body'],
+        ),
+        Spacer(1, 10),
+    ]
+
+    rates = Table([
+        [Paragraph('PARTICULARS', styles['cell_bold']), Paragraph('RATE', styles['cell_bold'])],
+        [Paragraph(block_type, styles['cell']), _rupees(estimate.price)],
+        [Paragraph('ADDITIONAL CHARGES', styles['cell_bold']), ''],
+        [f'GST({Decimal(str(estimate.gst_percentage)).normalize():f}%) :', _rupees(estimate.gst_amount)],
+        ['TRANSPORTATION COST :', _rupees(estimate.transportation_charge)],
+        ['LOADING/UNLOADING COST :', _rupees(estimate.loading_unloading_cost)],
+        [Paragraph('GRAND TOTAL :', styles['cell_bold']),
+         Paragraph(_rupees(estimate.total_amount), styles['cell_bold'])],
+    ], colWidths=['50%', '50%'])
+    rates.setStyle(TableStyle([
+        ('GRID', (0, 0), (-1, -1), 0.75, colors.black),
+        ('SPAN', (0, 2), (1, 2)),
+        ('ALIGN', (0, 2), (1, 2), 'CENTER'),
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f2f2f2')),
+        ('FONTSIZE', (0, 0), (-1, -1), 11),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('TOPPADDING', (0, 0), (-1, -1), 6),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+    ]))
+    story += [rates, Spacer(1, 18)]
+
+    if estimate.notes:
+        notes = escape(estimate.notes).replace('\n', '<br/>')
+        story += [
+            Paragraph('<b>NOTE :</b>', styles['body']),
+            Paragraph(notes, styles['body']),
+        ]
+    return story
+
+
+def render_estimate_pdf(estimate):
+    """Return the estimate drawn on the KCP letterpad as PDF bytes."""
+    styles = _get_styles()
+    buffer = io.BytesIO()
+    doc = _document(buffer, f'KCP-ESTIMATE-{estimate.party_name}')
+    doc.build(_estimate_story(estimate, styles), onFirstPage=_footer, onLaterPages=_footer)
+    return buffer.getvalue()
+
+
+def _summary_story(summary, styles):
+    story = _letterhead(styles) + [
+        Paragraph('<b>STATEMENT OF ESTIMATES</b>', styles['body']),
+        Spacer(1, 6),
+    ]
+    story += [Paragraph(escape(line), styles['body']) for line in summary['lines']]
+    story.append(Spacer(1, 12))
+    rows = [[Paragraph(escape(cell), styles['cell_bold']) for cell in summary['header']]]
+    rows += [[str(cell) for cell in row] for row in summary['rows']]
+    rows.append([Paragraph(escape(str(cell)), styles['cell_bold']) for cell in summary['total']])
+    table = Table(rows, repeatRows=1)
+    table.setStyle(TableStyle([
+        ('GRID', (0, 0), (-1, -1), 0.75, colors.black),
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f2f2f2')),
+        ('FONTSIZE', (0, 0), (-1, -1), 9),
+        ('ALIGN', (1, 1), (-1, -1), 'RIGHT'),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ]))
+    story.append(table)
+    return story
+
+
+def render_statement_pdf(party_name, estimates, summary=None):
+    """Return ``estimates`` as one PDF, one letterpad page each, after an optional summary page."""
+    styles = _get_styles()
+    story = []
+    if summary is not None:
+        story += _summary_story(summary, styles)
+    for estimate in estimates:
+        if story:
+            story.append(PageBreak())
+        story += _estimate_story(estimate, styles)
+    buffer = io.BytesIO()
+    doc = _document(buffer, f'KCP-STATEMENT-{party_name}')
+    doc.build(story, onFirstPage=_footer, onLaterPages=_footer)
+    return buffer.getvalue()
@@ -0,0 +1,31 @@
+"""Per-job scratch directories for converters that need files on disk.
+
+Each job gets its own directory (so concurrent jobs never share file names)
+under ``settings.KCP_SCRATCH_DIR``, or ``/dev/shm`` when it is available so
+the files live in memory, and the directory is removed on every exit path.
+"""
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+from django.conf import settings
+
+
+def scratch_root():
+    configured = getattr(settings, 'KCP_SCRATCH_DIR', None)
+    if configured:
+        os.makedirs(configured, exist_ok=True)
+        return configured
+    if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK):
+        return '/dev/shm'
+    return tempfile.gettempdir()
+
+
+@contextmanager
+def scratch_dir(prefix='kcp-'):
+    path = tempfile.mkdtemp(prefix=prefix, dir=scratch_root())
+    try:
+        yield path
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
@@ -0,0 +1,172 @@
+"""Entry points the views use to turn an Estimate into a document.
+
+python-docx and ReportLab are imported on first use, not with this module,
+so web workers that never render (login, dashboard) do not load them. Call
+``warm_up()`` to load them early instead, e.g. in a preloading gunicorn
+master so the workers share those pages.
+"""
+import hashlib
+import io
+import json
+import logging
+import os
+import re
+import threading
+
+from django.conf import settings
+
+from ..metrics import stage
+from .admission import render_slot
+from .cache import get_render_cache
+from .conversion import convert_docx_to_pdf
+from .fields import estimate_replacements
+
+logger = logging.getLogger(__name__)
+# Per-render detail, rate limited in settings.LOGGING.
+diagnostics = logging.getLogger('estimate.rendering.diagnostics')
+
+# 'docx' fills KCP_LETTERPAD.docx and converts it with the converter pool;
+# 'reportlab' draws the letterpad layout natively.
+ENGINES = ('docx', 'reportlab')
+
+DOCX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+
+
+def resolve_engine(engine=None):
+    engine = engine or settings.KCP_RENDER_ENGINE
+    if engine not in ENGINES:
+        raise ValueError(f'Unknown render engine: {engine}')
+    return engine
+
+
+def _letterpad():
+    from .letterpad import get_letterpad
+
+    return get_letterpad(settings.KCP_LETTERPAD_PATH)
+
+
+_version_lock = threading.Lock()
+_versions = {}
+
+
+def letterpad_version(path):
+    """Content hash of the letterpad file, the same as ``LetterpadTemplate.version``.
+
+    Read without parsing the template (or importing python-docx), and only
+    again when the file's mtime or size changes.
+    """
+    st = os.stat(path)
+    stamp = (st.st_mtime_ns, st.st_size)
+    with _version_lock:
+        entry = _versions.get(path)
+    if entry is not None and entry[0] == stamp:
+        return entry[1]
+    with open(path, 'rb') as f:
+        version = hashlib.sha256(f.read()).hexdigest()
+    with _version_lock:
+        _versions[path] = (stamp, version)
+    return version
+
+
+def warm_up():
+    """Import the rendering libraries and compile the letterpad now."""
+    from . import reportlab_renderer  # noqa: F401
+    from . import letterpad  # noqa: F401
+
+    if os.path.exists(settings.KCP_LETTERPAD_PATH):
+        _letterpad()
+
+
+def render_estimate_docx(estimate):
+    """Return the filled letterpad as .docx bytes."""
+    with stage('fields'):
+        replacements = estimate_replacements(estimate)
+    if diagnostics.isEnabledFor(logging.INFO):
+        values = ', '.join(f"{key}: {value}" for key, value in replacements.items())
+        diagnostics.info(f"Text replacements for estimate {estimate.pk}: {values}")
+    return _letterpad().render(replacements)
+
+
+def render_estimate_pdf(estimate, engine=None):
+    """Return the estimate as PDF bytes, using ``engine`` or the deployment default."""
+    if resolve_engine(engine) == 'reportlab':
+        from .reportlab_renderer import render_estimate_pdf as draw_estimate_pdf
+
+        with stage('draw'):
+            return draw_estimate_pdf(estimate)
+    return convert_docx_to_pdf(render_estimate_docx(estimate))
+
+
+def document_key(estimate, engine=None):
+    """Hash of the rendered field values, the engine and the template version.
+
+    Doubles as the download's ETag and the render cache key.
+    """
+    engine = resolve_engine(engine)
+    if engine == 'docx':
+        template_version = letterpad_version(settings.KCP_LETTERPAD_PATH)
+    else:
+        from .reportlab_renderer import RENDERER_VERSION
+
+        template_version = RENDERER_VERSION
+    fields = estimate_replacements(estimate)
+    fields['gst_percentage'] = str(estimate.gst_percentage)
+    payload = json.dumps([engine, template_version, fields], sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def open_estimate_pdf(estimate, engine=None, key=None, block=False):
+    """Return ``(file, key)``: the cached file itself, or the fresh render in memory."""
+    key = key or document_key(estimate, engine)
+    cache = get_render_cache()
+    if cache is not None:
+        with stage('cache_read'):
+            f = cache.open(estimate.pk, key)
+        if f is not None:
+            return f, key
+    pdf, key = get_estimate_pdf(estimate, engine, key=key, block=block)
+    return io.BytesIO(pdf), key
+
+
+def get_estimate_pdf(estimate, engine=None, key=None, block=False):
+    """Return ``(pdf_bytes, key)``, served from the render cache when possible.
+
+    A render first takes a render slot (see ``admission``); unless ``block``,
+    raises ``RenderBusy`` when the host is saturated.
+    """
+    key = key or document_key(estimate, engine)
+    cache = get_render_cache()
+    if cache is not None:
+        with stage('cache_read'):
+            pdf = cache.get(estimate.pk, key)
+        if pdf is not None:
+            return pdf, key
+    with render_slot(block=block):
+        # Another request may have rendered the same document while this one waited.
+        pdf = cache.get(estimate.pk, key) if cache is not None else None
+        if pdf is not None:
+            return pdf, key
+        pdf = render_estimate_pdf(estimate, engine)
+    if cache is not None:
+        try:
+            with stage('cache_write'):
+                cache.put(estimate.pk, key, pdf)
+        except OSError as e:
+            logger.warning(f"Could not store rendered PDF in the cache: {e}")
+    return pdf, key
+
+
+def safe_filename(filename):
+    """``filename`` with path separators, control and other reserved characters replaced.
+
+    Browsers and ``FileResponse`` keep only the part after the last slash.
+    """
+    return re.sub(r'[\\/:*?"<>|\x00-\x1f\x7f]+', '_', filename)
+
+
+def pdf_filename(estimate):
+    return safe_filename(f'KCP-ESTIMATE-{estimate.party_name}.pdf')
+
+
+def docx_filename(estimate):
+    return safe_filename(f'KCP-ESTIMATE-{estimate.party_name}.docx')
@@ -0,0 +1,49 @@
+"""Stand-in converter worker for development and tests.
+
+Speaks the same pipe protocol as ``office_worker`` but needs no office suite:
+it lays the document's paragraph and table text out on a PDF with ReportLab.
+The output is not a faithful rendering of the letterpad.
+
+Run by path: ``python standin_worker.py``.
+"""
+import io
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from worker_protocol import serve  # noqa: E402
+
+
+def _lines(document):
+    for paragraph in document.paragraphs:
+        yield paragraph.text
+    for table in document.tables:
+        for row in table.rows:
+            yield '    '.join(cell.text for cell in row.cells)
+
+
+def convert(docx_bytes):
+    from docx import Document
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    document = Document(io.BytesIO(docx_bytes))
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    width, height = A4
+    y = height - 50
+    for line in _lines(document):
+        if y < 50:
+            pdf.showPage()
+            y = height - 50
+        pdf.drawString(40, y, line.strip()[:110])
+        y -= 14
+    pdf.save()
+    return buffer.getvalue()
+
+
+if __name__ == '__main__':
+    out = sys.stdout.buffer
+    sys.stdout = sys.stderr  # stdout carries frames only
+    serve(convert, sys.stdin.buffer, out)
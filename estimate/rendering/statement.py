@@ -0,0 +1,94 @@
+"""Party statements: many estimates of one party in a single document.
+
+With the docx engine the compiled letterpad is filled once per estimate and
+every copy is saved into one .docx (see ``LetterpadTemplate.render_pages``),
+which then takes one trip through the converter pool. The optional summary
+page comes from database aggregates over the same estimates.
+"""
+from django.conf import settings
+from django.db.models import Count, Max, Min, Sum
+
+from ..metrics import stage
+from .admission import render_slot
+from .conversion import convert_docx_to_pdf
+from .fields import estimate_replacements
+from .service import resolve_engine, safe_filename
+
+SUMMARY_HEADER = (
+    'PAVER BLOCK TYPE', 'ESTIMATES', 'RATE', 'GST', 'TRANSPORT', 'LOADING/UNLOADING', 'GRAND TOTAL',
+)
+AMOUNTS = ('price', 'gst_amount', 'transportation_charge', 'loading_unloading_cost', 'total_amount')
+
+
+def _amounts(row):
+    return [f'{row[field] or 0:.2f}' for field in AMOUNTS]
+
+
+def statement_summary(party_name, estimates):
+    """Totals of ``estimates`` overall and by paver block type, as display strings."""
+    sums = {field: Sum(field) for field in AMOUNTS}
+    by_block_type = (
+        estimates.order_by().values('paver_block_type__name')
+        .annotate(estimate_count=Count('id'), **sums)
+        .order_by('paver_block_type__name')
+    )
+    totals = estimates.aggregate(
+        estimate_count=Count('id'), first_date=Min('date'), last_date=Max('date'), **sums,
+    )
+    return {
+        'lines': [
+            f'TO: {party_name}',
+            f'PERIOD: {totals["first_date"]} to {totals["last_date"]}',
+            f'ESTIMATES: {totals["estimate_count"]}',
+        ],
+        'header': SUMMARY_HEADER,
+        'rows': [
+            [row['paver_block_type__name'], row['estimate_count'], *_amounts(row)]
+            for row in by_block_type
+        ],
+        'total': ['TOTAL', totals['estimate_count'], *_amounts(totals)],
+    }
+
+
+def _summary_prelude(summary):
+    def prelude(document):
+        title = document.add_paragraph()
+        title.add_run('STATEMENT OF ESTIMATES').bold = True
+        for line in summary['lines']:
+            document.add_paragraph(line)
+        rows = [summary['header'], *summary['rows'], summary['total']]
+        table = document.add_table(rows=len(rows), cols=len(summary['header']))
+        table.style = 'Table Grid'
+        for row, values in zip(table.rows, rows):
+            for cell, value in zip(row.cells, values):
+                cell.text = str(value)
+        for row in (table.rows[0], table.rows[-1]):
+            for cell in row.cells:
+                for run in cell.paragraphs[0].runs:
+                    run.bold = True
+    return prelude
+
+
+def render_statement_docx(party_name, estimates, summary=None):
+    """Return one .docx with a letterpad page per estimate, after the optional summary."""
+    from .letterpad import get_letterpad
+
+    with stage('fields'):
+        pages = [estimate_replacements(estimate) for estimate in estimates]
+    prelude = _summary_prelude(summary) if summary is not None else None
+    return get_letterpad(settings.KCP_LETTERPAD_PATH).render_pages(pages, prelude=prelude)
+
+
+def render_statement_pdf(party_name, estimates, summary=None, engine=None, block=False):
+    """Return the statement as PDF bytes: one conversion, whatever the number of estimates."""
+    with render_slot(block=block):
+        if resolve_engine(engine) == 'reportlab':
+            from .reportlab_renderer import render_statement_pdf as draw_statement_pdf
+
+            with stage('draw'):
+                return draw_statement_pdf(party_name, estimates, summary)
+        return convert_docx_to_pdf(render_statement_docx(party_name, estimates, summary))
+
+
+def statement_filename(party_name, extension='pdf'):
+    return safe_filename(f'KCP-STATEMENT-{party_name}.{extension}')
@@ -0,0 +1,53 @@
+"""Framing shared by the converter pool and its worker processes.
+
+Kept free of Django and package-relative imports: worker scripts are run by
+path (possibly under the system Python that has LibreOffice's ``uno``) and
+import this module as a top-level module.
+
+Every message is a 4-byte big-endian length followed by the payload. The
+first four bytes of a payload are the command or status.
+"""
+import struct
+
+PING = b'PING'
+PONG = b'PONG'
+CONVERT = b'CONV'
+OK = b'OK  '
+ERROR = b'ERR '
+
+_HEADER = struct.Struct('>I')
+
+
+def write_frame(stream, payload):
+    stream.write(_HEADER.pack(len(payload)) + payload)
+    stream.flush()
+
+
+def read_frame(stream):
+    """Blocking read of one frame; returns None on EOF."""
+    header = stream.read(_HEADER.size)
+    if len(header) < _HEADER.size:
+        return None
+    (size,) = _HEADER.unpack(header)
+    payload = stream.read(size)
+    if len(payload) < size:
+        return None
+    return payload
+
+
+def serve(handler, stdin, stdout):
+    """Worker main loop: answer PING, pass CONVERT payloads to ``handler``."""
+    while True:
+        frame = read_frame(stdin)
+        if frame is None:
+            return
+        command, body = frame[:4], frame[4:]
+        if command == PING:
+            write_frame(stdout, PONG)
+        elif command == CONVERT:
+            try:
+                write_frame(stdout, OK + handler(body))
+            except Exception as e:
+                write_frame(stdout, ERROR + f'{type(e).__name__}: {e}'.encode('utf-8', 'replace'))
+        else:
+            write_frame(stdout, ERROR + b'unknown command')
@@ -0,0 +1,137 @@
+"""Estimate search: full text over party name and notes, plus indexed filters.
+
+On SQLite the text search uses an FTS5 external-content table,
+``estimate_estimate_fts``, kept in sync with ``estimate_estimate`` by
+triggers, so saves, deletes and bulk writes all update it. On PostgreSQL the
+same lookup is an ``icontains`` served by pg_trgm GIN indexes; other
+databases fall back to a plain ``icontains``.
+
+Django rebuilds SQLite tables for some schema changes, which drops their
+triggers, so ``install_search_index`` also runs after every migrate.
+"""
+import logging
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = 'estimate_estimate_fts'
+
+SQLITE_FTS_SQL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        party_name, notes,
+        content='estimate_estimate', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS estimate_fts_insert AFTER INSERT ON estimate_estimate BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, party_name, notes) VALUES (new.id, new.party_name, new.notes);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS estimate_fts_delete AFTER DELETE ON estimate_estimate BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, party_name, notes)
+        VALUES ('delete', old.id, old.party_name, old.notes);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS estimate_fts_update AFTER UPDATE OF party_name, notes ON estimate_estimate BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, party_name, notes)
+        VALUES ('delete', old.id, old.party_name, old.notes);
+        INSERT INTO {FTS_TABLE}(rowid, party_name, notes) VALUES (new.id, new.party_name, new.notes);
+    END""",
+]
+
+POSTGRESQL_TRGM_SQL = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX IF NOT EXISTS estimate_party_name_trgm ON estimate_estimate USING gin (party_name gin_trgm_ops)',
+    'CREATE INDEX IF NOT EXISTS estimate_notes_trgm ON estimate_estimate USING gin (notes gin_trgm_ops)',
+]
+
+
+def _sqlite_has_fts5(conn):
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        if cursor.fetchone()[0]:
+            return True
+        cursor.execute("SELECT 1 FROM pragma_module_list WHERE name = 'fts5'")
+        return cursor.fetchone() is not None
+
+
+def install_search_index(conn=None, rebuild=False):
+    """Create the FTS table and triggers (SQLite) or trigram indexes (PostgreSQL)."""
+    conn = conn or connection
+    if conn.vendor == 'sqlite':
+        if not _sqlite_has_fts5(conn):
+            logger.warning("SQLite was built without FTS5; estimate search uses LIKE")
+            return
+        with conn.cursor() as cursor:
+            cursor.execute(f"SELECT 1 FROM sqlite_master WHERE name = '{FTS_TABLE}'")
+            created = cursor.fetchone() is None
+            for sql in SQLITE_FTS_SQL:
+                cursor.execute(sql)
+            if created or rebuild:
+                cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    elif conn.vendor == 'postgresql':
+        with conn.cursor() as cursor:
+            for sql in POSTGRESQL_TRGM_SQL:
+                cursor.execute(sql)
+
+
+def remove_search_index(conn=None):
+    conn = conn or connection
+    if conn.vendor == 'sqlite':
+        with conn.cursor() as cursor:
+            for trigger in ('estimate_fts_insert', 'estimate_fts_delete', 'estimate_fts_update'):
+                cursor.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+            cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+    elif conn.vendor == 'postgresql':
+        with conn.cursor() as cursor:
+            cursor.execute('DROP INDEX IF EXISTS estimate_party_name_trgm')
+            cursor.execute('DROP INDEX IF EXISTS estimate_notes_trgm')
+
+
+_fts_ready = False
+
+
+def _fts_available():
+    global _fts_ready
+    if connection.vendor != 'sqlite':
+        return False
+    if not _fts_ready:
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT 1 FROM sqlite_master WHERE name = '{FTS_TABLE}'")
+            _fts_ready = cursor.fetchone() is not None
+    return _fts_ready
+
+
+def fts_query(text):
+    """Turn free text into an FTS5 query: every word must match as a prefix."""
+    words = re.findall(r'\w+', text)
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def text_filter(text):
+    """A Q matching estimates whose party name or notes contain ``text``."""
+    if _fts_available():
+        query = fts_query(text)
+        if not query:
+            return Q()
+        return Q(pk__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [query]))
+    return Q(party_name__icontains=text) | Q(notes__icontains=text)
+
+
+def search_estimates(estimates, q='', date_from=None, date_to=None, paver_block_type=None,
+                     min_total=None, max_total=None):
+    """Narrow the ``estimates`` queryset by text and filters."""
+    if q:
+        estimates = estimates.filter(text_filter(q))
+    if date_from:
+        estimates = estimates.filter(date__gte=date_from)
+    if date_to:
+        estimates = estimates.filter(date__lte=date_to)
+    if paver_block_type:
+        estimates = estimates.filter(paver_block_type=paver_block_type)
+    if min_total is not None:
+        estimates = estimates.filter(total_amount__gte=min_total)
+    if max_total is not None:
+        estimates = estimates.filter(total_amount__lte=max_total)
+    return estimates
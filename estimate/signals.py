@@ -0,0 +1,96 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.signals import user_logged_out
+from django.db import connections, transaction
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_save
+from django.dispatch import receiver
+
+from .auth import forget_user
+from .catalogue import invalidate_catalogue
+from .dashboard import invalidate_dashboard
+from .models import Estimate, PaverBlockType
+from .search import install_search_index
+from .summaries import ESTIMATE_FIELDS, record_change, summary_values
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def drop_cached_user(sender, instance, **kwargs):
+    user_id = instance.pk
+    # Again after commit, in case a concurrent request cached the old row meanwhile.
+    forget_user(user_id)
+    transaction.on_commit(lambda: forget_user(user_id))
+
+
+@receiver(user_logged_out)
+def drop_cached_user_on_logout(sender, request, user, **kwargs):
+    if user is not None:
+        forget_user(user.pk)
+
+
+@receiver(post_save, sender=Estimate)
+@receiver(post_delete, sender=Estimate)
+def drop_cached_dashboard(sender, instance, **kwargs):
+    user_id = instance.created_by_id
+    transaction.on_commit(lambda: invalidate_dashboard(user_id))
+
+
+# Inputs of the database-computed gst_amount and total_amount.
+AMOUNT_INPUTS = ('price', 'gst_percentage', 'transportation_charge', 'loading_unloading_cost')
+SNAPSHOT_FIELDS = tuple(dict.fromkeys(ESTIMATE_FIELDS + AMOUNT_INPUTS))
+
+
+@receiver(pre_save, sender=Estimate)
+def remember_summary_values(sender, instance, raw=False, **kwargs):
+    # What the row looked like before this save, so only the difference is
+    # applied to the summaries afterwards. Taken from the values the instance
+    # was loaded with; only an instance that was not (or was loaded with
+    # .only()) needs the row read.
+    instance._summary_old = None
+    if instance.pk is None or raw:
+        return
+    loaded = getattr(instance, '_loaded_values', {})
+    if all(field in loaded for field in SNAPSHOT_FIELDS):
+        instance._summary_old = {field: loaded[field] for field in SNAPSHOT_FIELDS}
+    else:
+        instance._summary_old = (
+            Estimate.objects.filter(pk=instance.pk).values(*SNAPSHOT_FIELDS).first()
+        )
+
+
+@receiver(post_save, sender=Estimate)
+def update_summaries_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    old = getattr(instance, '_summary_old', None)
+    if not created:
+        # gst_amount and total_amount are computed by the database and only
+        # come back with inserts; after an update they only need reloading
+        # if one of their inputs changed.
+        if old is None or any(getattr(instance, field) != old[field] for field in AMOUNT_INPUTS):
+            instance.refresh_from_db(fields=['gst_amount', 'total_amount'])
+        else:
+            instance.gst_amount, instance.total_amount = old['gst_amount'], old['total_amount']
+    new = summary_values(instance)
+    record_change(old and {field: old[field] for field in ESTIMATE_FIELDS}, new)
+    instance._summary_old = None
+    instance._loaded_values = {field: getattr(instance, field) for field in SNAPSHOT_FIELDS}
+
+
+@receiver(post_delete, sender=Estimate)
+def update_summaries_on_delete(sender, instance, **kwargs):
+    record_change(summary_values(instance), None)
+
+
+@receiver(post_save, sender=PaverBlockType)
+@receiver(post_delete, sender=PaverBlockType)
+def drop_cached_catalogue(sender, **kwargs):
+    # After commit, so no worker can reload and cache the old rows under
+    # the new version.
+    transaction.on_commit(invalidate_catalogue)
+
+
+@receiver(post_migrate)
+def restore_search_index(sender, using, **kwargs):
+    # Table rebuilds during migrate drop the FTS triggers; put them back.
+    if sender.name == 'estimate':
+        install_search_index(connections[using])
@@ -0,0 +1,274 @@
+"""Monthly sales summaries, maintained incrementally.
+
+Every estimate contributes its amounts to one ``BlockTypeMonthlySummary`` row
+and one ``PartyMonthlySummary`` row, keyed by owner and month. Saves and
+deletes apply the difference as ``F()`` updates (see ``signals``), so reports
+and the dashboard read a handful of summary rows instead of scanning
+estimates. Writes that bypass signals (``QuerySet.update``, ``bulk_create``)
+must call ``apply_estimates`` themselves, or be followed by
+``rebuild_summaries``.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import Count, F, Max, Min, Sum
+from django.db.models.functions import TruncMonth
+
+from .models import BlockTypeMonthlySummary, Estimate, PartyMonthlySummary
+
+CENT = Decimal('0.01')
+SUMMARY_AMOUNTS = ('revenue', 'gst_amount', 'transportation_charge', 'loading_unloading_cost')
+# Batches touching more summary rows than this are applied with one upsert
+# statement per model instead of one UPDATE per row.
+BULK_THRESHOLD = 20
+
+# Values read from an estimate row; revenue is the estimate's total amount.
+ESTIMATE_FIELDS = (
+    'created_by_id', 'date', 'paver_block_type_id', 'party_name',
+    'total_amount', 'gst_amount', 'transportation_charge', 'loading_unloading_cost',
+)
+
+
+def summary_values(estimate):
+    """The fields of ``estimate`` that summaries depend on, as a dict."""
+    return {field: getattr(estimate, field) for field in ESTIMATE_FIELDS}
+
+
+def _money(value):
+    # Rounded the way the database stores a two-place DecimalField, so the
+    # deltas match what a rebuild would compute.
+    return Decimal(str(value or 0)).quantize(CENT)
+
+
+def _amounts(values):
+    return {
+        'revenue': _money(values['total_amount']),
+        'gst_amount': _money(values['gst_amount']),
+        'transportation_charge': _money(values['transportation_charge']),
+        'loading_unloading_cost': _money(values['loading_unloading_cost']),
+    }
+
+
+def _keys(values):
+    month = values['date'].replace(day=1)
+    return (
+        (BlockTypeMonthlySummary, {
+            'created_by_id': values['created_by_id'], 'month': month,
+            'paver_block_type_id': values['paver_block_type_id'],
+        }),
+        (PartyMonthlySummary, {
+            'created_by_id': values['created_by_id'], 'month': month,
+            'party_name': values['party_name'],
+        }),
+    )
+
+
+def _bump(model, lookup, count, amounts):
+    changes = {'estimate_count': F('estimate_count') + count}
+    changes.update({field: F(field) + amount for field, amount in amounts.items()})
+    if model.objects.filter(**lookup).update(**changes):
+        if count < 0:
+            model.objects.filter(**lookup, estimate_count__lte=0).delete()
+        return
+    if count <= 0:
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, estimate_count=count, **amounts)
+    except IntegrityError:
+        # Another request created the row first.
+        model.objects.filter(**lookup).update(**changes)
+
+
+def _upsert_many(model, entries):
+    """Add many deltas to one model with ``INSERT ... ON CONFLICT DO UPDATE``."""
+    connection = connections[router.db_for_write(model)]
+    qn = connection.ops.quote_name
+    fields = [name for name, _ in next(iter(entries))]
+    key_columns = [model._meta.get_field(name).column for name in fields]
+    value_columns = ['estimate_count', *SUMMARY_AMOUNTS]
+    table = qn(model._meta.db_table)
+    sql = (
+        f"INSERT INTO {table} ({', '.join(qn(c) for c in key_columns + value_columns)}) "
+        f"VALUES ({', '.join(['%s'] * (len(key_columns) + len(value_columns)))}) "
+        f"ON CONFLICT ({', '.join(qn(c) for c in key_columns)}) DO UPDATE SET "
+        + ', '.join(f'{qn(c)} = {table}.{qn(c)} + EXCLUDED.{qn(c)}' for c in value_columns)
+    )
+    params = [
+        [value for _, value in lookup] + [count] + [
+            connection.ops.adapt_decimalfield_value(amounts[field], 14, 2) for field in SUMMARY_AMOUNTS
+        ]
+        for lookup, (count, amounts) in entries.items()
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+    if any(count < 0 for count, _ in entries.values()):
+        users = {value for lookup in entries for name, value in lookup if name == 'created_by_id'}
+        model.objects.filter(created_by_id__in=users, estimate_count__lte=0).delete()
+
+
+def apply_changes(deltas):
+    """Apply ``{(model, lookup items): [count, amounts]}`` to the summary tables."""
+    by_model = defaultdict(dict)
+    for (model, lookup), (count, amounts) in deltas.items():
+        if count or any(amounts.values()):
+            by_model[model][lookup] = (count, amounts)
+    with transaction.atomic():
+        for model, entries in by_model.items():
+            if len(entries) > BULK_THRESHOLD and connections[router.db_for_write(model)].features.supports_update_conflicts_with_target:
+                _upsert_many(model, entries)
+            else:
+                for lookup, (count, amounts) in entries.items():
+                    _bump(model, dict(lookup), count, amounts)
+
+
+def _collect(deltas, values, sign):
+    amounts = _amounts(values)
+    for model, lookup in _keys(values):
+        entry = deltas.setdefault((model, tuple(sorted(lookup.items()))), [0, defaultdict(Decimal)])
+        entry[0] += sign
+        for field, amount in amounts.items():
+            entry[1][field] += sign * amount
+
+
+def apply_estimates(added=(), removed=()):
+    """Add and subtract estimates (as ``summary_values`` dicts) in one batch.
+
+    Rows sharing a month, owner and key are combined first, so a batch of
+    thousands of estimates costs one update per summary row it touches.
+    """
+    deltas = {}
+    for values in removed:
+        _collect(deltas, values, -1)
+    for values in added:
+        _collect(deltas, values, 1)
+    apply_changes(deltas)
+
+
+def record_change(old, new):
+    """Move one estimate's contribution from ``old`` to ``new`` values; either may be None."""
+    if old == new:
+        return
+    apply_estimates(added=[new] if new else (), removed=[old] if old else ())
+
+
+GROUPINGS = {
+    BlockTypeMonthlySummary: ('created_by_id', 'month', 'paver_block_type_id'),
+    PartyMonthlySummary: ('created_by_id', 'month', 'party_name'),
+}
+AGGREGATES = {
+    'estimate_count': Count('id'),
+    'revenue': Sum('total_amount'),
+    'gst_amount': Sum('gst_amount'),
+    'transportation_charge': Sum('transportation_charge'),
+    'loading_unloading_cost': Sum('loading_unloading_cost'),
+}
+
+
+def _aggregate(estimates, totals):
+    """Add the grouped sums of ``estimates`` into ``totals`` ({model: {key: sums}})."""
+    rows = estimates.annotate(month=TruncMonth('date'))
+    for model, group in GROUPINGS.items():
+        for row in rows.values(*group).annotate(**AGGREGATES).order_by():
+            key = tuple(row[field] for field in group)
+            merged = totals[model].setdefault(key, dict.fromkeys(AGGREGATES, 0))
+            for field in AGGREGATES:
+                merged[field] += row[field] or 0
+
+
+def _replace(totals, **scope):
+    for model, group in GROUPINGS.items():
+        model.objects.filter(**scope).delete()
+        model.objects.bulk_create(
+            (model(**dict(zip(group, key)), **values) for key, values in totals[model].items()),
+            batch_size=1000,
+        )
+
+
+def rebuild_summaries(chunk_size=5000, stdout=None):
+    """Recompute both summary tables from the estimate table.
+
+    Estimates are aggregated by the database one primary key range at a time,
+    so no single query holds the whole table, and the results are merged in
+    memory (one entry per summary row) before replacing the tables.
+    """
+    totals = {model: {} for model in GROUPINGS}
+    last_pk = 0
+    processed = 0
+    while True:
+        chunk = list(
+            Estimate.objects.filter(pk__gt=last_pk).order_by('pk')
+            .values_list('pk', flat=True)[:chunk_size]
+        )
+        if not chunk:
+            break
+        _aggregate(Estimate.objects.filter(pk__gte=chunk[0], pk__lte=chunk[-1]), totals)
+        last_pk = chunk[-1]
+        processed += len(chunk)
+        if stdout is not None:
+            stdout.write(f'Aggregated {processed} estimates')
+
+    with transaction.atomic():
+        _replace(totals)
+    return {model.__name__: len(rows) for model, rows in totals.items()}
+
+
+def summary_spans(estimates):
+    """The ``(created_by_id, first month, last month)`` ranges ``estimates`` fall in.
+
+    Take these before an ``update()`` that may change which rows the
+    queryset matches, then pass them to ``refresh_summaries``.
+    """
+    return [
+        (span['created_by_id'], span['first'].replace(day=1), span['last'].replace(day=1))
+        for span in estimates.order_by().values('created_by_id').annotate(
+            first=Min('date'), last=Max('date'),
+        )
+    ]
+
+
+def refresh_summaries(spans):
+    """Recompute the summary rows for each ``(created_by_id, first, last)`` month range."""
+    with transaction.atomic():
+        for created_by_id, first, last in spans:
+            totals = {model: {} for model in GROUPINGS}
+            after_last = months_back(last, 0)  # first day of the following month
+            _aggregate(
+                Estimate.objects.filter(
+                    created_by_id=created_by_id, date__gte=first, date__lt=after_last,
+                ),
+                totals,
+            )
+            _replace(totals, created_by_id=created_by_id, month__gte=first, month__lte=last)
+
+
+def dashboard_totals(user, month):
+    """This month's totals for ``user``, read from the summary table."""
+    totals = BlockTypeMonthlySummary.objects.filter(created_by=user, month=month).aggregate(
+        estimate_count=Sum('estimate_count'),
+        revenue=Sum('revenue'),
+        gst_amount=Sum('gst_amount'),
+        transportation_charge=Sum('transportation_charge'),
+        loading_unloading_cost=Sum('loading_unloading_cost'),
+    )
+    return {field: value or 0 for field, value in totals.items()}
+
+
+def months_back(month, count):
+    """The first day of the month ``count - 1`` months before ``month``."""
+    index = month.year * 12 + month.month - 1 - (count - 1)
+    return month.replace(year=index // 12, month=index % 12 + 1, day=1)
+
+
+def sales_report(user, first_month, last_month):
+    """Monthly rows by paver block type and by party for ``user``."""
+    window = {'created_by': user, 'month__gte': first_month, 'month__lte': last_month}
+    return {
+        'by_block_type': (
+            BlockTypeMonthlySummary.objects.filter(**window)
+            .select_related('paver_block_type')
+            .order_by('-month', '-revenue')
+        ),
+        'by_party': PartyMonthlySummary.objects.filter(**window).order_by('-month', '-revenue'),
+    }
@@ -1,3 +1,512 @@
-from django.test import TestCase
+import base64
+import io
+import json
+import re
+import tempfile
+from datetime import date
+from decimal import Decimal
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils.http import http_date
+
+from docx import Document
+
+from .auth import CachedModelBackend, basic_auth_user
+from .catalogue import get_paver_block_types
+from .dashboard import invalidate_dashboard
+from .importing import import_estimates
+from .jobs import claim_next_job, heartbeat, run_job
+from .models import BlockTypeMonthlySummary, Estimate, PaverBlockType
+from .pagination import keyset_paginate
+from .rendering.admission import RenderBusy, _queue_depth, _slots_busy, render_slot
+from .rendering.cache import get_render_cache
+from .rendering.conversion import ConverterPool, StandInBackend
+from .rendering.letterpad import get_letterpad
+from .rendering.placeholders import replace_placeholders_in_element
+from .rendering.reportlab_renderer import _get_styles, _summary_story
+from .rendering.service import pdf_filename
+from .rendering.statement import statement_filename
+from .search import search_estimates
+
+# Keep the tests' catalogue, dashboard and user entries out of the real cache.
+TEST_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests'}}
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ImportEstimatesTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('importer')
+        PaverBlockType.objects.create(name='Zig-Zag 60mm')
+
+    def _import(self, csv_text):
+        return import_estimates(io.BytesIO(csv_text.encode()), 'estimates.csv', self.user)
+
+    def test_non_finite_amounts_are_rejected(self):
+        result = self._import(
+            'party_name,date,paver_block_type,price,transportation_charge\n'
+            'Acme,2025-01-15,Zig-Zag 60mm,NaN,0\n'
+            'Acme,2025-01-15,Zig-Zag 60mm,Infinity,0\n'
+            'Acme,2025-01-15,Zig-Zag 60mm,45.50,sNaN\n'
+            'Acme,2025-01-15,Zig-Zag 60mm,45.50,2\n'
+        )
+        self.assertEqual(result.created, 1)
+        self.assertEqual([line for line, _ in result.errors], [2, 3, 4])
+        self.assertTrue(all('is not a number' in message for _, message in result.errors))
+        self.assertEqual(Estimate.objects.count(), 1)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ApiRenderTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('erp', password='erp-secret')
+        block_type = PaverBlockType.objects.create(name='Zig-Zag 60mm')
+        self.estimate = Estimate.objects.create(
+            party_name='Acme', date=date(2025, 1, 15), paver_block_type=block_type,
+            price=Decimal('45.50'), gst_percentage=Decimal('18'), created_by=self.user,
+        )
+        credentials = base64.b64encode(b'erp:erp-secret').decode()
+        self.auth = {'HTTP_AUTHORIZATION': f'Basic {credentials}'}
+        render_cache = tempfile.TemporaryDirectory()
+        self.addCleanup(render_cache.cleanup)
+        settings_override = override_settings(KCP_RENDER_CACHE={'DIR': render_cache.name})
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(cache.clear)
+
+    def test_basic_auth_client_can_follow_returned_urls(self):
+        heartbeat()
+        response = self.client.post(f'/api/estimates/{self.estimate.id}/render/?engine=reportlab', **self.auth)
+        self.assertEqual(response.status_code, 202)
+        status_url = response.json()['status_url']
+
+        response = self.client.get(status_url, **self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], 'pending')
+
+        run_job(claim_next_job())
+        response = self.client.get(status_url, **self.auth)
+        self.assertEqual(response.json()['status'], 'done')
+        response = self.client.get(response.json()['download_url'], **self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+
+        pdf_url = self.client.get(f'/api/estimates/{self.estimate.id}/', **self.auth).json()['pdf_url']
+        response = self.client.get(f'{pdf_url}?engine=reportlab', **self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+
+    def test_render_without_a_live_worker_is_done_at_once(self):
+        response = self.client.post(f'/api/estimates/{self.estimate.id}/render/?engine=reportlab', **self.auth)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['status'], 'done')
+        response = self.client.get(response.json()['download_url'], **self.auth)
+        self.assertEqual(response.status_code, 200)
+
+    def test_bulk_create_resolves_block_types_by_id(self):
+        duplicate = PaverBlockType.objects.create(name='zig-zag 60MM')
+        row = {'party_name': 'Acme', 'date': '2025-01-15', 'price': '45.50'}
+
+        response = self.client.post('/api/estimates/', json.dumps([dict(row, paver_block_type=duplicate.id)]),
+                                    content_type='application/json', **self.auth)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['results'][0]['paver_block_type'], duplicate.id)
+
+        response = self.client.post('/api/estimates/', json.dumps([dict(row, paver_block_type=9999)]),
+                                    content_type='application/json', **self.auth)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['errors'], [{'index': 0, 'error': 'unknown paver block type id 9999'}])
+
+    def test_estimate_list_changes_after_a_delete(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            other = Estimate.objects.create(
+                party_name='Other', date=date(2025, 1, 16), paver_block_type=self.estimate.paver_block_type,
+                price=Decimal('10.00'), gst_percentage=Decimal('18'), created_by=self.user,
+            )
+        # Oldest change first: the first page holds only self.estimate, not the one deleted.
+        url = '/api/estimates/?limit=1'
+        first = self.client.get(url, **self.auth)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'], **self.auth).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            other.delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'], **self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([estimate['id'] for estimate in response.json()['results']], [self.estimate.id])
+        self.assertFalse(response.json()['has_more'])
+
+
+class FilenameTests(SimpleTestCase):
+    def test_party_name_cannot_shorten_the_download_name(self):
+        estimate = Estimate(party_name='A Party/1"x\tCo')
+        self.assertEqual(pdf_filename(estimate), 'KCP-ESTIMATE-A Party_1_x_Co.pdf')
+        self.assertEqual(statement_filename('A\\B:C', 'docx'), 'KCP-STATEMENT-A_B_C.docx')
+
+
+class StatementSummaryTests(SimpleTestCase):
+    def test_plain_table_cells_are_not_escaped(self):
+        summary = {
+            'lines': ['TO: A & B'],
+            'header': ('PAVER BLOCK TYPE', 'ESTIMATES'),
+            'rows': [['I & H 80mm', 2]],
+            'total': ['TOTAL', 2],
+        }
+        table = _summary_story(summary, _get_styles())[-1]
+        self.assertEqual(table._cellvalues[1], ['I & H 80mm', '2'])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class RepriceCommandTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('pricer')
+        self.estimate = Estimate.objects.create(
+            party_name='Acme', date=date(2025, 1, 15), paver_block_type=PaverBlockType.objects.create(name='I'),
+            price=Decimal('100.00'), gst_percentage=Decimal('18'), created_by=self.user,
+        )
+        self.addCleanup(cache.clear)
+
+    def test_bad_options_are_rejected_before_the_update(self):
+        for options in (['--gst', 'abc'], ['--gst', '150'], ['--transport', '-5'], ['--gst', 'NaN'],
+                        ['--gst', '5', '--date-to', '2025-13-01'], ['--gst', '5', '--date-from', 'soon']):
+            with self.subTest(options=options), self.assertRaises(CommandError):
+                call_command('reprice_estimates', '--user', 'pricer', *options, stdout=io.StringIO())
+        self.estimate.refresh_from_db()
+        self.assertEqual(self.estimate.gst_percentage, Decimal('18'))
+
+    def test_reprice_updates_the_generated_totals(self):
+        call_command('reprice_estimates', '--user', 'pricer', '--gst', '5', '--transport', '10',
+                     '--date-to', '2025-01-31', stdout=io.StringIO())
+        self.estimate.refresh_from_db()
+        self.assertEqual(self.estimate.gst_amount, Decimal('5.00'))
+        self.assertEqual(self.estimate.total_amount, Decimal('115.00'))
+
+
+class AdmissionTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        admission = {'DIR': directory.name, 'SLOTS': 1, 'QUEUE': 0, 'TIMEOUT': 0, 'RETRY_AFTER': 7}
+        settings_override = override_settings(KCP_RENDER_ADMISSION=admission)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_gauges_count_holders_without_taking_the_locks(self):
+        self.assertEqual(_slots_busy(), 0)
+        with render_slot():
+            self.assertEqual((_slots_busy(), _queue_depth()), (1, 0))
+            with self.assertRaises(RenderBusy) as busy:
+                with render_slot():
+                    pass
+            self.assertEqual(busy.exception.retry_after, 7)
+        self.assertEqual(_slots_busy(), 0)
+
+
+@override_settings(CACHES=TEST_CACHES, KCP_DASHBOARD_THUMBNAILS=True)
+class DashboardThumbnailTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('viewer')
+        self.block_type = PaverBlockType.objects.create(name='Zig-Zag 60mm')
+        Estimate.objects.create(
+            party_name='Acme', date=date(2025, 1, 15), paver_block_type=self.block_type,
+            price=Decimal('45.50'), created_by=self.user,
+        )
+        self.client.force_login(self.user)
+        self.addCleanup(cache.clear)
+
+    def _thumbnail_url(self):
+        return re.search(r'<img src="([^"]+thumbnail[^"]+)"', self.client.get('/dashboard/').content.decode()).group(1)
+
+    def test_thumbnail_url_changes_when_the_block_type_is_renamed(self):
+        before = self._thumbnail_url()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.block_type.name = 'Zig-Zag 80mm'
+            self.block_type.save()
+        after = self._thumbnail_url()
+        self.assertNotEqual(before, after)
+        self.assertEqual(self.client.get(after)['Content-Type'], 'image/png')
+
+
+@override_settings(CACHES=TEST_CACHES)
+class DashboardCachingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('owner')
+        self.estimate = Estimate.objects.create(
+            party_name='Acme', date=date(2025, 1, 15), paver_block_type=PaverBlockType.objects.create(name='I'),
+            price=Decimal('45.50'), created_by=self.user,
+        )
+        self.client.force_login(self.user)
+        self.addCleanup(cache.clear)
+
+    def test_last_modified_is_the_newest_update(self):
+        response = self.client.get('/dashboard/')
+        self.assertEqual(response['Last-Modified'], http_date(self.estimate.updated_at.timestamp()))
+        # A new version with no changed rows keeps the same Last-Modified.
+        invalidate_dashboard(self.user.pk)
+        response = self.client.get('/dashboard/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Last-Modified'], http_date(self.estimate.updated_at.timestamp()))
+
+    def test_unchanged_dashboard_is_304_until_an_estimate_is_written(self):
+        etag = self.client.get('/dashboard/')['ETag']
+        self.assertEqual(self.client.get('/dashboard/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.estimate.party_name = 'Acme Builders'
+            self.estimate.save()
+        response = self.client.get('/dashboard/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Acme Builders')
+
+
+@override_settings(CACHES=TEST_CACHES)
+class RenderCacheTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('renderer')
+        self.estimate = Estimate.objects.create(
+            party_name='Acme', date=date(2025, 1, 15), paver_block_type=PaverBlockType.objects.create(name='I'),
+            price=Decimal('45.50'), created_by=self.user,
+        )
+        self.client.force_login(self.user)
+        render_cache = tempfile.TemporaryDirectory()
+        self.addCleanup(render_cache.cleanup)
+        settings_override = override_settings(KCP_RENDER_CACHE={'DIR': render_cache.name})
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(cache.clear)
+
+    def test_download_is_cached_and_revalidated_by_content(self):
+        url = f'/generate-pdf/{self.estimate.id}/?engine=reportlab'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertTrue(get_render_cache().exists(self.estimate.pk, etag.strip('"')))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.estimate.price = Decimal('50.00')
+        self.estimate.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        # The old entry is left for eviction rather than deleted on save.
+        self.assertTrue(get_render_cache().exists(self.estimate.pk, etag.strip('"')))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class CachedUserTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('scripter', password='first-secret')
+        self.addCleanup(cache.clear)
+
+    def _basic_auth(self, password):
+        credentials = base64.b64encode(f'scripter:{password}'.encode()).decode()
+        return basic_auth_user(RequestFactory().get('/', HTTP_AUTHORIZATION=f'Basic {credentials}'))
+
+    def test_basic_auth_is_remembered_until_the_user_changes(self):
+        self.assertEqual(self._basic_auth('first-secret'), self.user)
+        # Later requests skip the password hash, and once the user is cached, the database.
+        self.assertEqual(self._basic_auth('first-secret'), self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(self._basic_auth('first-secret'), self.user)
+        self.assertIsNone(self._basic_auth('wrong'))
+
+        self.user.set_password('second-secret')
+        self.user.save()
+        self.assertIsNone(self._basic_auth('first-secret'))
+        self.assertEqual(self._basic_auth('second-secret'), self.user)
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(self._basic_auth('second-secret'))
+
+    def test_saving_a_user_drops_every_cached_copy(self):
+        backend = CachedModelBackend()
+        self.assertEqual(backend.get_user(self.user.pk).username, 'scripter')
+        with self.assertNumQueries(0):
+            backend.get_user(self.user.pk)
+        # Changed behind the cache's back: the copy in memory is still served.
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertIsNotNone(backend.get_user(self.user.pk))
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(backend.get_user(self.user.pk))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class SummaryMaintenanceTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('seller')
+        self.block_type = PaverBlockType.objects.create(name='I')
+        Estimate.objects.create(
+            party_name='Acme', date=date(2025, 1, 15), paver_block_type=self.block_type,
+            price=Decimal('100.00'), gst_percentage=Decimal('18'), created_by=self.user,
+        )
+        self.addCleanup(cache.clear)
+
+    def _summary(self):
+        return BlockTypeMonthlySummary.objects.values_list('estimate_count', 'revenue', 'gst_amount').get()
+
+    def test_saves_apply_the_difference_without_rereading_the_row(self):
+        self.assertEqual(self._summary(), (1, Decimal('118.00'), Decimal('18.00')))
+        estimate = Estimate.objects.get()
+        estimate.notes = 'Delivery included'
+        with self.assertNumQueries(1):
+            estimate.save()
+
+        estimate.price = Decimal('200.00')
+        estimate.save()
+        self.assertEqual(estimate.total_amount, Decimal('236.00'))
+        self.assertEqual(self._summary(), (1, Decimal('236.00'), Decimal('36.00')))
+        # A second save of the same instance starts from what the first one wrote.
+        estimate.gst_percentage = Decimal('5')
+        estimate.save()
+        self.assertEqual(self._summary(), (1, Decimal('210.00'), Decimal('10.00')))
+
+        estimate.delete()
+        self.assertFalse(BlockTypeMonthlySummary.objects.filter(estimate_count__gt=0).exists())
+
+
+class PlaceholderTests(SimpleTestCase):
+    def test_placeholders_split_across_runs_keep_their_formatting(self):
+        paragraph = Document().add_paragraph()
+        for text in ('₹ ', '{{ ', 'rate', '1', ' }}', ' /- PER SQ. FEET'):
+            paragraph.add_run(text)
+        paragraph.runs[0].bold = True
+        count = replace_placeholders_in_element(paragraph, {'rate1': '42.50', '<rate2>': '7.65'})
+        self.assertEqual(count, 1)
+        self.assertEqual(paragraph.text, '₹ 42.50 /- PER SQ. FEET')
+        self.assertTrue(paragraph.runs[0].bold)
+        self.assertEqual(paragraph.runs[-1].text, ' /- PER SQ. FEET')
+
+    def test_unknown_and_old_style_placeholders(self):
+        paragraph = Document().add_paragraph()
+        paragraph.add_run('<partyname> {{ missing }}')
+        replace_placeholders_in_element(paragraph, {'partyname': 'Acme'})
+        self.assertEqual(paragraph.text, 'Acme {{ missing }}')
+
+    def test_compiled_letterpad_renders_and_restores_itself(self):
+        template = get_letterpad(settings.KCP_LETTERPAD_PATH)
+        self.assertIs(get_letterpad(settings.KCP_LETTERPAD_PATH), template)
+
+        def text(data):
+            return ''.join(Document(io.BytesIO(data)).element.body.itertext())
+
+        first = text(template.render({'partyname': 'First Party', 'NOTE': 'First note'}))
+        second = text(template.render({'partyname': 'Second Party'}))
+        self.assertIn('TO: First Party', first)
+        self.assertIn('First note', first)
+        self.assertIn('TO: Second Party', second)
+        self.assertNotIn('First', second)
+
+
+class ConverterPoolTests(SimpleTestCase):
+    def test_converters_are_reused_then_recycled(self):
+        pool = ConverterPool(StandInBackend, size=1, max_jobs=2, timeout=30)
+        self.addCleanup(pool.close)
+        docx = io.BytesIO()
+        document = Document()
+        document.add_paragraph('TO: Acme')
+        document.save(docx)
+        member = pool._members[0]
+
+        self.assertTrue(pool.convert(docx.getvalue()).startswith(b'%PDF'))
+        pid = member.backend.process.pid
+        pool.convert(docx.getvalue())
+        # Recycled after MAX_JOBS conversions; the next job starts a new worker.
+        self.assertFalse(member.started)
+        pool.convert(docx.getvalue())
+        self.assertNotEqual(member.backend.process.pid, pid)
+
+
+def _estimates(user, block_type, count):
+    return [
+        Estimate.objects.create(
+            party_name=f'Party {i}', date=date(2025, 1, 1 + i), paver_block_type=block_type,
+            price=Decimal('10.00'), created_by=user,
+        )
+        for i in range(count)
+    ]
+
+
+@override_settings(CACHES=TEST_CACHES)
+class PaginationTests(TestCase):
+    def test_pages_walk_forward_and_back_by_cursor(self):
+        user = User.objects.create_user('pager')
+        created = _estimates(user, PaverBlockType.objects.create(name='I'), 5)
+        newest_first = [estimate.id for estimate in reversed(created)]
+        estimates = Estimate.objects.filter(created_by=user)
+
+        pages, after = [], None
+        while True:
+            page = keyset_paginate(estimates, 2, after=after)
+            pages.append([estimate.id for estimate in page.items])
+            if not page.has_next:
+                break
+            after = page.next_cursor
+        self.assertEqual(pages, [newest_first[:2], newest_first[2:4], newest_first[4:]])
+
+        back = keyset_paginate(estimates, 2, before=page.previous_cursor)
+        self.assertEqual([estimate.id for estimate in back.items], newest_first[2:4])
+        self.assertEqual(keyset_paginate(estimates, 2, after='not a cursor').items[0].id, newest_first[0])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class SearchTests(TestCase):
+    def test_text_search_matches_party_names_and_notes_by_prefix(self):
+        user = User.objects.create_user('searcher')
+        block_type = PaverBlockType.objects.create(name='I')
+        acme, _ = _estimates(user, block_type, 2)
+        acme.party_name = 'Acme Builders'
+        acme.save()
+        noted = Estimate.objects.create(
+            party_name='Other', date=date(2025, 2, 1), paver_block_type=block_type, price=Decimal('10.00'),
+            notes='Delivery to the Acme site', created_by=user,
+        )
+        estimates = Estimate.objects.filter(created_by=user)
+
+        self.assertEqual(set(search_estimates(estimates, q='acm')), {acme, noted})
+        self.assertEqual(list(search_estimates(estimates, q='builders')), [acme])
+        self.assertEqual(list(search_estimates(estimates, q='acme', date_from=date(2025, 2, 1))), [noted])
+        noted.delete()
+        self.assertEqual(list(search_estimates(estimates, q='delivery')), [])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class CatalogueTests(TestCase):
+    def setUp(self):
+        self.addCleanup(cache.clear)
+
+    def test_catalogue_is_cached_until_a_block_type_changes(self):
+        block_type = PaverBlockType.objects.create(name='I')
+        self.assertEqual(get_paver_block_types(), [block_type])
+        with self.assertNumQueries(0):
+            get_paver_block_types()
+        with self.captureOnCommitCallbacks(execute=True):
+            block_type.name = 'I & H'
+            block_type.save()
+        self.assertEqual([item.name for item in get_paver_block_types()], ['I & H'])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class RenderAdmissionViewTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('busy')
+        self.estimate = _estimates(self.user, PaverBlockType.objects.create(name='I'), 1)[0]
+        self.client.force_login(self.user)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(
+            KCP_RENDER_CACHE={},
+            KCP_RENDER_ADMISSION={'DIR': directory.name, 'SLOTS': 1, 'QUEUE': 0, 'RETRY_AFTER': 9},
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(cache.clear)
+
+    def test_saturated_host_answers_503_with_retry_after(self):
+        url = f'/generate-pdf/{self.estimate.id}/?engine=reportlab'
+        with render_slot():
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '9')
+        self.assertEqual(self.client.get(url).status_code, 200)
@@ -1,12 +1,32 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 urlpatterns = [
     path('', views.login_view, name='login'),
     path('dashboard/', views.dashboard, name='dashboard'),
+    path('search/', views.search, name='search'),
+    path('reports/', views.reports, name='reports'),
     path('create-estimate/', views.create_estimate, name='create_estimate'),
+    path('import-estimates/', views.import_estimates_view, name='import_estimates'),
     path('manage-paver-blocks/', views.manage_paver_blocks, name='manage_paver_blocks'),
     path('delete-paver-block/<int:paver_block_id>/', views.delete_paver_block, name='delete_paver_block'),
     path('generate-pdf/<int:estimate_id>/', views.generate_pdf, name='generate_pdf'),
+    path('generate-docx/<int:estimate_id>/', views.generate_docx, name='generate_docx'),
+    path('preview/<int:estimate_id>/', views.preview_estimate, name='preview_estimate'),
+    path('preview/<int:estimate_id>/thumbnail.png', views.estimate_thumbnail, name='estimate_thumbnail'),
     path('delete-estimate/<int:estimate_id>/', views.delete_estimate, name='delete_estimate'),
+    path('bulk-export/', views.bulk_export, name='bulk_export'),
+    path('party-statement/', views.party_statement, name='party_statement'),
+    path('render-jobs/estimate/<int:estimate_id>/', views.enqueue_render_job, name='enqueue_render_job'),
+    path('render-jobs/<int:job_id>/', views.render_job_status, name='render_job_status'),
+    path('render-jobs/<int:job_id>/download/', views.render_job_download, name='render_job_download'),
+    path('metrics', views.metrics, name='metrics'),
+    path('api/paver-block-types/', api.paver_block_type_list, name='api_paver_block_types'),
+    path('api/paver-block-types/<int:paver_block_type_id>/', api.paver_block_type_detail, name='api_paver_block_type'),
+    path('api/estimates/', api.estimate_list, name='api_estimates'),
+    path('api/estimates/<int:estimate_id>/', api.estimate_detail, name='api_estimate'),
+    path('api/estimates/<int:estimate_id>/pdf/', api.estimate_pdf, name='api_estimate_pdf'),
+    path('api/estimates/<int:estimate_id>/render/', api.estimate_render, name='api_estimate_render'),
+    path('api/render-jobs/<int:job_id>/', api.render_job_status, name='api_render_job_status'),
+    path('api/render-jobs/<int:job_id>/download/', api.render_job_download, name='api_render_job_download'),
 ] 
\ No newline at end of file
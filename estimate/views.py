@@ -2,28 +2,52 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import login, authenticate
 from django.contrib import messages
-from django.http import HttpResponse
-from docx import Document
-from docx.text.paragraph import Paragraph
-from docx.table import _Cell
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_POST
+from django.conf import settings
+from django.utils.cache import get_conditional_response
+from django.utils.functional import SimpleLazyObject
+from django.middleware.csrf import get_token
+from django.utils.http import http_date
+import hashlib
+import io
 import os
-from datetime import datetime
-from .models import Estimate, PaverBlockType
-from .forms import CustomLoginForm, EstimateForm, PaverBlockTypeForm
-import tempfile
+from datetime import date
+from .models import Estimate, PaverBlockType, RenderJob
+from .forms import (
+    BulkExportForm, CustomLoginForm, EstimateForm, EstimateImportForm, EstimateSearchForm,
+    PartyStatementForm, PaverBlockTypeForm,
+)
+from .auth import basic_auth_user
+from .bulk import stream_estimates_zip
+from .catalogue import catalogue_version, get_paver_block_types
+from .dashboard import dashboard_last_modified, dashboard_version
+from .importing import ImportFileError, import_estimates
+from .pagination import keyset_paginate
+from .previews import get_thumbnail, load_estimate, preview_version
+from .search import search_estimates
+from .summaries import dashboard_totals, months_back, sales_report
+from .jobs import enqueue_render, job_payload
+from .metrics import render_text, stage
+from .rendering.admission import RenderBusy
+from .rendering.statement import (
+    render_statement_docx, render_statement_pdf, statement_filename, statement_summary,
+)
+from .rendering.service import (
+    DOCX_CONTENT_TYPE, docx_filename, document_key, open_estimate_pdf, pdf_filename,
+    render_estimate_docx, resolve_engine,
+)
 import logging
 import traceback
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-import docx2txt
-from docx2pdf import convert
 
 logger = logging.getLogger(__name__)
 
+# Columns the dashboard table shows (plus the pagination key).
+DASHBOARD_FIELDS = (
+    'id', 'party_name', 'date', 'total_amount', 'created_at', 'updated_at', 'paver_block_type__name',
+    'paver_block_type__updated_at',
+)
+
 def login_view(request):
     if request.method == 'POST':
         form = CustomLoginForm(data=request.POST)
@@ -40,8 +64,90 @@ def login_view(request):
 
 @login_required
 def dashboard(request):
-    estimates = Estimate.objects.filter(created_by=request.user).order_by('-created_at')
-    return render(request, 'estimate/dashboard.html', {'estimates': estimates})
+    """The estimate table and month totals, cached per user until their estimates change.
+
+    Everything below is only queried when the cached fragment is missing.
+    """
+    version = dashboard_version(request.user.pk)
+    this_month = date.today().replace(day=1)
+    # The fragment holds CSRF tokens, so it is also keyed on the browser's CSRF secret.
+    get_token(request)
+    csrf_secret = hashlib.sha256(request.META['CSRF_COOKIE'].encode()).hexdigest()[:16]
+    etag = f'"{version}-{catalogue_version()}-{this_month:%Y%m}-{csrf_secret}"'
+    last_modified = dashboard_last_modified(request.user.pk, version)
+    # A 304 would leave pending messages (e.g. "Estimate created") unshown.
+    if not len(messages.get_messages(request)):
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            return not_modified
+
+    estimates = (
+        Estimate.objects.filter(created_by=request.user)
+        .select_related('paver_block_type')
+        .only(*DASHBOARD_FIELDS)
+    )
+    page = SimpleLazyObject(lambda: keyset_paginate(
+        estimates, settings.KCP_DASHBOARD_PAGE_SIZE,
+        after=request.GET.get('after'), before=request.GET.get('before'),
+    ))
+    response = render(request, 'estimate/dashboard.html', {
+        'estimates': SimpleLazyObject(lambda: page.items),
+        'page': page,
+        'render_async': settings.KCP_RENDER_ASYNC,
+        'show_thumbnails': settings.KCP_DASHBOARD_THUMBNAILS,
+        'bulk_export_form': BulkExportForm(),
+        'month_totals': SimpleLazyObject(lambda: dashboard_totals(request.user, this_month)),
+        'fragment_key': [
+            etag.strip('"'), request.GET.get('after', ''), request.GET.get('before', ''),
+            settings.KCP_DASHBOARD_THUMBNAILS,
+        ],
+        'fragment_ttl': settings.KCP_DASHBOARD_CACHE_TTL,
+    })
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+@login_required
+def search(request):
+    form = EstimateSearchForm(request.GET or None)
+    page = None
+    if form.is_valid():
+        estimates = search_estimates(
+            Estimate.objects.filter(created_by=request.user)
+            .select_related('paver_block_type')
+            .only(*DASHBOARD_FIELDS),
+            **form.cleaned_data,
+        )
+        page = keyset_paginate(
+            estimates, settings.KCP_DASHBOARD_PAGE_SIZE,
+            after=request.GET.get('after'), before=request.GET.get('before'),
+        )
+    query = request.GET.copy()
+    query.pop('after', None)
+    query.pop('before', None)
+    return render(request, 'estimate/search.html', {
+        'form': form,
+        'page': page,
+        'estimates': page.items if page else [],
+        'query': query.urlencode(),
+    })
+
+@login_required
+def reports(request):
+    try:
+        months = min(max(int(request.GET.get('months', 12)), 1), 36)
+    except ValueError:
+        months = 12
+    last_month = date.today().replace(day=1)
+    first_month = months_back(last_month, months)
+    return render(request, 'estimate/reports.html', {
+        'months': months,
+        'first_month': first_month,
+        'last_month': last_month,
+        **sales_report(request.user, first_month, last_month),
+    })
 
 @login_required
 def create_estimate(request):
@@ -57,6 +163,34 @@ def create_estimate(request):
         form = EstimateForm()
     return render(request, 'estimate/create_estimate.html', {'form': form})
 
+# How many row errors the import page lists.
+IMPORT_ERRORS_SHOWN = 200
+
+@login_required
+def import_estimates_view(request):
+    result = None
+    if request.method == 'POST':
+        form = EstimateImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data['file']
+            try:
+                result = import_estimates(upload.file, upload.name, request.user,
+                                          dry_run=form.cleaned_data['dry_run'])
+            except ImportFileError as e:
+                messages.error(request, str(e))
+            else:
+                if form.cleaned_data['dry_run']:
+                    messages.info(request, f'{result.created} of {result.rows} rows are valid.')
+                elif result.created:
+                    messages.success(request, f'Imported {result.created} of {result.rows} estimates.')
+    else:
+        form = EstimateImportForm()
+    return render(request, 'estimate/import_estimates.html', {
+        'form': form,
+        'result': result,
+        'errors': result.errors[:IMPORT_ERRORS_SHOWN] if result else [],
+    })
+
 @login_required
 def manage_paver_blocks(request):
     if request.method == 'POST':
@@ -68,7 +202,7 @@ def manage_paver_blocks(request):
     else:
         form = PaverBlockTypeForm()
     
-    paver_blocks = PaverBlockType.objects.all()
+    paver_blocks = get_paver_block_types()
     return render(request, 'estimate/manage_paver_blocks.html', {
         'form': form,
         'paver_blocks': paver_blocks
@@ -83,137 +217,219 @@ def delete_paver_block(request, paver_block_id):
         return redirect('manage_paver_blocks')
     return render(request, 'estimate/confirm_delete_paver_block.html', {'paver_block': paver_block})
 
-def replace_placeholders_in_element(element, replacements):
-    """Replace placeholders in a paragraph or cell while preserving formatting."""
-    if not hasattr(element, 'text') or not element.text:
-        return
-
-    # First, check if any replacements are needed
-    needs_replacement = False
-    for key in replacements:
-        if key in element.text:
-            needs_replacement = True
-            break
-    
-    if not needs_replacement:
-        return
-
-    # Store the original text and formatting
-    original_text = element.text
-    original_runs = []
-    for run in element.runs:
-        original_runs.append({
-            'text': run.text,
-            'bold': run.bold,
-            'italic': run.italic,
-            'underline': run.underline,
-            'font': run.font.name if run.font else None,
-            'size': run.font.size if run.font else None,
-            'color': run.font.color.rgb if run.font and run.font.color else None
+def _preview_response(request, estimate_id, build):
+    """304 when the client has this version of the estimate, else ``build(state)``."""
+    state = preview_version(request.user, estimate_id)
+    if state is None:
+        raise Http404('No such estimate')
+    etag = f'"{state["version"]}"'
+    last_modified = state['last_modified'].timestamp()
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = build(state)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    return response
+
+@login_required
+def preview_estimate(request, estimate_id):
+    """The estimate as an A4 HTML page; the body comes from the fragment cache when unchanged."""
+    def build(state):
+        response = render(request, 'estimate/pdf_template.html', {
+            # Only queried when the cached fragment is missing.
+            'estimate': SimpleLazyObject(lambda: load_estimate(estimate_id)),
+            'estimate_id': estimate_id,
+            'version': state['version'],
+            'preview_ttl': settings.KCP_PREVIEW_CACHE_TTL,
+            'current_year': date.today().year,
         })
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+    return _preview_response(request, estimate_id, build)
 
-    # Clear all runs
-    for run in element.runs:
-        run.text = ''
-
-    # Apply replacements to the text
-    new_text = original_text
-    for key, value in replacements.items():
-        new_text = new_text.replace(key, str(value))
-
-    # Add the new text with original formatting
-    if original_runs:
-        run = element.add_run(new_text)
-        run.bold = original_runs[0]['bold']
-        run.italic = original_runs[0]['italic']
-        run.underline = original_runs[0]['underline']
-        if original_runs[0]['font']:
-            run.font.name = original_runs[0]['font']
-        if original_runs[0]['size']:
-            run.font.size = original_runs[0]['size']
-        if original_runs[0]['color']:
-            run.font.color.rgb = original_runs[0]['color']
-    else:
-        element.add_run(new_text)
+@login_required
+def estimate_thumbnail(request, estimate_id):
+    """A small PNG of the estimate for the dashboard; its URL carries the version."""
+    def build(state):
+        response = HttpResponse(get_thumbnail(estimate_id, state['version']), content_type='image/png')
+        response['Cache-Control'] = 'private, max-age=86400'
+        return response
+    return _preview_response(request, estimate_id, build)
+
+def _render_busy(error):
+    logger.warning(f"Render rejected: {error}")
+    response = HttpResponse(f'{error}\n', status=503, content_type='text/plain')
+    response['Retry-After'] = str(error.retry_after)
+    return response
 
 @login_required
 def generate_pdf(request, estimate_id):
     try:
-        estimate = get_object_or_404(Estimate, id=estimate_id, created_by=request.user)
-        template_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'KCP_LETTERPAD.docx')
-        
-        if not os.path.exists(template_path):
-            logger.error(f"Template file not found at: {template_path}")
+        with stage('lookup'):
+            estimate = get_object_or_404(Estimate, id=estimate_id, created_by=request.user)
+        engine = resolve_engine(request.GET.get('engine'))
+
+        if engine == 'docx' and not os.path.exists(settings.KCP_LETTERPAD_PATH):
+            logger.error(f"Template file not found at: {settings.KCP_LETTERPAD_PATH}")
             messages.error(request, 'Template file not found. Please contact support.')
             return redirect('dashboard')
-        
-        # Create a temporary copy of the template
-        with tempfile.NamedTemporaryFile(suffix='.docx', delete=False) as temp_docx:
-            temp_docx_path = temp_docx.name
-            with open(template_path, 'rb') as src:
-                temp_docx.write(src.read())
-        
-        logger.info(f"Created temporary copy at: {temp_docx_path}")
-        
-        # Work with the copy
-        doc = Document(temp_docx_path)
-        current_year = str(datetime.now().year)
-        
-        replacements = {
-            '<partyname>': estimate.party_name,
-            '<date>': str(estimate.date),
-            '<paverblocktype>': str(estimate.paver_block_type),
-            '<rate1>': str(estimate.price),
-            '<rate2>': str(estimate.gst_amount),
-            '<rate3>': str(estimate.transportation_charge),
-            '<rate4>': str(estimate.transportation_charge),
-            '<rate5>': str(estimate.loading_unloading_cost),
-            '<rate>': str(estimate.total_amount),
-            '<year>': current_year,
-            '<NOTE>': estimate.notes or '',
-        }
-        
-        logger.info("Starting text replacements with values:")
-        for key, value in replacements.items():
-            logger.info(f"{key}: {value}")
-
-        # Replace in all paragraphs
-        for paragraph in doc.paragraphs:
-            replace_placeholders_in_element(paragraph, replacements)
-
-        # Replace in all tables (all cells)
-        for table in doc.tables:
-            for row in table.rows:
-                for cell in row.cells:
-                    for paragraph in cell.paragraphs:
-                        replace_placeholders_in_element(paragraph, replacements)
-
-        # Save the modified copy
-        doc.save(temp_docx_path)
-        logger.info("Saved modified document")
-        
-        # Convert the copy to PDF
-        pdf_filename = f'KCP-ESTIMATE-{estimate.party_name}.pdf'
-        logger.info(f"Converting to PDF: {pdf_filename}")
-        convert(temp_docx_path, pdf_filename)
-        
-        # Send the PDF
-        with open(pdf_filename, 'rb') as f:
-            response = HttpResponse(f.read(), content_type='application/pdf')
-            response['Content-Disposition'] = f'attachment; filename="{pdf_filename}"'
-        
-        # Clean up temporary files
-        os.remove(temp_docx_path)
-        os.remove(pdf_filename)
-        logger.info("Cleanup complete")
+
+        key = document_key(estimate, engine)
+        etag = f'"{key}"'
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            not_modified['ETag'] = etag
+            return not_modified
+
+        filename = pdf_filename(estimate)
+        logger.info(f"Rendering {filename} with the {engine} engine")
+        pdf_file, key = open_estimate_pdf(estimate, engine, key=key)
+
+        response = FileResponse(pdf_file, as_attachment=True, filename=filename,
+                                content_type='application/pdf')
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
         return response
-        
+
+    except RenderBusy as e:
+        return _render_busy(e)
     except Exception as e:
         logger.error(f"Error in generate_pdf: {str(e)}")
         logger.error(f"Traceback: {traceback.format_exc()}")
         messages.error(request, f'Error generating document: {str(e)}')
         return redirect('dashboard')
 
+@login_required
+def generate_docx(request, estimate_id):
+    """The filled letterpad as a Word file, without PDF conversion."""
+    try:
+        with stage('lookup'):
+            estimate = get_object_or_404(Estimate, id=estimate_id, created_by=request.user)
+        if not os.path.exists(settings.KCP_LETTERPAD_PATH):
+            logger.error(f"Template file not found at: {settings.KCP_LETTERPAD_PATH}")
+            messages.error(request, 'Template file not found. Please contact support.')
+            return redirect('dashboard')
+
+        etag = f'"{document_key(estimate, "docx")}-docx"'
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            not_modified['ETag'] = etag
+            return not_modified
+
+        response = FileResponse(
+            io.BytesIO(render_estimate_docx(estimate)), as_attachment=True,
+            filename=docx_filename(estimate), content_type=DOCX_CONTENT_TYPE,
+        )
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+    except Exception as e:
+        logger.error(f"Error in generate_docx: {str(e)}")
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        messages.error(request, f'Error generating document: {str(e)}')
+        return redirect('dashboard')
+
+@login_required
+def party_statement(request):
+    """One document with every selected estimate of a party, and optionally a summary page."""
+    form = PartyStatementForm(request.GET)
+    if not form.is_valid():
+        messages.error(request, 'Choose a party for the statement.')
+        return redirect('reports')
+    estimates = list(
+        form.filter(Estimate.objects.filter(created_by=request.user))
+        .select_related('paver_block_type').order_by('date', 'id')[:settings.KCP_STATEMENT_MAX_ESTIMATES + 1]
+    )
+    if not estimates:
+        messages.error(request, 'No estimates match the selection.')
+        return redirect('reports')
+    if len(estimates) > settings.KCP_STATEMENT_MAX_ESTIMATES:
+        messages.error(request, f'A statement can hold at most {settings.KCP_STATEMENT_MAX_ESTIMATES} '
+                                'estimates; choose a shorter period.')
+        return redirect('reports')
+
+    party_name = form.cleaned_data['party_name']
+    summary = None
+    if form.cleaned_data['summary']:
+        summary = statement_summary(party_name, Estimate.objects.filter(id__in=[e.id for e in estimates]))
+    try:
+        if form.cleaned_data['format'] == 'docx':
+            content = render_statement_docx(party_name, estimates, summary)
+            filename, content_type = statement_filename(party_name, 'docx'), DOCX_CONTENT_TYPE
+        else:
+            content = render_statement_pdf(party_name, estimates, summary, request.GET.get('engine'))
+            filename, content_type = statement_filename(party_name), 'application/pdf'
+    except RenderBusy as e:
+        return _render_busy(e)
+    except Exception as e:
+        logger.error(f"Error in party_statement: {str(e)}")
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        messages.error(request, f'Error generating statement: {str(e)}')
+        return redirect('reports')
+    logger.info(f"Rendered {filename} with {len(estimates)} estimates")
+    return FileResponse(io.BytesIO(content), as_attachment=True, filename=filename, content_type=content_type)
+
+@login_required
+@require_POST
+def enqueue_render_job(request, estimate_id):
+    estimate = get_object_or_404(Estimate, id=estimate_id, created_by=request.user)
+    try:
+        job = enqueue_render(estimate, request.user, request.POST.get('engine'))
+    except RenderBusy as e:
+        return _render_busy(e)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse(job_payload(job), status=202)
+
+@login_required
+def render_job_status(request, job_id):
+    job = get_object_or_404(RenderJob, id=job_id, created_by=request.user)
+    return JsonResponse(job_payload(job))
+
+@login_required
+def render_job_download(request, job_id):
+    job = get_object_or_404(
+        RenderJob.objects.select_related('estimate__paver_block_type'),
+        id=job_id, created_by=request.user, status=RenderJob.DONE,
+    )
+    # Served from the render cache; rendered again if the file was evicted
+    # or the estimate changed since the job ran.
+    try:
+        pdf_file, key = open_estimate_pdf(job.estimate, job.engine)
+    except RenderBusy as e:
+        return _render_busy(e)
+    response = FileResponse(pdf_file, as_attachment=True, filename=pdf_filename(job.estimate),
+                            content_type='application/pdf')
+    response['ETag'] = f'"{key}"'
+    return response
+
+@login_required
+@require_POST
+def bulk_export(request):
+    form = BulkExportForm(request.POST)
+    estimate_ids = [int(i) for i in request.POST.getlist('estimate_ids') if i.isdigit()]
+    if not form.is_valid():
+        messages.error(request, 'Invalid export filter.')
+        return redirect('dashboard')
+    try:
+        engine = resolve_engine(request.POST.get('engine'))
+    except ValueError as e:
+        messages.error(request, str(e))
+        return redirect('dashboard')
+
+    estimates = form.filter(Estimate.objects.filter(created_by=request.user), estimate_ids)
+    limit = settings.KCP_BULK_EXPORT['MAX_ESTIMATES']
+    ids = list(estimates.order_by('-created_at').values_list('id', flat=True)[:limit])
+    if not ids:
+        messages.error(request, 'No estimates match the selection.')
+        return redirect('dashboard')
+
+    logger.info(f"Bulk export of {len(ids)} estimates with the {engine} engine")
+    response = StreamingHttpResponse(stream_estimates_zip(ids, engine), content_type='application/zip')
+    response['Content-Disposition'] = f'attachment; filename="KCP-ESTIMATES-{date.today()}.zip"'
+    return response
+
 @login_required
 def delete_estimate(request, estimate_id):
     estimate = get_object_or_404(Estimate, id=estimate_id, created_by=request.user)
@@ -223,3 +439,12 @@ def delete_estimate(request, estimate_id):
         return redirect('dashboard')
     # Optional: Render a confirmation page for GET requests
     return render(request, 'estimate/confirm_delete.html', {'estimate': estimate})
+
+def metrics(request):
+    """Prometheus metrics for staff: a logged-in session or HTTP Basic auth (for scrapers)."""
+    user = request.user if request.user.is_authenticated else basic_auth_user(request)
+    if user is None or not user.is_staff:
+        response = HttpResponse('Staff credentials required.\n', status=401, content_type='text/plain')
+        response['WWW-Authenticate'] = 'Basic realm="metrics"'
+        return response
+    return HttpResponse(render_text(), content_type='text/plain; version=0.0.4; charset=utf-8')
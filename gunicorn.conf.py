@@ -0,0 +1,34 @@
+"""Gunicorn settings (read automatically from the working directory).
+
+With preload_app the master imports Django and the app, loads the rendering
+libraries and compiles the letterpad once, then forks the workers, so they
+share those pages copy-on-write instead of each building its own copy on
+its first download. Set GUNICORN_PRELOAD=0 to load the app in each worker
+(needed for --reload during development).
+"""
+import gc
+import os
+
+# Web workers write concurrently: run SQLite in WAL mode (see settings).
+os.environ.setdefault('KCP_SQLITE_WAL', '1')
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 4))
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+
+
+def when_ready(server):
+    # Runs in the master before the first fork.
+    if not server.cfg.preload_app:
+        return
+    from django.db import connections
+    from estimate.rendering.service import warm_up
+
+    warm_up()
+    # Workers must open their own database connections.
+    connections.close_all()
+    # Move everything loaded so far out of the collector's reach, so the
+    # workers' garbage collections do not touch (and copy) those pages.
+    gc.freeze()
+    server.log.info("Preloaded the rendering subsystem")
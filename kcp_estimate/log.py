@@ -0,0 +1,157 @@
+"""Logging handlers and filters used by ``settings.LOGGING``.
+
+``QueueHandler`` puts records on an in-memory queue and a ``QueueListener``
+thread writes them to the real handlers, so request threads never wait on
+file or console I/O. ``configure`` (``settings.LOGGING_CONFIG``) starts the
+listeners once ``dictConfig`` has built every handler.
+
+``RotatingFileHandler`` rotates by size and copes with several processes
+appending to the same file. ``RateLimitFilter`` caps how many records a
+noisy logger emits per second.
+"""
+import logging
+import logging.config
+import logging.handlers
+import os
+import queue
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: rotation without the cross-process lock
+    fcntl = None
+
+
+_queue_handlers = []
+
+
+def configure(config):
+    """``dictConfig``, then start each ``QueueHandler``'s listener."""
+    logging.config.dictConfig(config)
+    for handler in _queue_handlers:
+        handler.start()
+
+
+class QueueHandler(logging.handlers.QueueHandler):
+    """Hand records to a listener thread that feeds the ``targets`` handlers.
+
+    Give the targets as ``cfg://handlers.<name>`` references and configure
+    the handler with ``'()'`` rather than ``'class'``, so Python 3.12's own
+    queue handler set-up does not take over. dictConfig builds handlers in
+    name order, so the references are only resolved in ``start()``, after
+    all of them exist. The listener is restarted in a forked child (e.g. a
+    gunicorn worker of a preloaded master), which does not inherit the
+    parent's thread.
+    """
+
+    def __init__(self, targets):
+        super().__init__(queue.SimpleQueue())
+        # Still unresolved: dictConfig converts each item when it is read.
+        self._target_refs = targets
+        self.targets = None
+        self.listener = None
+        self._lock = threading.Lock()
+        _queue_handlers.append(self)
+
+    def start(self):
+        if self.listener is not None:
+            return
+        if self.targets is None:
+            # Indexing (not iterating) makes dictConfig resolve the references.
+            refs = self._target_refs
+            self.targets = [refs[i] for i in range(len(refs))]
+            for target in self.targets:
+                if not isinstance(target, logging.Handler):
+                    raise ValueError(f'QueueHandler target is not a handler: {target!r}')
+        self._start()
+
+    def _start(self):
+        self._pid = os.getpid()
+        self.listener = logging.handlers.QueueListener(self.queue, *self.targets, respect_handler_level=True)
+        self.listener.start()
+
+    def enqueue(self, record):
+        if self.listener is None:
+            # Not started by configure(): records wait on the queue until it is.
+            return super().enqueue(record)
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self.queue = queue.SimpleQueue()
+                    self._start()
+        super().enqueue(record)
+
+    def close(self):
+        # Drains the queue before the handlers are closed at exit.
+        if self.listener is not None and self._pid == os.getpid() and self.listener._thread is not None:
+            self.listener.stop()
+        if self in _queue_handlers:
+            _queue_handlers.remove(self)
+        super().close()
+
+
+class RotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """Size-based rotation that is safe with several processes on one file.
+
+    Rollover happens under an exclusive lock on ``<filename>.lock`` and only
+    if the file is still over the limit; a process whose file was rotated
+    by another one reopens the new file instead of rotating again.
+    """
+
+    def _rotated_elsewhere(self):
+        try:
+            return os.stat(self.baseFilename).st_ino != os.fstat(self.stream.fileno()).st_ino
+        except (OSError, ValueError):
+            return True
+
+    def shouldRollover(self, record):
+        if self.stream is not None and self._rotated_elsewhere():
+            self.stream.close()
+            self.stream = self._open()
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+        if fcntl is None:
+            return super().doRollover()
+        with open(f'{self.baseFilename}.lock', 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                if self._rotated_elsewhere():
+                    if self.stream is not None:
+                        self.stream.close()
+                    self.stream = self._open()
+                    return
+                super().doRollover()
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+class RateLimitFilter(logging.Filter):
+    """Let through at most ``rate`` records per second (bursts up to ``burst``).
+
+    The next record that passes after some were dropped says how many.
+    """
+
+    def __init__(self, rate=1.0, burst=5):
+        super().__init__()
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._suppressed = 0
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens < 1:
+                self._suppressed += 1
+                return False
+            self._tokens -= 1
+            suppressed, self._suppressed = self._suppressed, 0
+        if suppressed:
+            record.msg = f'{record.msg} ({suppressed} similar messages suppressed)'
+        return True
@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 
 from pathlib import Path
 import os
+import sys
+import tempfile
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -44,6 +46,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "estimate.middleware.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -78,11 +81,97 @@ WSGI_APPLICATION = "kcp_estimate.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+# SQLite by default, set up for several gunicorn workers: WAL journaling,
+# a busy timeout, write-locking transactions (see kcp_estimate/sqlite3) and
+# persistent connections. Set DATABASE_ENGINE=postgresql to move to
+# PostgreSQL; behind PgBouncer in transaction pooling mode also set
+# DATABASE_PGBOUNCER=1.
+DATABASE_ENGINE = os.environ.get('DATABASE_ENGINE', 'sqlite')
+
+if DATABASE_ENGINE == 'postgresql':
+    PGBOUNCER = os.environ.get('DATABASE_PGBOUNCER') == '1'
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.environ.get('DATABASE_NAME', 'kcp_estimate'),
+            "USER": os.environ.get('DATABASE_USER', 'kcp_estimate'),
+            "PASSWORD": os.environ.get('DATABASE_PASSWORD', ''),
+            "HOST": os.environ.get('DATABASE_HOST', 'localhost'),
+            "PORT": os.environ.get('DATABASE_PORT', '5432'),
+            # PgBouncer does the pooling; otherwise each worker keeps its
+            # connection open between requests.
+            "CONN_MAX_AGE": 0 if PGBOUNCER else int(os.environ.get('DATABASE_CONN_MAX_AGE', 600)),
+            "CONN_HEALTH_CHECKS": True,
+            # Server-side cursors do not survive transaction pooling.
+            "DISABLE_SERVER_SIDE_CURSORS": PGBOUNCER,
+            "OPTIONS": {
+                "connect_timeout": 10,
+            },
+        }
     }
+else:
+    # WAL is stored in the database file itself, so it is only switched on
+    # by the servers (gunicorn.conf.py, render.yaml); management commands run
+    # locally leave the file's journal mode as it is.
+    SQLITE_WAL = os.environ.get('KCP_SQLITE_WAL', '0') == '1'
+    DATABASES = {
+        "default": {
+            "ENGINE": "kcp_estimate.sqlite3",
+            "NAME": os.environ.get('DATABASE_NAME', BASE_DIR / "db.sqlite3"),
+            "CONN_MAX_AGE": int(os.environ.get('DATABASE_CONN_MAX_AGE', 600)),
+            "CONN_HEALTH_CHECKS": True,
+            "OPTIONS": {
+                # Seconds the Python driver waits for a lock.
+                "timeout": 20,
+                "transaction_mode": "IMMEDIATE",
+                "pragmas": {
+                    **({"journal_mode": "WAL", "synchronous": "NORMAL"} if SQLITE_WAL else {}),
+                    "busy_timeout": 20000,
+                    "mmap_size": 256 * 1024 * 1024,
+                    "cache_size": -32000,  # KiB, i.e. 32 MB per connection
+                    "temp_store": "MEMORY",
+                },
+            },
+        }
+    }
+
+
+# Cache shared by all gunicorn workers on the host: files by default, or
+# Redis when KCP_REDIS_URL is set (needs the redis package).
+if os.environ.get('KCP_REDIS_URL'):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ['KCP_REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": os.environ.get('KCP_CACHE_DIR', os.path.join(BASE_DIR, 'django_cache')),
+        }
+    }
+
+
+# Sessions: 'cached_db' (default) reads them from the cache and writes
+# through to the database; 'signed_cookies' keeps them in the browser and
+# never touches the database, but a logged-out cookie that was copied stays
+# valid until it expires; 'db' is Django's default.
+SESSION_ENGINE = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}[os.environ.get('KCP_SESSION_ENGINE', 'cached_db')]
+
+# The logged-in user is looked up in the cache instead of auth_user on each
+# request (see estimate.auth), and verified Basic auth credentials are
+# remembered. TTL is for the shared cache, LOCAL_TTL for each worker's
+# memory; saves and logouts make every worker drop both at once.
+AUTHENTICATION_BACKENDS = ['estimate.auth.CachedModelBackend']
+KCP_AUTH_CACHE = {
+    'TTL': int(os.environ.get('KCP_AUTH_CACHE_TTL', 300)),
+    'LOCAL_TTL': int(os.environ.get('KCP_AUTH_CACHE_LOCAL_TTL', 5)),
 }
 
 
@@ -129,6 +218,120 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Estimates per dashboard page
+KCP_DASHBOARD_PAGE_SIZE = int(os.environ.get('KCP_DASHBOARD_PAGE_SIZE', 50))
+# Seconds a user's rendered dashboard stays cached. Writes to their estimates
+# start a new version at once, so this only bounds how long old ones linger.
+KCP_DASHBOARD_CACHE_TTL = int(os.environ.get('KCP_DASHBOARD_CACHE_TTL', 24 * 3600))
+
+# Seconds the paver block type catalogue is cached for (per worker and in
+# the shared cache); saves and deletes invalidate it immediately.
+KCP_CATALOGUE_TTL = int(os.environ.get('KCP_CATALOGUE_TTL', 300))
+
+# Estimate letterpad (.docx with {{ placeholder }} fields)
+KCP_LETTERPAD_PATH = os.path.join(BASE_DIR, 'KCP_LETTERPAD.docx')
+
+# Default PDF engine: 'docx' (letterpad + converter pool) or 'reportlab'
+# (native, no office suite). A request can override it with ?engine=.
+KCP_RENDER_ENGINE = os.environ.get('KCP_RENDER_ENGINE', 'docx')
+
+# Dashboard downloads go through RenderJob rows processed by
+# `manage.py render_worker` instead of rendering inside the web worker.
+KCP_RENDER_ASYNC = os.environ.get('KCP_RENDER_ASYNC', '1') == '1'
+# Seconds without a render worker heartbeat after which downloads are
+# rendered in the web process instead of being queued.
+KCP_RENDER_WORKER_TIMEOUT = int(os.environ.get('KCP_RENDER_WORKER_TIMEOUT', 60))
+
+# "Download selected" ZIP export: render threads per request (sharing the
+# worker's converter pool) and a cap on how many estimates one archive may hold.
+KCP_BULK_EXPORT = {
+    'THREADS': int(os.environ.get('KCP_BULK_EXPORT_THREADS', 2)),
+    'MAX_ESTIMATES': int(os.environ.get('KCP_BULK_EXPORT_MAX_ESTIMATES', 500)),
+}
+
+# Rendered PDFs, keyed on a hash of their content (LRU, size-bounded).
+# Set KCP_RENDER_CACHE_DIR to an empty string to disable.
+KCP_RENDER_CACHE = {
+    'DIR': os.environ.get('KCP_RENDER_CACHE_DIR', os.path.join(BASE_DIR, 'render_cache')),
+    'MAX_BYTES': int(os.environ.get('KCP_RENDER_CACHE_MAX_BYTES', 256 * 1024 * 1024)),
+}
+
+# Per-job scratch directories for converters that need files on disk.
+# Empty means /dev/shm when available, else the system temp directory.
+KCP_SCRATCH_DIR = os.environ.get('KCP_SCRATCH_DIR', '')
+
+# How long HTML preview fragments and PNG thumbnails stay in the cache. Their
+# keys include updated_at, so an edit never serves a stale copy.
+KCP_PREVIEW_CACHE_TTL = int(os.environ.get('KCP_PREVIEW_CACHE_TTL', 7 * 24 * 3600))
+# Show a thumbnail of each estimate on the dashboard (off by default: one
+# more request per row, drawn with Pillow on a cache miss).
+KCP_DASHBOARD_THUMBNAILS = os.environ.get('KCP_DASHBOARD_THUMBNAILS', '0') == '1'
+
+# Most estimates one party statement (estimate/rendering/statement.py) may hold.
+KCP_STATEMENT_MAX_ESTIMATES = int(os.environ.get('KCP_STATEMENT_MAX_ESTIMATES', 200))
+
+# Renders allowed at once on this host, across all processes, and how many
+# more requests may wait (up to TIMEOUT seconds) before getting a 503 with
+# Retry-After. SLOTS = 0 turns the limit off.
+KCP_RENDER_ADMISSION = {
+    'DIR': os.environ.get('KCP_RENDER_ADMISSION_DIR', os.path.join(tempfile.gettempdir(), 'kcp-render-slots')),
+    'SLOTS': int(os.environ.get('KCP_RENDER_SLOTS', 2)),
+    'QUEUE': int(os.environ.get('KCP_RENDER_QUEUE', 8)),
+    'TIMEOUT': float(os.environ.get('KCP_RENDER_QUEUE_TIMEOUT', 10)),
+    'RETRY_AFTER': int(os.environ.get('KCP_RENDER_RETRY_AFTER', 5)),
+}
+
+# DOCX -> PDF converter pool (per worker process). Backends live in
+# estimate.rendering.conversion: LibreOfficeBackend (Linux, needs python3-uno),
+# Docx2PdfBackend (Word on Windows/macOS) and StandInBackend (no office suite).
+KCP_CONVERTER = {
+    'BACKEND': os.environ.get(
+        'KCP_CONVERTER_BACKEND',
+        'estimate.rendering.conversion.Docx2PdfBackend'
+        if sys.platform in ('win32', 'darwin')
+        else 'estimate.rendering.conversion.LibreOfficeBackend',
+    ),
+    'POOL_SIZE': int(os.environ.get('KCP_CONVERTER_POOL_SIZE', 1)),
+    'MAX_JOBS': int(os.environ.get('KCP_CONVERTER_MAX_JOBS', 200)),
+    'TIMEOUT': int(os.environ.get('KCP_CONVERTER_TIMEOUT', 60)),
+    'HEALTH_CHECK_INTERVAL': 30,
+    'OPTIONS': {
+        'PYTHON': os.environ.get('KCP_UNO_PYTHON', '/usr/bin/python3'),
+        'SOFFICE': os.environ.get('KCP_SOFFICE', 'soffice'),
+    },
+}
+
+# JSON API (estimate/api.py): page sizes and the bulk create limit.
+KCP_API = {
+    'PAGE_SIZE': int(os.environ.get('KCP_API_PAGE_SIZE', 100)),
+    'MAX_PAGE_SIZE': int(os.environ.get('KCP_API_MAX_PAGE_SIZE', 1000)),
+    'MAX_BULK_CREATE': int(os.environ.get('KCP_API_MAX_BULK_CREATE', 1000)),
+}
+
+# Per-process metrics files, added together by the /metrics view. Set
+# KCP_METRICS_DIR to an empty string to keep metrics in memory only (then
+# /metrics shows just the worker that answers the scrape).
+KCP_METRICS = {
+    'DIR': os.environ.get('KCP_METRICS_DIR', os.path.join(BASE_DIR, 'metrics')),
+    'FLUSH_INTERVAL': float(os.environ.get('KCP_METRICS_FLUSH_INTERVAL', 5)),
+}
+
+# Limits for `manage.py benchmark`: a run fails if a metric is above its
+# limit (or below it, for *_per_s throughput metrics).
+KCP_BENCHMARK_BUDGET = {
+    'dashboard_1000_p50_ms': 100,
+    'dashboard_100000_p50_ms': 150,
+    'dashboard_1000000_p50_ms': 250,
+    'dashboard_1000000_deep_p50_ms': 250,
+    'placeholders_us_per_doc': 5000,
+    'generate_pdf_docx_p50_ms': 1500,
+    'generate_pdf_reportlab_p50_ms': 500,
+    'create_estimate_p50_ms': 150,
+    # With the default cached_db sessions and cached user lookup.
+    'dashboard_queries': 0,
+    'generate_pdf_queries': 2,
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
@@ -144,6 +347,10 @@ LOGIN_REDIRECT_URL = '/dashboard/'
 LOGOUT_REDIRECT_URL = '/'
 
 # Logging Configuration
+# Loggers write to 'queue', whose listener thread feeds 'file' and 'console',
+# so requests never block on log I/O. debug.log rotates at
+# KCP_LOG_MAX_BYTES. The per-render replacement values are rate limited.
+LOGGING_CONFIG = 'kcp_estimate.log.configure'
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -153,11 +360,20 @@ LOGGING = {
             'style': '{',
         },
     },
+    'filters': {
+        'render_diagnostics': {
+            '()': 'kcp_estimate.log.RateLimitFilter',
+            'rate': float(os.environ.get('KCP_RENDER_LOG_RATE', 1)),
+            'burst': int(os.environ.get('KCP_RENDER_LOG_BURST', 5)),
+        },
+    },
     'handlers': {
         'file': {
             'level': 'DEBUG',
-            'class': 'logging.FileHandler',
+            '()': 'kcp_estimate.log.RotatingFileHandler',
             'filename': os.path.join(BASE_DIR, 'debug.log'),
+            'maxBytes': int(os.environ.get('KCP_LOG_MAX_BYTES', 10 * 1024 * 1024)),
+            'backupCount': int(os.environ.get('KCP_LOG_BACKUP_COUNT', 5)),
             'formatter': 'verbose',
         },
         'console': {
@@ -165,17 +381,24 @@ LOGGING = {
             'class': 'logging.StreamHandler',
             'formatter': 'verbose',
         },
+        'queue': {
+            '()': 'kcp_estimate.log.QueueHandler',
+            'targets': ['cfg://handlers.file', 'cfg://handlers.console'],
+        },
     },
     'loggers': {
         'django': {
-            'handlers': ['file', 'console'],
+            'handlers': ['queue'],
             'level': 'INFO',
             'propagate': True,
         },
         'estimate': {
-            'handlers': ['file', 'console'],
+            'handlers': ['queue'],
             'level': 'DEBUG',
             'propagate': True,
         },
+        'estimate.rendering.diagnostics': {
+            'filters': ['render_diagnostics'],
+        },
     },
 }
@@ -0,0 +1,31 @@
+"""SQLite backend tuned for several web workers writing to one file.
+
+Every new connection applies the ``pragmas`` from ``DATABASES[...]['OPTIONS']``
+(WAL journaling lets readers and one writer work at the same time, and
+``busy_timeout`` makes a blocked writer wait instead of failing). With
+``transaction_mode`` set to ``IMMEDIATE``, ``atomic()`` blocks take the write
+lock when they begin; a deferred transaction that reads and then writes can
+otherwise fail with "database is locked" straight away, because SQLite
+cannot wait for the lock without risking a deadlock.
+"""
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        self.pragmas = kwargs.pop('pragmas', {})
+        self.transaction_mode = kwargs.pop('transaction_mode', None)
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode:
+            self.cursor().execute(f'BEGIN {self.transaction_mode}')
+        else:
+            super()._start_transaction_under_autocommit()